@@ -7,8 +7,10 @@ Created on Sat Sep 21 12:43:01 2013
 
 import abc
 import svgwrite
-import re
 from ConnectorBase import ConnectorBase as Con
+import HitIndex
+import SvgPath
+from ConnectorTable import ConnectorTable
 
 SVGWRITE_DEBUG = False
 
@@ -30,10 +32,20 @@ class ComponentBase(metaclass=abc.ABCMeta):
                       "stroke-linejoin" : "round"}
   
   def __init__(self):
-    self.connectors = list() # Pins o pads
+    self.connectors = list() # Pins o pads, views of rows in table
+    self.table      = ConnectorTable()
     self._mount     = ComponentBase.MOUNT_THT
     self._part_name  = "IC"
     
+    # Dirty flags for incremental rebuilds. Connectors have their own flags.
+    self._sch_dirty       = True  # Reposition all schematic connectors
+    self._sch_dirty_sides = set() # Reposition schematic connectors on sides
+    self._pcb_dirty       = True  # Reposition all pcb connectors
+    
+    # Connector bounds for hit testing, updated when connectors are placed
+    self.sch_index  = HitIndex.GridIndex(Con.schematic_bounds, cell=7.5)
+    self.pcb_index  = HitIndex.GridIndex(Con.pcb_bounds, cell=2.54)
+
     self.drw_sch  = svgwrite.Drawing(profile="tiny", debug=SVGWRITE_DEBUG)
     self.drw_sch.update(ComponentBase.DRW_SCH_DEFAULTS)
     
@@ -113,38 +125,108 @@ class ComponentBase(metaclass=abc.ABCMeta):
     Add a new connector to the component. 
     Copy shape, size and mounting from last added connecor. 
     """
-    
-    no                = len(self.connectors)
-    state             = {}
-    state["s_pin"]    = no
-    state["p_pin"]    = no
-    state["s_label"]  = "C%d" % no
-    
+    self.add_connectors(1)
+
+
+  def add_connectors(self, n, states=None, row=None):
+    """
+    Add n new connectors to the component. 
+    Copy shape, size and mounting from last added connecor. The optional
+    states is a list of n connector states (as returned by 
+    ConnectorBase.get_state()) to set on the new connectors. Missing 
+    attributes are copied from the previous connector. A connector number
+    (no) in a state is kept if no other connector has it, e.g. when removed
+    connectors are restored. The new connectors are inserted at row, or
+    added last if row is None.
+    """
     if len(self.connectors)>0:
-      state             = self.connectors[-1].get_state()
-      state["s_pin"]    = no
-      state["p_pin"]    = no
-      state["s_label"]  = "C%d" % (no)
+      state = self.connectors[-1].get_state()
     else:
+      state = {}
       if self.mount == self.MOUNT_THT:
         state["p_shape"] = Con.SHAPE_HOLE
       elif self.mount == self.MOUNT_SMD:
         state["p_shape"] = Con.SHAPE_PAD
+    state.pop("no", None)
       
-    c = Con(no)
-    c.set_state(state)  
-    
-    self.sch_layers["pins"].add(c.s_svg)
-    self.pcb_layers["copper1"].add(c.p_svg)
-    self.connectors.append(c)
+    first   = len(self.connectors)
+    used    = set(self.table.no)
+    next_no = max(used)+1 if used else 0
+    for i in range(n):
+      no = states[i].get("no") if states else None
+      if no is None or no in used:
+        no = next_no
+      used.add(no)
+      next_no = max(next_no, no+1)
+      state["s_pin"]    = no
+      state["p_pin"]    = no
+      state["s_label"]  = "C%d" % no
+      if states:
+        state.update(states[i])
+        state.pop("no", None)
+      c = Con(no, self.table)
+      c.sch_index = self.sch_index
+      c.pcb_index = self.pcb_index
+      c.set_state(state)  
+      self.connectors.append(c)
+      if first == 0 and i == 0:
+        state = c.get_state()  # Copy all attributes of the first connector
+        state.pop("no")
+    if row is not None and row < first:
+      self._move_rows(first, n, row)
+    self._pcb_dirty = True
+
+
+  def _move_rows(self, start, n, row):
+    """ Move n connectors at start to row, before start. """
+    order = (list(range(row)) + list(range(start, start+n)) + 
+             list(range(row, start)))
+    self.table.reorder(order)
+    self.connectors[:] = [self.connectors[i] for i in order]
+    for i in range(row, len(self.connectors)):
+      self.connectors[i]._i = i
     
 
   def remove_connector(self, n):
     """ Remove a connector """
-    no = self.connectors[n].no
-    del self.pcb_layers["copper1"].elements[no]
-    del self.sch_layers["pins"].elements[no]
-    del self.connectors[n]
+    self.remove_connectors([n])
+
+
+  def remove_connectors(self, rows):
+    """
+    Remove connectors at the positions given by rows (e.g. a range).
+    Negative positions count from the end, as for lists. Raise IndexError if
+    a position is out of range.
+    """
+    count = len(self.connectors)
+    rows  = set(r+count if r<0 else r for r in rows)
+    if len(rows)==0:
+      return
+    if min(rows)<0 or max(rows)>=count:
+      raise IndexError("connector index out of range")
+    for n in rows:
+      self._sch_dirty_sides.add(self.connectors[n].s_side)
+      self.sch_index.remove(self.connectors[n])
+      self.pcb_index.remove(self.connectors[n])
+      self.connectors[n].detach()  # Still valid if referenced elsewhere
+    self._pcb_dirty = True
+
+    self.table.delete(rows)
+    self.connectors[:] = [c for i, c in enumerate(self.connectors) 
+                          if i not in rows]
+    for i, c in enumerate(self.connectors):
+      c._i = i
+
+
+  def release_svg(self):
+    """
+    Drop the svg elements of all connectors, e.g. after an export. They are
+    recreated by the next build.
+    """
+    for c in self.connectors:
+      c.release_svg()
+    del self.sch_layers["pins"].elements[:]
+    del self.pcb_layers["copper1"].elements[:]
 
 
   def set_silkscreen_segment(self, command, i=-1):
@@ -152,18 +234,19 @@ class ComponentBase(metaclass=abc.ABCMeta):
     Add, remove or update a silkscreen path segment. 
     Segment number i>=0 will be removed if command is an empty string. 
     Segment number i>=0 will be updated if command is a valid and non-empty.    
-    A segment may be added (appended) by providing a valid command string.
+    Segments may be added (appended) by providing a valid command string.
     
-    A valid segement command is any of the svg path d attribute shapes. 
+    A valid command string is any svg path d attribute. If it holds more than
+    one segment, all are added or replace segment i.
     """
     assert(isinstance(command, str))
     
     if i<0:
-      # Add segment
-      command = ComponentBase.validate_path_cmd(command)
-      if not command:
+      # Add segments
+      commands = ComponentBase.validate_path(command)
+      if not commands:
         return False
-      self.pcb_layers["silkscreen"].push(command)
+      self.pcb_layers["silkscreen"].commands.extend(commands)
     elif command=="":
       # Remove segment
       try:
@@ -172,37 +255,34 @@ class ComponentBase(metaclass=abc.ABCMeta):
         return False
     else:
       # Update segment
-      try:
-        self.pcb_layers["silkscreen"].commands[i] = command
-      except IndexError:
+      commands = ComponentBase.validate_path(command)
+      if not commands or i>=len(self.pcb_layers["silkscreen"].commands):
         return False
+      self.pcb_layers["silkscreen"].commands[i:i+1] = commands
       
     return True
     
 
+  def validate_path(txt):
+    """
+    Return a list of svg path commands, one for each segment in the string 
+    txt. If txt is not a valid path d attribute return False. 
+    """
+    try:
+      return SvgPath.parse_path_cmds(txt)
+    except ValueError:
+      return False
+
+
   def validate_path_cmd(txt):
     """
     Return the string txt if it is a svg path command.
     If string is invalid return False. 
     """
-    
-    nf    = "([-+]?([0-9]*\.[0-9]+|[0-9]+))"  # Expression matching a number
-    
-    # Expressions for validating svg path commands (the "d" attribute)
-    expr  = (
-      "^[lLmMtT](\s+%s){2}$" % (nf), # Line, move and smooth quadratic beizer commands
-      "^[hHvV]\s+%s$" % (nf),        # Horisontal and vertical commands
-      "^[cC](\s+%s){6}$" % (nf),     # Cubic beizer command
-      "^[qQsS](\s+%s){4}$" % (nf),   # Quadratic and Smooth beizer command
-      "^[aA](\s+%s){3}\s[0-1]\s[0-1](\s+%s){2}$" % (nf,nf), # Eliptical arc command
-      "^[zZ]$")                      #  Close path command
-
-    for val in expr:
-      m = re.match(val, txt)
-      if m:
-        return m.group(0)
-        
-    return False
+    commands = ComponentBase.validate_path(txt)
+    if not commands or len(commands) != 1:
+      return False
+    return commands[0]
     
     
   def get_state(self):
@@ -225,9 +305,7 @@ class ComponentBase(metaclass=abc.ABCMeta):
     for k,v in state.items():
       #print("  Set {:14s} to {:s}".format(k,str(v)))
       if k == "connectors":
-        for con_state in v:
-          self.add_connector() 
-          self.connectors[-1].set_state(con_state)
+        self.add_connectors(len(v), v)
       else:
         setattr(self, k, v)
 
@@ -239,11 +317,11 @@ class ComponentBase(metaclass=abc.ABCMeta):
     
     
   @abc.abstractclassmethod
-  def build_schematic(self, bg=None):
+  def build_schematic(self):
     """ Build the component svg g schematic element. """
 
 
   @abc.abstractclassmethod
-  def build_pcb(self, bg=None):
+  def build_pcb(self):
     """ Build the component svg g pcb element. """
 
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""
+Component file format (.scc). A file has two lines of json:
+
+  1. A header with format name, version and part metadata (part name, mount
+     and pin count). The header can be read without reading the rest of the
+     file or creating any svg objects.
+  2. The component state as returned by get_state(), except that the
+     connectors are stored column wise (one list per connector attribute).
+
+Files saved by older versions are pickled state dicts. They can still be
+loaded.
+"""
+
+import json
+import pickle
+
+from ComponentRect import ComponentRect
+import Packages
+
+FORMAT  = "scc"
+VERSION = 1
+
+# Connector attributes stored as tuples
+_TUPLE_COLUMNS = ("p_dim", "p_pos")
+
+
+def _header(state):
+  """ Return the file header for component state. """
+  return {"format"    : FORMAT,
+          "version"   : VERSION,
+          "part_name" : state["part_name"],
+          "mount"     : state["mount"],
+          "pin_count" : len(state["connectors"])}
+
+
+def save(cmp, filename):
+  """ Save component cmp to the file filename. """
+  state   = cmp.get_state()
+  conns   = state.pop("connectors")
+  columns = {}
+  if len(conns) > 0:
+    for k in conns[0]:
+      if k != "no":
+        columns[k] = [c[k] for c in conns]
+  state["silkscreen_commands"] = [str(c) for c in state["silkscreen_commands"]]
+  state["connectors"] = columns
+
+  with open(filename, mode="w", encoding="utf-8") as f:
+    f.write(json.dumps(_header(dict(state, connectors=conns))))
+    f.write("\n")
+    f.write(json.dumps(state, separators=(",", ":")))
+    f.write("\n")
+
+
+def _is_pickle(f):
+  """ Check if the binary file object f is a pickle (older .scc files). """
+  start = f.peek(1)[:1]
+  return start == b"\x80"
+
+
+def _check_header(header, filename):
+  """ Raise ValueError if header is not a supported component file header. """
+  if not isinstance(header, dict) or header.get("format") != FORMAT:
+    raise ValueError("Not a component file: " + filename)
+  if header.get("version", 0) > VERSION:
+    raise ValueError("Unsupported component file version %s" % header["version"])
+
+
+def read_header(filename):
+  """
+  Return the header dict of the component file filename. Only the first line
+  is read. For older pickled files the whole state must be unpickled, but no
+  component is created.
+  """
+  with open(filename, mode="rb") as f:
+    if _is_pickle(f):
+      return _header(pickle.load(f))
+    header = json.loads(f.readline().decode("utf-8"))
+  _check_header(header, filename)
+  return header
+
+
+def read_state(filename):
+  """ Return the component state (as returned by get_state()) in filename. """
+  with open(filename, mode="rb") as f:
+    if _is_pickle(f):
+      return pickle.load(f)
+    header  = json.loads(f.readline().decode("utf-8"))
+    _check_header(header, filename)
+    state   = json.loads(f.readline().decode("utf-8"))
+
+  # Connector columns to a list of connector states
+  columns = state["connectors"]
+  for k in _TUPLE_COLUMNS:
+    if k in columns:
+      columns[k] = [tuple(v) for v in columns[k]]
+  keys  = list(columns.keys())
+  rows  = zip(*[columns[k] for k in keys])
+  state["connectors"] = [dict(zip(keys, row)) for row in rows]
+  return state
+
+
+def load(filename):
+  """ Load and return a ComponentRect from the file filename. """
+  return from_state(read_state(filename))
+
+
+def from_state(state):
+  """
+  Create and return a ComponentRect from a state read by read_state(). A
+  state with the key "package" creates a package (see Packages).
+  """
+  if "package" in state:
+    return Packages.from_state(state)
+  state = dict(state)
+  cmp   = ComponentRect()
+  # Mount must be set before connectors are added to get the right shapes.
+  cmp.mount = state.pop("mount")
+  cmp.set_state(state)
+  return cmp
+
+
+def list_parts(filenames):
+  """
+  Yield (filename, header) for all component files in filenames. Files that
+  can not be read are skipped.
+  """
+  for filename in filenames:
+    try:
+      yield filename, read_header(filename)
+    except (OSError, ValueError, pickle.UnpicklingError) as e:
+      print("Skip {:s}: {:s}".format(filename, str(e)))
@@ -6,16 +6,29 @@ Created on Sat Sep 21 13:06:40 2013
 """
 
 
+import math
+
 from ComponentBase import ComponentBase as Cmp
 from ConnectorBase import ConnectorBase as Con
+import FontMetrics
+
+try:
+  import numpy as np
+except ImportError:
+  np = None  # Pads are placed without numpy
+
+NUMPY_MIN_CONNECTORS = 64  # Use numpy for pad placement from this many pads
+GRID         = 7.5  # Schematic grid (mm)
+LABEL_OFFSET = 2    # Distance from body edge to label, see set_schematic_pos()
+LABEL_GAP    = 1.5  # Min space between labels and the part name (mm)
 
 class ComponentRect(Cmp):
   """ Represents a component with rectangular schematics. """
   
   def __init__(self):
     super().__init__()
-    self.p_spacing_h    = 2.540   # Pcb rectangular pattern width
-    self.p_spacing_v    = 2.540   # Pcb rectangular pattern width
+    self._p_spacing_h   = 2.540   # Pcb rectangular pattern width
+    self._p_spacing_v   = 2.540   # Pcb rectangular pattern width
     self._s_add_height  = 0       # Any extra height for schematic (multiples of 7,5mm)
     self._s_add_width   = 0       # Any extra width for schematic (multiples of 7,5mm)
     self._body_dim      = (0, 0)  # Width and height of schema body
@@ -49,8 +62,29 @@ class ComponentRect(Cmp):
   def part_name(self, value):
     self._part_name = value
     self.sch_layers["body"].elements[1].text = value
+    self.body_resize()
     
     
+  @property
+  def p_spacing_h(self):
+    return self._p_spacing_h
+    
+  @p_spacing_h.setter
+  def p_spacing_h(self, value):
+    self._p_spacing_h = value
+    self._pcb_dirty   = True
+
+
+  @property
+  def p_spacing_v(self):
+    return self._p_spacing_v
+    
+  @p_spacing_v.setter
+  def p_spacing_v(self, value):
+    self._p_spacing_v = value
+    self._pcb_dirty   = True
+
+
   @property
   def s_add_height(self):
     return self._s_add_height  
@@ -71,28 +105,51 @@ class ComponentRect(Cmp):
     self.body_resize()
 
     
-  def add_connector(self):
-    super().add_connector()
+  def add_connectors(self, n, states=None, row=None):
+    super().add_connectors(n, states, row)
     self.body_resize()
     
 
-  def remove_connector(self, n):
-    super().remove_connector(n)
+  def remove_connectors(self, rows):
+    super().remove_connectors(rows)
     self.body_resize()
 
     
   def body_resize(self):
-    """ Calculate rectangle height and width of schematic body rectangle. """
-    dims = {"E":0, "N":0, "W":0, "S":0}
+    """ 
+    Calculate rectangle height and width of schematic body rectangle. The
+    body fits the connectors and keeps the labels on opposite sides and the
+    part name (centred) apart. Label widths are from FontMetrics.
+    """
+    dims  = {"E":0, "N":0, "W":0, "S":0}
+    label = {"E":0, "N":0, "W":0, "S":0}  # Widest label on each side
+    fs    = Con.font_size_label
 
     for c in self.connectors:
-      dims[c.s_dir] += c.s_before + c.s_after
+      side = c.s_dir
+      dims[side] += c.s_before + c.s_after
+      w = FontMetrics.label_width(c.s_label, fs)
+      if w > label[side]:
+        label[side] = w
       
     height  = max(dims["E"], dims["W"]) + 1  # height
     width   = max(dims["N"], dims["S"]) + 1  # width
-    width   = 7.5 * (max(width, 2) + self._s_add_width)
-    height  = 7.5 * (max(height, 2) + self._s_add_height)
-    self._body_dim = (width, height)
+    
+    # Labels on opposite sides must not meet
+    width   = max(width, self._grid_units(label["E"] + label["W"]))
+    height  = max(height, self._grid_units(label["N"] + label["S"]))
+    # Labels must not reach the part name
+    name_w  = FontMetrics.text_width(self._part_name, Cmp.font_size_label)
+    name_h  = FontMetrics.text_height(Cmp.font_size_label)
+    width   = max(width, self._grid_units(name_w + 2*max(label["E"], label["W"])))
+    height  = max(height, self._grid_units(name_h + 2*max(label["N"], label["S"])))
+    
+    width   = GRID * (max(width, 2) + self._s_add_width)
+    height  = GRID * (max(height, 2) + self._s_add_height)
+    if self._body_dim == (width, height):
+      return  # Body size hasn't changed
+    self._body_dim  = (width, height)
+    self._sch_dirty = True  # All connectors must be moved
     
     stroke  = Cmp.stroke_width
     body    = self.sch_layers["body"].elements[0]
@@ -103,15 +160,34 @@ class ComponentRect(Cmp):
 
 
 
-  def build_schematic(self, bg=None):
-    """ Build the schematic svg. A background element bg may be added. """
-
-    if bg:
-      self.sch_layers["grid"].add(bg)
-    else:
-      del self.sch_layers["grid"].elements[:]
+  @staticmethod
+  def _grid_units(length):
+    """ 
+    Return the number of grid steps needed for length with labels at 
+    both ends, or 0 if length is 0.
+    """
+    if length == 0:
+      return 0
+    return math.ceil((length + 2*LABEL_OFFSET + LABEL_GAP) / GRID)
 
 
+  def build_schematic(self):
+    """ 
+    Build the schematic svg. Only connectors on sides with changed connectors
+    are moved, unless the body has been resized.
+    """
+    # Find sides where connectors need to be moved.
+    sides = self._sch_dirty_sides
+    for con in self.connectors:
+      if con.s_dirty:
+        sides.add(con.s_dir)
+        sides.add(con.s_side)
+    
+    if len(sides)>0:
+      self.body_resize()  # Sets _sch_dirty if body size changed
+    if self._sch_dirty:
+      sides = set(Con._dirs)
+    
     # Place svg connector on drawing.
     width, height = self._body_dim
     y     = 0
@@ -122,82 +198,40 @@ class ComponentRect(Cmp):
       side = con.s_dir
       ofs[side] += con.s_before*7.5  # Space before connector
       
-      # Place connectors (anti-clockewise).
-      if   side == Con.DIR_E:
-        y, x = (-height/2.0+ofs[side], width/2.0)
-      elif side == Con.DIR_N:
-        y, x = (height/2.0, width/2.0-ofs[side])
-      elif side == Con.DIR_W:
-        y, x = (height/2.0-ofs[side], -width/2.0)
-      elif side == Con.DIR_S:
-        y, x = (-height/2.0, -width/2.0+ofs[side])
-
-      con.set_schematic_pos(x, y)
+      if side in sides:
+        # Place connectors (anti-clockewise).
+        if   side == Con.DIR_E:
+          y, x = (-height/2.0+ofs[side], width/2.0)
+        elif side == Con.DIR_N:
+          y, x = (height/2.0, width/2.0-ofs[side])
+        elif side == Con.DIR_W:
+          y, x = (height/2.0-ofs[side], -width/2.0)
+        elif side == Con.DIR_S:
+          y, x = (-height/2.0, -width/2.0+ofs[side])
+        con.set_schematic_pos(x, y)
+        
       ofs[side] += con.s_after*7.5 
+      
+    # Svg elements of connectors are created here when first drawn
+    self.sch_layers["pins"].elements[:] = [c.s_svg for c in self.connectors]
+    self._sch_dirty       = False
+    self._sch_dirty_sides = set()
 
 
-  def build_pcb(self, bg=None):
-    """ Build the pcb svg. A background element bg may be added. """
+  def build_pcb(self):
+    """ 
+    Build the pcb svg. Connectors are only moved if any pcb direction, the
+    spacing or the number of connectors has changed.
+    """
     del self.drw_pcb.elements[:]
     del self.pcb_layers["copper0"].elements[:]
-    pcb = self.drw_pcb
-
-    if bg:
-      pcb.add(bg)    
-      grp = pcb.add(pcb.g(id="pcb"))
-    else:
-      # Layers copper1, copper0 must be root elements in fritzing svg
-      grp = pcb
-
-    # Get connectors for directions east, nort, west and south
-    conns = {Con.DIR_E : [],
-             Con.DIR_N : [],
-             Con.DIR_W : [],
-             Con.DIR_S : []}
-      
-    conns[Con.DIR_E] = [c for c in self.connectors if c.p_dir == Con.DIR_E]
-    conns[Con.DIR_N] = [c for c in self.connectors if c.p_dir == Con.DIR_N]
-    conns[Con.DIR_W] = [c for c in self.connectors if c.p_dir == Con.DIR_W]
-    conns[Con.DIR_S] = [c for c in self.connectors if c.p_dir == Con.DIR_S]
-
-    le = len(conns[Con.DIR_E])
-    ln = len(conns[Con.DIR_N])
-    lw = len(conns[Con.DIR_W])
-    ls = len(conns[Con.DIR_S])
-
-    dx = self.p_spacing_h if (ln+ls>0 or le*lw>0) else 0 
-    dy = self.p_spacing_v if (le+lw>0 or ln*ls>0) else 0 
-    
-    
-    # Expand vertical space to at least 2 if both S and N pads included
-    v = dy * max(le, lw, (ln*ls>0) * 2)
-    height = dx * max(ln, ls)  
-    
-    # Place connectors 
-    x0 = ( height+dx)*0.5
-    y0 = (-v+dy)*0.5
-    for c in conns[Con.DIR_E]:
-      c.set_pcb_pos(x0, y0)
-      y0 += dy 
-    
-    x0 = (-height-dx)*0.5
-    y0 = ( v-dy)*0.5
-    for c in conns[Con.DIR_W]:
-      c.set_pcb_pos(x0, y0)
-      y0 -= dy 
-
-    x0 = ( height-dx)*0.5
-    y0 = ( v-dy)*0.5
-    for c in conns[Con.DIR_N]:
-      c.set_pcb_pos(x0, y0)
-      x0 -= dx 
-
-    x0 = (-height+dx)*0.5
-    y0 = (-v+dy)*0.5
-    for c in conns[Con.DIR_S]:
-      c.set_pcb_pos(x0, y0)
-      x0 += dx 
+    # Layers copper1, copper0 must be root elements in fritzing svg
+    grp = self.drw_pcb
 
+    if self._pcb_dirty or any(self.table.p_dirty):
+      self._place_pcb_connectors()
+      self._pcb_dirty = False
+    self.pcb_layers["copper1"].elements[:] = [c.p_svg for c in self.connectors]
 
     grp.add(self.pcb_layers["silkscreen"])
 
@@ -214,6 +248,80 @@ class ComponentRect(Cmp):
     grp.add(self.pcb_layers["outline"])
 
 
+  def _place_pcb_connectors(self):
+    """
+    Place pcb connectors in a rectangular pattern. Connectors with a fixed
+    position (p_place) are placed there instead.
+    """
+    if np is not None and len(self.connectors) >= NUMPY_MIN_CONNECTORS:
+      xs, ys = self._pcb_positions_np()
+    else:
+      xs, ys = self._pcb_positions()
+    for c, x, y in zip(self.connectors, xs, ys):
+      place = c.p_place
+      if place is not None:
+        x, y = place
+      c.set_pcb_pos(x, y)
+
+
+  def _pcb_pattern(self, le, ln, lw, ls):
+    """
+    Return pad spacing and the start position on each side for a pattern
+    with le, ln, lw and ls pads on east, north, west and south side.
+    """
+    dx = self.p_spacing_h if (ln+ls>0 or le*lw>0) else 0 
+    dy = self.p_spacing_v if (le+lw>0 or ln*ls>0) else 0 
+    
+    # Expand vertical space to at least 2 if both S and N pads included
+    v = dy * max(le, lw, (ln*ls>0) * 2)
+    height = dx * max(ln, ls)  
+    
+    start = {Con.DIR_E : (( height+dx)*0.5, (-v+dy)*0.5),
+             Con.DIR_W : ((-height-dx)*0.5, ( v-dy)*0.5),
+             Con.DIR_N : (( height-dx)*0.5, ( v-dy)*0.5),
+             Con.DIR_S : ((-height+dx)*0.5, (-v+dy)*0.5)}
+    return dx, dy, start
+
+
+  def _pcb_positions(self):
+    """ Return lists of x and y positions of all pcb connectors. """
+    dirs    = [c.p_dir for c in self.connectors]
+    counts  = {d: dirs.count(d) for d in Con._dirs}
+    dx, dy, start = self._pcb_pattern(counts[Con.DIR_E], counts[Con.DIR_N], 
+                                      counts[Con.DIR_W], counts[Con.DIR_S])
+    # Step to next pad on each side
+    step  = {Con.DIR_E : (0, dy), Con.DIR_W : (0, -dy),
+             Con.DIR_N : (-dx, 0), Con.DIR_S : (dx, 0)}
+    
+    rank  = {Con.DIR_E : 0, Con.DIR_N : 0, Con.DIR_W : 0, Con.DIR_S : 0}
+    xs    = []
+    ys    = []
+    for d in dirs:
+      k = rank[d]
+      xs.append(start[d][0] + k*step[d][0])
+      ys.append(start[d][1] + k*step[d][1])
+      rank[d] += 1
+    return xs, ys
+
+
+  def _pcb_positions_np(self):
+    """ Return lists of x and y positions of all pcb connectors (numpy). """
+    dirs    = np.array([c.p_dir for c in self.connectors])
+    masks   = [dirs == d for d in (Con.DIR_E, Con.DIR_N, Con.DIR_W, Con.DIR_S)]
+    me, mn, mw, ms = masks
+    dx, dy, start = self._pcb_pattern(*[int(m.sum()) for m in masks])
+
+    # Number of previous pads on the same side
+    rank = np.zeros(len(dirs))
+    for m in masks:
+      rank[m] = np.arange(m.sum())
+
+    e, n, w, s = [start[d] for d in (Con.DIR_E, Con.DIR_N, Con.DIR_W, Con.DIR_S)]
+    xs = np.select(masks, [e[0], n[0] - rank*dx, w[0], s[0] + rank*dx])
+    ys = np.select(masks, [e[1] + rank*dy, n[1], w[1] - rank*dy, s[1]])
+    return xs.tolist(), ys.tolist()
+
+
   def get_state(self):
     """
     Return a dict describing the state of the component. Useful for saving 
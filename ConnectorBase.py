@@ -6,11 +6,20 @@ Created on Sat Sep 21 12:47:52 2013
 """
 
 import abc
+import collections
 import svgwrite as SW
 import math
 
+from ConnectorTable import ConnectorTable
+import FontMetrics
+
 class ConnectorBase:
-  """ This is the base class for all connectors (male, female and pads.) """
+  """
+  This is the base class for all connectors (male, female and pads.) A
+  connector is a view of a row in a ConnectorTable. Svg elements are
+  created from the row when first used by a drawing and dropped when an
+  attribute they show changes.
+  """
   font_family     = "OCRA"
   font_size_label = 3.5     # 3,5mm
   font_size_chr   = 2.5     # 2,5mm
@@ -31,195 +40,371 @@ class ConnectorBase:
              DIR_W: -180,
              DIR_S: -270}    
 
+  __slots__ = ("_table", "_i", "_s_svg", "_p_svg", "sch_index", "pcb_index")
+
   
-  def __init__(self, no):
-    self._no      = no      # Connector number
-    self.s_svg    = SW.container.Group()
-    self._init_svg()
-    self.p_svg    = SW.container.Group()
-    self._p_elm   = None  # Will be assigned when setting p_shape
-
-    # Setting a shape also sets, p_dim, p_pos, p_dir etc
-    self._p_shape = None
-    self.p_shape  = ConnectorBase.SHAPE_HOLE
-    self.s_pin    = -99 # Connector position on schematic
-    self.s_label  = "C" # Connector label
-    self.s_before = 1   # Space before connector
-    self.s_after  = 0   # Space after connector
-    self.s_dir    = "E" # Connector direction
-    
-    #print("Connector created")
-    
+  def __init__(self, no, table=None):
+    """ Add a row for connector no to table, or to a table of its own. """
+    if table is None:
+      table = ConnectorTable()
+    self._table     = table
+    self._i         = table.append(no)
+    self._s_svg     = None  # Created on first use, see s_svg
+    self._p_svg     = None
+    self.sch_index  = None  # HitIndex.GridIndex of the component, if any
+    self.pcb_index  = None
+
+
+  def detach(self):
+    """ Copy the row to a table of its own, e.g. before it is deleted. """
+    self._table = self._table.copy_row(self._i)
+    self._i     = 0
+
+
+  def release_svg(self):
+    """ Drop the svg elements. They are recreated when used. """
+    self._s_svg = None
+    self._p_svg = None
+
+
+  def _mark_pcb(self):
+    self._p_svg = None
+    if self.pcb_index is not None:
+      self.pcb_index.mark(self)
+
 
   @property
   def no(self):
-    return self._no
+    return self._table.no[self._i]
+
+
+  @property
+  def row(self):
+    """ Position of the connector in the component's connectors. """
+    return self._i
+
+
+  @property
+  def s_dirty(self):
+    return bool(self._table.s_dirty[self._i])
+
+  @s_dirty.setter
+  def s_dirty(self, value):
+    self._table.s_dirty[self._i] = bool(value)
+
+
+  @property
+  def p_dirty(self):
+    return bool(self._table.p_dirty[self._i])
+
+  @p_dirty.setter
+  def p_dirty(self, value):
+    self._table.p_dirty[self._i] = bool(value)
+
+
+  @property
+  def s_side(self):
+    """ Direction at last schematic placement, or None. """
+    k = self._table.s_side[self._i]
+    return ConnectorBase._dirs[k] if k >= 0 else None
 
 
   @property
   def p_dim(self):
-    return self._p_elm.dim
+    return (self._table.p_dim1[self._i], self._table.p_dim2[self._i])
 
   @p_dim.setter
   def p_dim(self, value):
-    self._p_elm.dim = value
+    self._table.p_dim1[self._i], self._table.p_dim2[self._i] = value
+    self._mark_pcb()
     
     
   @property
   def p_dir(self):
-    return self._p_elm.rot
+    return ConnectorBase._dirs[self._table.p_dir[self._i]]
 
   @p_dir.setter
   def p_dir(self, value):
-    self._p_elm.rot = value
+    value = value.upper()
+    if value not in ConnectorBase._dirs:
+      return
+    self._table.p_dir[self._i] = ConnectorBase._dirs.index(value)
+    self.p_dirty = True
+    self._mark_pcb()
 
   
   @property
   def p_pin(self):
-    return self._p_elm.num
+    return self._table.p_pin[self._i]
 
   @p_pin.setter
   def p_pin(self, value):
-    self._p_elm.num = value
+    self._table.p_pin[self._i] = int(value)
+    self._p_svg = None
 
 
   @property
   def p_pos(self):
-    return self._p_elm.pos
+    return (self._table.p_dx[self._i], self._table.p_dy[self._i])
 
   @p_pos.setter
   def p_pos(self, value):
-    self._p_elm.pos = value
+    self._table.p_dx[self._i], self._table.p_dy[self._i] = value
+    self._mark_pcb()
+
+
+  @property
+  def p_place(self):
+    """
+    Fixed pcb position (x, y), or None to place the pad in the pattern of the
+    component. The pad offset p_pos is added to either.
+    """
+    x = self._table.p_lx[self._i]
+    return None if math.isnan(x) else (x, self._table.p_ly[self._i])
+
+  @p_place.setter
+  def p_place(self, value):
+    if value is None:
+      value = (math.nan, math.nan)
+    self._table.p_lx[self._i], self._table.p_ly[self._i] = value
+    self.p_dirty = True
 
 
   @property
   def p_shape(self):
-    return self._p_shape
+    return ConnectorBase._shapes[self._table.p_shape[self._i]]
   
   @p_shape.setter
   def p_shape(self, value):
-    if self._p_shape == value:
-      return  # Shape hasn't changed
-    
-    del self.p_svg.elements[:]
-    if value == self.SHAPE_PAD: # Rectangular smd pad 
-      self._p_elm = self.p_svg.add(ConnSvgPad(source=self._p_elm, dim=(1.6, 1.0)))
-      if self._p_shape != self.SHAPE_PAD:
-        self.p_dim  = (1.6, 1.0)  # Overwrite previous tht dimensions.
-    elif value == self.SHAPE_HOLE: # Round tht hole
-      self._p_elm = self.p_svg.add(ConnSvgHole(source=self._p_elm, dim=(0.9, 1.9)))
-      if self._p_shape == self.SHAPE_PAD:
-        self.p_dim = (0.9, 1.9) # Overwrite previous smd dimensions.
-    elif value == self.SHAPE_RHOLE: # Rectangular tht hole
-      self._p_elm = self.p_svg.add(ConnSvgRhole(source=self._p_elm, dim=(0.9, 1.9)))
-      if self._p_shape == self.SHAPE_PAD:
-        self.p_dim = (0.9, 1.9) # Overwrite previous smd dimensions.
-    else:
+    if value not in ConnectorBase._shapes:
       raise Exception("Unsupported pcb connector shape ", str(value))    
-    self._p_shape = value  
+    old = self.p_shape
+    if old == value:
+      return  # Shape hasn't changed
+    self._table.p_shape[self._i] = ConnectorBase._shapes.index(value)
+    if value == self.SHAPE_PAD:
+      self.p_dim = (1.6, 1.0)  # Overwrite previous tht dimensions.
+    elif old == self.SHAPE_PAD:
+      self.p_dim = (0.9, 1.9)  # Overwrite previous smd dimensions.
+    self._mark_pcb()
     
 
   @property 
   def s_dir(self):
-    return self._s_dir
+    return ConnectorBase._dirs[self._table.s_dir[self._i]]
     
   @s_dir.setter
   def s_dir(self, value):
     value = value.upper()  
     if value not in ConnectorBase._dirs:
       return
-    self._s_dir = value
+    self._table.s_dir[self._i] = ConnectorBase._dirs.index(value)
+    self.s_dirty  = True
 
 
+  @property
+  def s_before(self):
+    return self._table.s_before[self._i]
+    
+  @s_before.setter
+  def s_before(self, value):
+    self._table.s_before[self._i] = int(value)
+    self.s_dirty  = True
+
+
+  @property
+  def s_after(self):
+    return self._table.s_after[self._i]
+    
+  @s_after.setter
+  def s_after(self, value):
+    self._table.s_after[self._i] = int(value)
+    self.s_dirty  = True
+
 
   @property
   def s_label(self):
-    return self._s_label
+    return self._table.s_label[self._i]
     
   @s_label.setter
   def s_label(self, value):
-    self._s_label = value
-    if len(value) > 0 and value[0] == "*":
-      self.s_svg.elements[1].text = ""
-    else:
-      self.s_svg.elements[1].text = value
-    
+    self._table.s_label[self._i] = value
+    self.s_dirty  = True  # Label width may change the body size
+    if self._s_svg is not None:
+      self._s_svg.elements[1].text = "" if value.startswith("*") else value
     
     
   @property
   def s_pin(self):
-    return self._s_pin
+    return self._table.s_pin[self._i]
     
-
   @s_pin.setter
   def s_pin(self, value):
-    self._s_pin = value
-    self.s_svg.elements[0].elements[0].attribs["id"] = "connector%dterminal" % value
-    self.s_svg.elements[0].elements[1].attribs["id"] = "connector%dpin" % value
-    self.s_svg.elements[1].text = "C%d" % int(value)
+    self._table.s_pin[self._i] = int(value)
+    self._s_svg = None
 
 
+  @property
+  def s_svg(self):
+    """ Svg group of the schematic pin and label. """
+    if self._s_svg is None:
+      self._s_svg = self._make_s_svg()
+    return self._s_svg
+
+
+  @property
+  def p_svg(self):
+    """ Svg group of the pcb pad. """
+    if self._p_svg is None:
+      self._p_svg = self._make_p_svg()
+    return self._p_svg
+
 
-  def _init_svg(self):
-    """ Initiate svg elements """
-    length      = 7.5
+  def _make_s_svg(self):
+    """ Create the schematic svg elements """
+    length  = 7.5
+    pin     = self.s_pin
+    label   = self.s_label
 
     # Create pin and terminal elements
-    g = self.s_svg.add(SW.container.Group())
+    s_svg = SW.container.Group()
+    g = s_svg.add(SW.container.Group())
     g.add(SW.shapes.Circle(center = (length, 0), 
                            r      = 0.4235, 
-                           id     = "def_terminal",
+                           id     = "connector%dterminal" % pin,
                            fill   = "none",
                            stroke = "none" ))
     g.add(SW.shapes.Line(start = (0, 0),
                          end   = (length, 0),
-                         id     = "def_pin"))
+                         id     = "connector%dpin" % pin))
 
     # Add text label 
-    t = self.s_svg.add(SW.text.Text("lbl", 
-                                    stroke      = "none", 
-                                    fill        = "#000000", 
-                                    font_size   = ConnectorBase.font_size_label )) 
+    t = s_svg.add(SW.text.Text("" if label.startswith("*") else label, 
+                               stroke      = "none", 
+                               fill        = "#000000", 
+                               font_size   = ConnectorBase.font_size_label )) 
     t.attribs["y"] = 1.25
-    
-    
-    
-  def set_pcb_pos(self, x=0, y=0):
-    try:
-      del self.p_svg.attribs["transform"]
-    except KeyError:
-      pass
-    self.p_svg.translate(round(x, 4), round(-y, 4))
-    
+    if self.s_side is not None:
+      self._place_s_svg(s_svg)
+    return s_svg
 
-      
-  def set_schematic_pos(self, dx=0, dy=0):
-    """ Get the svg for the connector """
-    rot     = {"E":0, "N":-90, "W":-180, "S":-270}
+
+  def _place_s_svg(self, s_svg):
+    """ Transform pin and label to the last schematic placement. """
+    side    = self.s_side
+    dx, dy  = self._table.s_x[self._i], self._table.s_y[self._i]
     
-    pin = self.s_svg.elements[0]  # pin element
+    pin     = s_svg.elements[0]  # pin element
     matrix  = _TransformMatrix(dx, -dy)
-    if rot[self.s_dir] != 0:
-      matrix.rot = rot[self.s_dir]
+    if ConnectorBase._rot[side] != 0:
+      matrix.rot = ConnectorBase._rot[side]
       
     pin.update({ "transform": matrix.tostring() })
 
-    t       = self.s_svg.elements[1]  # text element
+    t       = s_svg.elements[1]  # text element
     matrix  = _TransformMatrix(dx, -dy)
-    if self.s_dir == "E":     # East
+    if side == "E":     # East
       t.update({"text-anchor" : "end", "x" : -2})
-    elif self.s_dir == "N":   # North
+    elif side == "N":   # North
       t.update({"text-anchor" : "start", "x" : 2})
       matrix.rot = 90
-    elif self.s_dir == "W":   # West
+    elif side == "W":   # West
       t.update({"text-anchor" : "start", "x" : 2})
-    elif self.s_dir == "S":   # South
+    elif side == "S":   # South
       t.update({"text-anchor" : "end", "x" : -2})
       matrix.rot = 90
     
     t.update({ "transform": matrix.tostring() })
 
 
+  def _make_p_svg(self):
+    """ Create the pcb svg elements """
+    p_svg = SW.container.Group()
+    elm   = _shape_class[self.p_shape](dim=self.p_dim)
+    elm.num = self.p_pin
+    elm.pos = self.p_pos
+    elm.rot = self.p_dir
+    p_svg.add(elm)
+    pos = self._pcb_pos
+    if pos is not None:
+      p_svg.translate(pos[0], round(-pos[1], 4))
+    return p_svg
+    
+    
+  @property
+  def _pcb_pos(self):
+    """ Position at last pcb placement, or None. """
+    x = self._table.p_x[self._i]
+    return None if math.isnan(x) else (x, self._table.p_y[self._i])
+
+
+  def set_pcb_pos(self, x=0, y=0):
+    """ Place connector on pcb. The transform is only updated if moved. """
+    pos           = (round(x, 4), round(y, 4))
+    self.p_dirty  = False
+    if pos == self._pcb_pos:
+      return
+    self._table.p_x[self._i], self._table.p_y[self._i] = pos
+    if self._p_svg is not None:
+      self._p_svg.attribs.pop("transform", None)
+      self._p_svg.translate(pos[0], round(-y, 4))
+    if self.pcb_index is not None:
+      self.pcb_index.mark(self)
+    
+
+      
+  def set_schematic_pos(self, dx=0, dy=0):
+    """ Place connector on the schematic on its side s_dir. """
+    t = self._table
+    t.s_x[self._i], t.s_y[self._i] = dx, dy
+    t.s_side[self._i]  = t.s_dir[self._i]
+    self.s_dirty = False
+    if self._s_svg is not None:
+      self._place_s_svg(self._s_svg)
+    if self.sch_index is not None:
+      self.sch_index.mark(self)
+
+
+  def schematic_bounds(self):
+    """
+    Return (x0, y0, x1, y1) of the pin and label in schematic coordinates, or
+    None if not placed. Used by the hit test index.
+    """
+    side = self.s_side
+    if side is None:
+      return None
+    dx, dy    = self._table.s_x[self._i], self._table.s_y[self._i]
+    cos, sin  = _TransformMatrix._rotations[ConnectorBase._rot[side]]
+    box       = _box((cos, sin, -sin, cos, dx, -dy), 0, -0.5, 7.5, 0.5) # Pin
+
+    fs  = ConnectorBase.font_size_label
+    w   = FontMetrics.label_width(self.s_label, fs)
+    if w > 0:
+      # Label as placed by set_schematic_pos()
+      x0  = -2-w if side in ("E", "S") else 2
+      m   = (0, 1, -1, 0, dx, -dy) if side in ("N", "S") else \
+            (1, 0, 0, 1, dx, -dy)
+      t   = _box(m, x0, 1.25-FontMetrics.ASCENT*fs,
+                    x0+w, 1.25+FontMetrics.DESCENT*fs)
+      box = (min(box[0], t[0]), min(box[1], t[1]),
+             max(box[2], t[2]), max(box[3], t[3]))
+    return box
+
+
+  def pcb_bounds(self):
+    """
+    Return (x0, y0, x1, y1) of the pad in pcb svg coordinates, or None if not
+    placed. Used by the hit test index.
+    """
+    pos = self._pcb_pos
+    if pos is None:
+      return None
+    cos, sin  = _TransformMatrix._rotations[ConnectorBase._rot[self.p_dir]]
+    dx, dy    = self.p_pos
+    m         = (cos, sin, -sin, cos, pos[0]+dx, -pos[1]-dy)
+    return _box(m, *_shape_class[self.p_shape].extents_of(self.p_dim))
+
+
   def get_state(self):
     """
     Return a dict describing the state of the component. Useful for saving 
@@ -236,6 +421,7 @@ class ConnectorBase:
              "p_dim"    : self.p_dim,
              "p_dir"    : self.p_dir,
              "p_pin"    : self.p_pin,
+             "p_place"  : self.p_place,
              "p_pos"    : self.p_pos,
              "p_shape"  : self.p_shape
              }
@@ -246,16 +432,40 @@ class ConnectorBase:
     """ Set state as returned by get_state(). """
     #print("ConnectorBase.set_state")   
     #print("Set state for conn ", self.no)
+    if "p_shape" in state:
+      self.p_shape = state["p_shape"] # Set first, changing shape resets p_dim 
     for k,v in state.items():
-      if k == "no":
+      if k in ("no", "p_shape"):
         continue  # Attribute no is read only. Set at object creatinitiation.
       #print("  Set {:10s} to {:s}".format(k,str(v)))
       setattr(self, k, v)
 
 
     
+def _box(m, x0, y0, x1, y1):
+  """
+  Return the box (x0, y0, x1, y1) of a rectangle transformed by the matrix m.
+  The rotation of m must be a multiple of 90 degrees, as for connectors.
+  """
+  ax, ay = m[0]*x0 + m[2]*y0 + m[4], m[1]*x0 + m[3]*y0 + m[5]
+  bx, by = m[0]*x1 + m[2]*y1 + m[4], m[1]*x1 + m[3]*y1 + m[5]
+  return (min(ax, bx), min(ay, by), max(ax, bx), max(ay, by))
+
+
+
 class _TransformMatrix:
-  """ Class representing a svg transformation. """
+  """ 
+  Class representing a svg transformation. Rotation matrices for connector
+  directions are precomputed and formatted transform strings are cached 
+  (least recently used are evicted).
+  """
+  _rotations  = {r: (math.cos(r*math.pi/180.0), math.sin(r*math.pi/180.0))
+                 for r in (0, -90, -180, -270, 90)}
+  _cache      = collections.OrderedDict()  # (dx, dy, rot) -> string
+  cache_size  = 4096
+  hits        = 0
+  misses      = 0
+
   def __init__(self, dx=0, dy=0, rot=0):
     self._matrix = [0, 0, 0, 0, 0, 0] # matrix(a,b,c,d,e,f)
     self.dx      = dx
@@ -268,11 +478,16 @@ class _TransformMatrix:
     
   @rot.setter
   def rot(self, val):
-    self._r = val % 360
-    self._matrix[0] =  math.cos(val*math.pi/180.0)
-    self._matrix[1] =  math.sin(val*math.pi/180.0)
-    self._matrix[2] = -self._matrix[1]
-    self._matrix[3] =  self._matrix[0]
+    self._r   = val % 360
+    self._val = val
+    try:
+      cos, sin = _TransformMatrix._rotations[val]
+    except KeyError:
+      cos, sin = math.cos(val*math.pi/180.0), math.sin(val*math.pi/180.0)
+    self._matrix[0] =  cos
+    self._matrix[1] =  sin
+    self._matrix[2] = -sin
+    self._matrix[3] =  cos
 
   @property
   def dx(self):
@@ -284,13 +499,42 @@ class _TransformMatrix:
   @property
   def dy(self):
     return self._matrix[5]
-  @dx.setter
+  @dy.setter
   def dy(self, val):
     self._matrix[5] = val
     
   def tostring(self):
-    matrix = [str(round(v,4)) for v in self._matrix]
-    return "matrix(" + ", ".join(matrix) + ")"
+    cls   = _TransformMatrix
+    key   = (self._matrix[4], self._matrix[5], self._val)
+    cache = cls._cache
+    try:
+      txt = cache[key]
+    except KeyError:
+      cls.misses += 1
+      matrix = [str(round(v,4)) for v in self._matrix]
+      txt = "matrix(" + ", ".join(matrix) + ")"
+      cache[key] = txt
+      if len(cache) > cls.cache_size:
+        cache.popitem(last=False)
+    else:
+      cls.hits += 1
+      cache.move_to_end(key)
+    return txt
+
+  @classmethod
+  def cache_info(cls):
+    """ Return cache statistics as a dict. """
+    return {"hits"   : cls.hits,
+            "misses" : cls.misses,
+            "size"   : len(cls._cache),
+            "maxsize": cls.cache_size}
+
+  @classmethod
+  def cache_clear(cls):
+    """ Clear the cache and the statistics. """
+    cls._cache.clear()
+    cls.hits    = 0
+    cls.misses  = 0
       
 
     
@@ -395,6 +639,14 @@ class ConnSvgBase:
     """ Update dimensions of svg element. """
     pass
 
+  @abc.abstractclassmethod
+  def extents(self):
+    """
+    Return (x0, y0, x1, y1) of the element before its transform, including
+    stroke. Used by SvgBounds to avoid parsing the svg attributes.
+    """
+    pass
+
   @abc.abstractclassmethod
   def _update_num(self):
     """ Update id attribute of svg element. """
@@ -417,6 +669,15 @@ class ConnSvgHole(ConnSvgBase, SW.shapes.Circle):
                  "stroke_width" : sw})   
 
 
+  def extents(self):
+    return self.extents_of(self._dim)
+
+  @staticmethod
+  def extents_of(dim):
+    r = max(dim) / 2
+    return (-r, -r, r, r)
+
+
   def _update_num(self):
     """ Update id attribute of svg element. """
     self.update({"id" : "connector%dpad" % self._num})
@@ -447,6 +708,15 @@ class ConnSvgRhole(ConnSvgBase, SW.container.Group):
                               "stroke_width"  : sw })
   
   
+  def extents(self):
+    return self.extents_of(self._dim)
+
+  @staticmethod
+  def extents_of(dim):
+    r = max(dim) / 2
+    return (-r, -r, r, r)
+  
+  
   def _update_num(self):
     """ Update id attribute of svg element. """
     self.update({"id" : "connector%dpad" % self._num})
@@ -470,7 +740,23 @@ class ConnSvgPad(ConnSvgBase, SW.shapes.Rect):
                  "width"  : w})
 
 
+  def extents(self):
+    return self.extents_of(self._dim)
+
+  @staticmethod
+  def extents_of(dim):
+    w = round(dim[0], 3) / 2
+    h = round(dim[1], 3) / 2
+    return (-w, -h, w, h)
+
+
   def _update_num(self):
     """ Update id attribute of svg element. """
     self.update({"id" : "connector%dpad" % self._num})
 
+
+
+# Svg element class of each pcb shape
+_shape_class = {ConnectorBase.SHAPE_HOLE  : ConnSvgHole,
+                ConnectorBase.SHAPE_RHOLE : ConnSvgRhole,
+                ConnectorBase.SHAPE_PAD   : ConnSvgPad}
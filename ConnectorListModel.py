@@ -5,10 +5,66 @@ Created on Sat Sep 21 22:06:30 2013
 @author: snoozerworks
 """
 
+import ast
+import math
+import operator
+
 from PyQt4 import QtCore
 from PyQt4.QtCore import Qt, QAbstractTableModel
-#from ConnectorBase import ConnectorBase as Con
+from ConnectorBase import ConnectorBase as Con
 from ComponentBase import ComponentBase as Cmp
+from UndoStack import AttrEdit, RowsEdit
+
+
+# Largest power of ten a power in a formula may give
+MAX_POW10 = 308
+
+
+def _pow(a, b):
+  """ Return a**b. Raise OverflowError if the result exceeds 10**MAX_POW10. """
+  if a != 0 and b * math.log10(abs(a)) > MAX_POW10:
+    raise OverflowError("power too large")
+  return operator.pow(a, b)
+
+
+# Operators allowed in bulk edit formulas
+_operators = {ast.Add       : operator.add,
+              ast.Sub       : operator.sub,
+              ast.Mult      : operator.mul,
+              ast.Div       : operator.truediv,
+              ast.FloorDiv  : operator.floordiv,
+              ast.Mod       : operator.mod,
+              ast.Pow       : _pow,
+              ast.USub      : operator.neg,
+              ast.UAdd      : operator.pos}
+
+
+def eval_formula(formula, names):
+  """
+  Evaluate an arithmetic formula, e.g. "v*2" or "1.27*i". Names is a dict
+  of variables the formula may use. Raise ValueError if the formula is not
+  valid.
+  """
+  def _eval(node):
+    if isinstance(node, ast.Expression):
+      return _eval(node.body)
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)):
+      return node.value
+    if isinstance(node, ast.Name) and node.id in names:
+      return names[node.id]
+    if isinstance(node, ast.BinOp) and type(node.op) in _operators:
+      return _operators[type(node.op)](_eval(node.left), _eval(node.right))
+    if isinstance(node, ast.UnaryOp) and type(node.op) in _operators:
+      return _operators[type(node.op)](_eval(node.operand))
+    raise ValueError("Invalid formula " + formula)
+  try:
+    value = _eval(ast.parse(formula, mode="eval"))
+  except (SyntaxError, ZeroDivisionError, TypeError, OverflowError) as e:
+    raise ValueError("Invalid formula %s (%s)" % (formula, e))
+  if isinstance(value, complex):
+    raise ValueError("Invalid formula %s (complex result)" % formula)
+  return value
+
 
 
 class ConnectorListModel(QAbstractTableModel):
@@ -29,10 +85,34 @@ class ConnectorListModel(QAbstractTableModel):
               "p_dim2"  : " d2"}
               
               
+  # Columns where the value is not a plain connector attribute. Get and set
+  # functions are (connector) and (connector, value).
+  _getters = {"p_dim1"  : lambda con: float(con.p_dim[0]),
+              "p_dim2"  : lambda con: float(con.p_dim[1]),
+              "p_dx"    : lambda con: float(con.p_pos[0]),
+              "p_dy"    : lambda con: float(con.p_pos[1])}
+  _setters = {"p_dim1"  : lambda con, v: setattr(con, "p_dim", (v, con.p_dim[1])),
+              "p_dim2"  : lambda con, v: setattr(con, "p_dim", (con.p_dim[0], v)),
+              "p_dx"    : lambda con, v: setattr(con, "p_pos", (v, con.p_pos[1])),
+              "p_dy"    : lambda con, v: setattr(con, "p_pos", (con.p_pos[0], v))}
+  
+  # Other columns changed by setting a column. A new shape sets new pad size.
+  _affects = {"p_shape" : ("p_dim1", "p_dim2")}
+  
+  # Columns changing the schematic body size
+  _resizes = frozenset(("s_dir", "s_after", "s_before", "s_label"))
+  
+  _roles   = frozenset((Qt.DisplayRole, Qt.EditRole))  # Roles data() serves
+              
+              
   def __init__(self):
     super().__init__()
     self.cmp      = None
     self._col_map = {}
+    self._get     = []  # Get function per column
+    self._set     = []  # Set function per column
+    self._span    = []  # First and last column changed by setting column
+    self.undo_stack = None  # UndoStack recording edits, if any
     
 
   def set_col_mapping(self, mapping):
@@ -45,15 +125,61 @@ class ConnectorListModel(QAbstractTableModel):
     if l1>l2:
       # Remove from column l2 to l1-1
       self.beginRemoveColumns(QtCore.QModelIndex(), l2, l1-1)
-      self._col_map = mapping
+      self._set_columns(mapping)
       self.endRemoveColumns()
     elif l1<l2:
       # Add from column l1 to l2-1
       self.beginInsertColumns(QtCore.QModelIndex(), l1, l2-1)
-      self._col_map = mapping
+      self._set_columns(mapping)
       self.endInsertColumns()
-    else:
-      pass
+    elif mapping != self._col_map:
+      self._set_columns(mapping)
+      self.headerDataChanged.emit(Qt.Horizontal, 0, l2-1)
+      if self.cmp is not None and self.rowCount() > 0:
+        self.dataChanged.emit(self.index(0, 0), 
+                              self.index(self.rowCount()-1, l2-1))
+
+
+  def _set_columns(self, mapping):
+    """ Set column mapping and build the get and set functions of columns. """
+    self._col_map = mapping
+    names         = [mapping[i] for i in range(len(mapping))]
+    self._get     = [self._attr_get(n) for n in names]
+    self._set     = [self._attr_set(n) for n in names]
+    self._span    = []
+    for i, n in enumerate(names):
+      cols = [i] + [names.index(a) for a in self._affects.get(n, ()) 
+                    if a in names]
+      self._span.append((min(cols), max(cols)))
+
+
+  def _attr_get(self, name):
+    """ Return get function of column or attribute name. """
+    return self._getters.get(name) or operator.attrgetter(name)
+
+
+  def _attr_set(self, name):
+    """ Return set function of column or attribute name. """
+    return (self._setters.get(name) or 
+            (lambda con, v: setattr(con, name, v)))
+
+
+  def _set_recorded(self, r, col, value, changes):
+    """
+    Set cell (r, col) to value. Append (row, attribute, old, new) of the
+    column and any attributes it affects to the list changes.
+    """
+    con     = self.cmp.connectors[r]
+    names   = (self._col_map[col],) + self._affects.get(self._col_map[col], ())
+    old     = [self._attr_get(n)(con) for n in names]
+    self._set[col](con, value)
+    changes.extend((r, n, o, self._attr_get(n)(con)) 
+                   for n, o in zip(names, old))
+
+
+  def _record(self, edit):
+    if self.undo_stack is not None:
+      self.undo_stack.push(edit)
 
 
   def set_component(self, cmp):
@@ -74,28 +200,14 @@ class ConnectorListModel(QAbstractTableModel):
 
   
   def data(self, index, role = Qt.DisplayRole):
-    if role not in (Qt.DisplayRole, Qt.EditRole):
+    if role not in self._roles:
       return None
       
     if not index.isValid():
       print("data() - invalid index given")
       return None
 
-    r     = index.row()
-    c     = self._col_map[index.column()]
-    conn  = self.cmp.connectors[r]
-    
-    if c=="p_dim1":
-      return float(conn.p_dim[0])
-    elif c=="p_dim2":
-      return float(conn.p_dim[1])      
-    elif c=="p_dx":
-      return float(conn.p_pos[0])      
-    elif c=="p_dy" :
-      return float(conn.p_pos[1])      
-
-    else:
-      return getattr(conn, c)
+    return self._get[index.column()](self.cmp.connectors[index.row()])
 
     
   def headerData(self, section, orientation, role):
@@ -116,43 +228,178 @@ class ConnectorListModel(QAbstractTableModel):
     if index.isValid()==False or role!=Qt.EditRole:
       return False
     
-    r   = index.row()
-    c   = self._col_map[index.column()]
-    con = self.cmp.connectors[r]
-    if c == "p_dim1":
-      con.p_dim = (val, con.p_dim[1])
-    elif c == "p_dim2":
-      con.p_dim = (con.p_dim[0], val)
-    elif c == "p_dx":
-      con.p_pos = (val, con.p_pos[1])
-    elif c == "p_dy":
-      con.p_pos = (con.p_pos[0], val)
-    else:
-      setattr(con, c, val)
-
-    if c in ("s_dir", "s_after", "s_before"):
-      self.cmp.body_resize()
+    r       = index.row()
+    col     = index.column()
+    changes = []
+    self._set_recorded(r, col, val, changes)
+    self._record(AttrEdit(self, changes))
 
+    if self._col_map[col] in self._resizes:
+      self.cmp.body_resize()
 
-    index_last = self.index(r,self.columnCount()-1)
-    self.dataChanged.emit(index, index_last)
+    # Signal change of the cell and any cells it affects on the same row
+    first, last = self._span[col]
+    self.dataChanged.emit(self.index(r, first), self.index(r, last))
     return True   
   
   
+  # Bulk editing. Cells are given as (row, column) tuples.
+
+  def set_cells(self, cells):
+    """
+    Set many cells in one transaction. Cells is a list of (row, column, 
+    value). Text values are converted to the type of the column. If any
+    value can not be set no cell is changed and ValueError is raised. One
+    dataChanged covering all cells is emitted.
+    """
+    if len(cells) == 0:
+      return False
+    cons    = self.cmp.connectors
+    cols    = range(self.columnCount())
+    undo    = {}  # Row: values of all columns before the change
+    changes = []
+    try:
+      for r, c, v in cells:
+        con = cons[r]
+        if r not in undo:
+          undo[r] = [self._get[i](con) for i in cols]
+        self._set_recorded(r, c, self._convert(c, self._get[c](con), v), 
+                           changes)
+    except Exception as e:
+      for r, values in undo.items():
+        for i in cols:
+          self._set[i](cons[r], values[i])
+      raise ValueError("Can't set %s of row %d to %s (%s)" % (
+                       self.headings[self._col_map[c]], r, str(v), e))
+
+    self._record(AttrEdit(self, changes))
+
+    if any(self._col_map[c] in self._resizes for _, c, _ in cells):
+      self.cmp.body_resize()
+    
+    rows  = [r for r, _, _ in cells]
+    first = min(self._span[c][0] for _, c, _ in cells)
+    last  = max(self._span[c][1] for _, c, _ in cells)
+    self.dataChanged.emit(self.index(min(rows), first), 
+                          self.index(max(rows), last))
+    return True
+
+
+  def _convert(self, col, old, value):
+    """ Convert value (as text or number) to the type of the old value. """
+    name = self._col_map[col]
+    if name in ("s_dir", "p_dir"):
+      value = str(value).strip().upper()
+      if value not in Con._dirs:
+        raise ValueError("Unknown direction")
+    elif name == "p_shape":
+      value = str(value).strip()
+      if value not in Con._shapes:
+        raise ValueError("Unknown shape")
+    elif isinstance(old, str):
+      value = str(value)
+    elif isinstance(value, str):
+      value = float(value.strip().replace(",", "."))
+    if isinstance(old, int) and not isinstance(value, str):
+      if value != int(value):
+        raise ValueError("Not an integer")
+      value = int(value)
+    return value
+
+
+  def set_value(self, cells, value):
+    """ Set cells to value. """
+    return self.set_cells([(r, c, value) for r, c in cells])
+
+
+  def apply_formula(self, cells, formula):
+    """
+    Set cells to the result of formula. Numeric columns take an arithmetic
+    expression (see eval_formula()), text columns a format string, e.g.
+    "P{n}". Variables are v (current value), i (position of the cell in the
+    column, in row order), row and n (connector number).
+    """
+    new   = []
+    pos   = {}  # Column: number of cells so far
+    for r, c in sorted(cells):
+      i     = pos.get(c, 0)
+      pos[c] = i + 1
+      con   = self.cmp.connectors[r]
+      names = {"v": self._get[c](con), "i": i, "row": r, "n": con.no}
+      if isinstance(names["v"], str):
+        try:
+          value = formula.format(**names)
+        except (KeyError, IndexError, ValueError, AttributeError,
+                TypeError) as e:
+          raise ValueError("Invalid format %s (%s)" % (formula, e))
+      else:
+        value = eval_formula(formula, names)
+      new.append((r, c, value))
+    return self.set_cells(new)
+
+
+  def paste(self, row, col, text):
+    """
+    Set cells from text, e.g. copied from a spreadsheet. Lines are rows and
+    tabs separate columns. The first value is put in cell (row, col). Values
+    outside the table are ignored.
+    """
+    cells = []
+    for i, line in enumerate(text.rstrip("\r\n").splitlines()):
+      for j, value in enumerate(line.split("\t")):
+        if row+i < self.rowCount() and col+j < self.columnCount():
+          cells.append((row+i, col+j, value))
+    return self.set_cells(cells)
+
+
+  def set_attrs(self, changes):
+    """
+    Set connector attributes, shown or not. Changes is a list of (row,
+    attribute, value), where attribute is a connector attribute or a column
+    name. Used by undo and redo. Edits are not recorded.
+    """
+    cons = self.cmp.connectors
+    for r, name, v in changes:
+      self._attr_set(name)(cons[r], v)
+    if any(name in self._resizes for _, name, _ in changes):
+      self.cmp.body_resize()
+    rows = [r for r, _, _ in changes]
+    self.dataChanged.emit(self.index(min(rows), 0), 
+                          self.index(max(rows), self.columnCount()-1))
+
+
   def flags(self, index):
     return  Qt.ItemIsEditable | Qt.ItemIsEnabled | Qt.ItemIsSelectable
   
   
-  def insertRow(self, row, parent=QtCore.QModelIndex()):    
-    self.beginInsertRows(parent, row, row)
-    self.cmp.add_connector()   
+  def insertRows(self, row, count, parent=QtCore.QModelIndex()):    
+    """ Add count connectors. Connectors are always added last. """
+    if count<1:
+      return False
+    row = self.rowCount()
+    self.beginInsertRows(parent, row, row+count-1)
+    self.cmp.add_connectors(count)   
+    self.endInsertRows()
+    self._record(RowsEdit(self, row, count))
+    return True
+  
+  
+  def insert_connectors(self, row, states):
+    """ Insert connectors with states (see ConnectorBase.get_state()) at row. """
+    self.beginInsertRows(QtCore.QModelIndex(), row, row+len(states)-1)
+    self.cmp.add_connectors(len(states), states, row)
     self.endInsertRows()
+    self._record(RowsEdit(self, row, len(states)))
     return True
   
   
-  def removeRow(self, pos, parent=QtCore.QModelIndex()):
-    self.beginRemoveRows(parent, pos, pos)
-    self.cmp.remove_connector(pos)
+  def removeRows(self, row, count, parent=QtCore.QModelIndex()):
+    """ Remove count connectors starting at row. """
+    if count<1 or row<0 or row+count>self.rowCount():
+      return False
+    states = [c.get_state() for c in self.cmp.connectors[row:row+count]]
+    self.beginRemoveRows(parent, row, row+count-1)
+    self.cmp.remove_connectors(range(row, row+count))
     self.endRemoveRows()
+    self._record(RowsEdit(self, row, count, states))
     return True
-
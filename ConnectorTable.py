@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""
+Array backed storage of connector attributes. A ConnectorTable holds one
+typed array per attribute, with one row per connector. ConnectorBase objects
+are views of a row and only hold the svg elements of the connector, which
+are created when a drawing is built (see ComponentBase.build_schematic()).
+
+Directions and shapes are stored as indices in ConnectorBase._dirs and
+ConnectorBase._shapes. Placements are NaN and s_side -1 until a connector
+has been placed.
+"""
+
+from array import array
+
+NAN = float("nan")
+
+
+class ConnectorTable:
+  """ Table of connector attributes stored column wise in typed arrays. """
+  # Columns as name: (array type code, value of a new row)
+  _columns = {"no"        : ("l", 0),
+              "s_pin"     : ("l", -99),
+              "s_dir"     : ("b", 0),
+              "s_before"  : ("l", 1),
+              "s_after"   : ("l", 0),
+              "s_side"    : ("b", -1),  # Direction at last placement
+              "s_x"       : ("d", NAN), # Position at last placement
+              "s_y"       : ("d", NAN),
+              "s_dirty"   : ("B", 1),   # Schematic position needs update
+              "p_pin"     : ("l", 0),
+              "p_dir"     : ("b", 0),
+              "p_shape"   : ("b", 0),
+              "p_dim1"    : ("d", 0.9),
+              "p_dim2"    : ("d", 1.9),
+              "p_dx"      : ("d", 0.0), # Pad offset
+              "p_dy"      : ("d", 0.0),
+              "p_lx"      : ("d", NAN), # Fixed position (p_place) or NaN
+              "p_ly"      : ("d", NAN),
+              "p_x"       : ("d", NAN), # Position at last placement
+              "p_y"       : ("d", NAN),
+              "p_dirty"   : ("B", 1)}   # Pcb position needs update
+
+  def __init__(self):
+    for k, (code, _) in ConnectorTable._columns.items():
+      setattr(self, k, array(code))
+    self.s_label = []
+
+
+  def __len__(self):
+    return len(self.no)
+
+
+  def append(self, no):
+    """ Append a row with default values for connector no. Return its index. """
+    for k, (_, value) in ConnectorTable._columns.items():
+      getattr(self, k).append(value)
+    self.no[-1] = no
+    self.s_label.append("C")
+    return len(self.no) - 1
+
+
+  def delete(self, rows):
+    """ Delete the rows in the set rows. """
+    keep = [i for i in range(len(self)) if i not in rows]
+    for k, (code, _) in ConnectorTable._columns.items():
+      col = getattr(self, k)
+      setattr(self, k, array(code, [col[i] for i in keep]))
+    self.s_label = [self.s_label[i] for i in keep]
+
+
+  def reorder(self, order):
+    """ Reorder rows, so that row i is the current row order[i]. """
+    for k, (code, _) in ConnectorTable._columns.items():
+      col = getattr(self, k)
+      setattr(self, k, array(code, [col[i] for i in order]))
+    self.s_label = [self.s_label[i] for i in order]
+
+
+  def copy_row(self, i):
+    """ Return a new table with a copy of row i. """
+    table = ConnectorTable()
+    for k in ConnectorTable._columns:
+      getattr(table, k).append(getattr(self, k)[i])
+    table.s_label.append(self.s_label[i])
+    return table
@@ -0,0 +1,196 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+Content addressed cache of exported component svgs. The key of a part is a
+hash of its canonical state (as returned by get_state()), the generator
+version and the style defaults. Exported svgs are stored in the cache
+directory under their key and copied to the output when a part with the
+same key is exported again. An output directory also gets a stamp file with
+the key, so unchanged parts are neither rebuilt nor rewritten.
+
+Entries are added without checking the size limit. After a batch of exports
+evict() removes the least recently used entries until the cache fits its size
+limit, so the cache directory is scanned once per batch rather than once per
+added part.
+
+Usage:
+  python ExportCache.py stats <cache directory>
+  python ExportCache.py clear <cache directory>
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+from ComponentBase import ComponentBase as Cmp
+from ConnectorBase import ConnectorBase as Con
+
+# Change when the generated svgs change for the same component state
+GENERATOR_VERSION = 6
+
+FILES       = ("schematic.svg", "pcb.svg")
+STAMP_FNAME = ".export-key"
+
+
+def _style():
+  """ Style defaults affecting the generated svgs. """
+  return {"drw_sch"           : Cmp.DRW_SCH_DEFAULTS,
+          "font_size_label"   : Cmp.font_size_label,
+          "stroke_width"      : Cmp.stroke_width,
+          "con_font_family"   : Con.font_family,
+          "con_font_size"     : Con.font_size_label}
+
+
+def state_hash(state):
+  """ Return the cache key (hex string) of a component state. """
+  data = {"version" : GENERATOR_VERSION,
+          "style"   : _style(),
+          "state"   : state}
+  txt = json.dumps(data, sort_keys=True, separators=(",", ":"), default=str)
+  return hashlib.sha256(txt.encode("utf-8")).hexdigest()
+
+
+class ExportCache:
+  """ Directory of exported svgs keyed on component state hash. """
+
+  def __init__(self, directory, max_size=512*1024*1024):
+    """ Max_size is the size limit in bytes. """
+    self.directory  = directory
+    self.max_size   = max_size
+    self.hits       = 0   # Found in output directory or in cache
+    self.misses     = 0
+    os.makedirs(directory, exist_ok=True)
+
+
+  def _entry(self, key):
+    return os.path.join(self.directory, key[:2], key)
+
+
+  def fetch(self, key, dest):
+    """
+    Make dest hold the svgs for key. Return True if the svgs were already in
+    dest or could be copied from the cache, False if they must be built.
+    """
+    try:
+      with open(os.path.join(dest, STAMP_FNAME)) as f:
+        if f.read().strip() == key and all(
+              os.path.exists(os.path.join(dest, n)) for n in FILES):
+          self.hits += 1
+          return True
+    except OSError:
+      pass
+
+    entry = self._entry(key)
+    try:
+      os.makedirs(dest, exist_ok=True)
+      for n in FILES:
+        shutil.copyfile(os.path.join(entry, n), os.path.join(dest, n))
+      os.utime(entry)  # Mark as recently used
+    except OSError:
+      self.misses += 1
+      try:
+        os.remove(os.path.join(dest, STAMP_FNAME))  # Stamp is stale
+      except OSError:
+        pass
+      return False
+    self._stamp(key, dest)
+    self.hits += 1
+    return True
+
+
+  def store(self, key, src):
+    """
+    Add the svgs in directory src to the cache with key. Does not evict, call
+    evict() when done adding entries.
+    """
+    entry = self._entry(key)
+    self._stamp(key, src)
+    if os.path.isdir(entry):
+      return
+    os.makedirs(os.path.dirname(entry), exist_ok=True)
+    # Copy to a temporary directory first, other processes may read the entry
+    tmp = tempfile.mkdtemp(dir=os.path.dirname(entry))
+    try:
+      for n in FILES:
+        shutil.copyfile(os.path.join(src, n), os.path.join(tmp, n))
+      os.rename(tmp, entry)
+    except OSError:
+      shutil.rmtree(tmp, ignore_errors=True)  # Entry added by other process
+
+
+  def _stamp(self, key, dest):
+    with open(os.path.join(dest, STAMP_FNAME), mode="w") as f:
+      f.write(key)
+
+
+  def entries(self):
+    """ Return a list of (last use time, size, path) of all cache entries. """
+    out = []
+    for sub in os.scandir(self.directory):
+      if not sub.is_dir():
+        continue
+      for entry in os.scandir(sub.path):
+        try:
+          size = sum(os.path.getsize(os.path.join(entry.path, n)) for n in FILES)
+          out.append((entry.stat().st_mtime, size, entry.path))
+        except OSError:
+          pass  # Entry removed or being written
+    return out
+
+
+  def evict(self):
+    """
+    Remove least recently used entries until the cache fits max_size. Return
+    the number of removed entries.
+    """
+    entries = self.entries()
+    total   = sum(e[1] for e in entries)
+    removed = 0
+    if total <= self.max_size:
+      return removed
+    for mtime, size, path in sorted(entries):
+      shutil.rmtree(path, ignore_errors=True)
+      removed += 1
+      total   -= size
+      if total <= self.max_size:
+        break
+    return removed
+
+
+  def stats(self):
+    """ Return a dict with number of entries, size and hit counters. """
+    entries = self.entries()
+    return {"entries"   : len(entries),
+            "size"      : sum(e[1] for e in entries),
+            "max_size"  : self.max_size,
+            "hits"      : self.hits,
+            "misses"    : self.misses}
+
+
+  def clear(self):
+    """ Remove all cache entries. """
+    for sub in os.scandir(self.directory):
+      if sub.is_dir():
+        shutil.rmtree(sub.path, ignore_errors=True)
+
+
+
+def main(argv=None):
+  argv = sys.argv[1:] if argv is None else argv
+  if len(argv) != 2 or argv[0] not in ("stats", "clear"):
+    print(__doc__)
+    return 2
+  cache = ExportCache(argv[1])
+  if argv[0] == "stats":
+    s = cache.stats()
+    print("{:d} entries, {:0.1f} MB".format(s["entries"], s["size"]/2**20))
+  else:
+    cache.clear()
+  return 0
+
+
+if __name__ == "__main__":
+  sys.exit(main())
@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+"""
+Text metrics of the OCRA font used for labels, without Qt. Widths are in the
+units of the font size, e.g. mm for a size in mm.
+"""
+
+UNITS_PER_EM  = 1000
+ASCENT        = 0.75  # Height above baseline (em)
+DESCENT       = 0.25  # Depth below baseline (em)
+# OCR-A is monospaced, all glyphs have this advance (font units). Characters
+# not in the font are assumed to have the same advance.
+OCRA_ADVANCE  = 600
+
+
+def text_width(txt, size):
+  """ Return the width of txt in OCRA at font size. """
+  return len(txt) * OCRA_ADVANCE * size / UNITS_PER_EM
+
+
+def label_width(label, size):
+  """
+  Return the width of connector label at font size. Labels starting with
+  '*' are not shown and have zero width.
+  """
+  if label.startswith("*"):
+    return 0.0
+  return text_width(label, size)
+
+
+def text_height(size):
+  """ Return the height of a line of text at font size. """
+  return (ASCENT + DESCENT) * size
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""
+Fritzing part bundles (.fzpz). A bundle is a zip archive with the part
+description (.fzp) and the svgs of the views. The fzp is generated from the
+component connectors. Svg ids of connectors are connectorNpin and
+connectorNterminal (schematic) and connectorNpad (pcb).
+
+The archive entries are streamed to the file object; no temporary files are
+written. The schematic svg is also used for the breadboard and icon views.
+Does not import PyQt4.
+"""
+
+import hashlib
+import json
+import re
+import time
+import xml.etree.ElementTree as ET
+import zipfile
+
+from ComponentBase import ComponentBase as Cmp
+import SvgBounds
+import SvgWriter
+
+FRITZING_VERSION = "0.8.0"
+
+
+def file_name(cmp):
+  """ Return the base file name of the part, from the part name. """
+  return re.sub(r"[^A-Za-z0-9_.-]+", "_", cmp.part_name).strip("_") or "part"
+
+
+def module_id(cmp):
+  """ Return a module id, unique for the part name and state. """
+  state = json.dumps(cmp.get_state(), sort_keys=True, default=str)
+  digest = hashlib.sha1(state.encode("utf-8")).hexdigest()
+  return "%s_%s" % (file_name(cmp), digest[:32])
+
+
+def svg_names(cmp):
+  """ Return dict view: svg file name as referenced in the fzp. """
+  name = file_name(cmp)
+  return {"breadboard" : "breadboard/%s_breadboard.svg" % name,
+          "schematic"  : "schematic/%s_schematic.svg" % name,
+          "pcb"        : "pcb/%s_pcb.svg" % name}
+
+
+def _layers(cmp):
+  """ Return pcb copper layers used by the connectors. """
+  if cmp.mount == Cmp.MOUNT_THT:
+    return ("copper0", "copper1")
+  return ("copper1",)
+
+
+def fzp(cmp):
+  """ Return the fzp description of cmp as an ElementTree. """
+  svgs    = svg_names(cmp)
+  copper  = _layers(cmp)
+  module  = ET.Element("module", fritzingVersion=FRITZING_VERSION,
+                       moduleId=module_id(cmp))
+  ET.SubElement(module, "version").text = "1"
+  ET.SubElement(module, "title").text   = cmp.part_name
+  ET.SubElement(module, "label").text   = "IC"
+  ET.SubElement(module, "date").text    = time.strftime("%Y-%m-%d")
+  props = ET.SubElement(module, "properties")
+  ET.SubElement(props, "property", name="family").text = cmp.part_name
+  ET.SubElement(module, "description").text = cmp.part_name
+
+  views = ET.SubElement(module, "views")
+  for view, image, layers in (
+        ("iconView",        svgs["breadboard"], ("icon",)),
+        ("breadboardView",  svgs["breadboard"], ("breadboard",)),
+        ("schematicView",   svgs["schematic"],  ("schematic",)),
+        ("pcbView",         svgs["pcb"],        copper + ("silkscreen",))):
+    elm = ET.SubElement(ET.SubElement(views, view), "layers", image=image)
+    for layer in layers:
+      ET.SubElement(elm, "layer", layerId=layer)
+
+  conns = ET.SubElement(module, "connectors")
+  ctype = "male" if cmp.mount == Cmp.MOUNT_THT else "pad"
+  for con in cmp.connectors:
+    c = ET.SubElement(conns, "connector", id="connector%d" % con.no,
+                      name=con.s_label, type=ctype)
+    ET.SubElement(c, "description").text = con.s_label
+    views = ET.SubElement(c, "views")
+    pin   = "connector%dpin" % con.s_pin
+    ET.SubElement(ET.SubElement(views, "breadboardView"), "p",
+                  layer="breadboard", svgId=pin)
+    ET.SubElement(ET.SubElement(views, "schematicView"), "p",
+                  layer="schematic", svgId=pin,
+                  terminalId="connector%dterminal" % con.s_pin)
+    pcb = ET.SubElement(views, "pcbView")
+    for layer in copper:
+      ET.SubElement(pcb, "p", layer=layer, svgId="connector%dpad" % con.p_pin)
+  return ET.ElementTree(module)
+
+
+def build(cmp):
+  """ Build schematic and pcb drawings of cmp, ready for writing. """
+  cmp.build_schematic()
+  SvgBounds.set_viewbox(cmp.drw_sch, "schematic")
+  cmp.build_pcb()
+  SvgBounds.set_viewbox(cmp.drw_pcb)
+
+
+def write(cmp, fileobj):
+  """ Build cmp and write it as a fzpz archive to the binary fileobj. """
+  build(cmp)
+  name = file_name(cmp)
+  svgs = svg_names(cmp)
+  with zipfile.ZipFile(fileobj, mode="w", compression=zipfile.ZIP_DEFLATED) as z:
+    with z.open("part.%s.fzp" % name, mode="w") as f:
+      fzp(cmp).write(f, encoding="utf-8", xml_declaration=True)
+    for view, dwg in (("breadboard", cmp.drw_sch),
+                      ("schematic",  cmp.drw_sch),
+                      ("pcb",        cmp.drw_pcb)):
+      # Fritzing expects svgs as svg.<view>.<file name>
+      with z.open("svg." + svgs[view].replace("/", "."), mode="w") as f:
+        SvgWriter.write(dwg, f)
+
+
+def save(cmp, filename):
+  """ Build cmp and save it as a fzpz archive to filename. """
+  with open(filename, mode="wb") as f:
+    write(cmp, f)
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""
+Uniform grid index of bounding boxes, for hit testing connectors on the
+canvas. Each key (a connector) is stored in the grid cells its box overlaps,
+so a point query only tests the few boxes in one cell instead of all
+connectors.
+
+Keys are marked by mark() when moved, e.g. by ConnectorBase.set_pcb_pos().
+Boxes of marked keys are computed by the bounds function and reindexed on
+the next query, so placing connectors costs no more than adding them to a
+set. Does not import PyQt4.
+"""
+
+import math
+
+
+class GridIndex:
+  """ Uniform grid of boxes (x0, y0, x1, y1) by key. """
+
+  def __init__(self, bounds, cell=2.54):
+    """
+    Bounds(key) returns the box of key, or None if it has no extent. Cell is
+    the grid cell size, about the size of a box.
+    """
+    self.cell     = cell
+    self._bounds  = bounds
+    self._boxes   = {}    # key: box
+    self._cells   = {}    # (i, j): set of keys
+    self._marked  = set() # Keys to reindex before the next query
+
+
+  def __len__(self):
+    self._update()
+    return len(self._boxes)
+
+
+  def mark(self, key):
+    """ Reindex key before the next query. """
+    self._marked.add(key)
+
+
+  def remove(self, key):
+    """ Remove key from the index. """
+    self._marked.discard(key)
+    box = self._boxes.pop(key, None)
+    if box is not None:
+      for ij in self._span(box):
+        self._cells[ij].discard(key)
+
+
+  def clear(self):
+    self._boxes.clear()
+    self._cells.clear()
+    self._marked.clear()
+
+
+  def bounds(self, key):
+    """ Return the indexed box of key or None. """
+    self._update()
+    return self._boxes.get(key)
+
+
+  def _span(self, box, tol=0.0):
+    """ Yield cells overlapped by box expanded by tol. """
+    c   = self.cell
+    i0  = math.floor((box[0]-tol) / c)
+    i1  = math.floor((box[2]+tol) / c)
+    j0  = math.floor((box[1]-tol) / c)
+    j1  = math.floor((box[3]+tol) / c)
+    for i in range(i0, i1+1):
+      for j in range(j0, j1+1):
+        yield (i, j)
+
+
+  def _update(self):
+    """ Reindex marked keys. """
+    if not self._marked:
+      return
+    marked, self._marked = self._marked, set()
+    for key in marked:
+      box = self._bounds(key)
+      if box == self._boxes.get(key):
+        continue
+      self.remove(key)
+      if box is None:
+        continue
+      self._boxes[key] = box
+      for ij in self._span(box):
+        keys = self._cells.get(ij)
+        if keys is None:
+          keys = self._cells[ij] = set()
+        keys.add(key)
+
+
+  def query(self, x0, y0, x1, y1):
+    """ Return a set of keys with boxes overlapping (x0, y0)-(x1, y1). """
+    self._update()
+    found = set()
+    for ij in self._span((x0, y0, x1, y1)):
+      for key in self._cells.get(ij, ()):
+        b = self._boxes[key]
+        if b[0] <= x1 and x0 <= b[2] and b[1] <= y1 and y0 <= b[3]:
+          found.add(key)
+    return found
+
+
+  def at(self, x, y, tol=0.0):
+    """
+    Return the key with the box closest to (x, y) and at most tol from it,
+    or None. Of boxes containing the point the smallest is returned.
+    """
+    best  = None
+    rank  = None
+    for key in self.query(x-tol, y-tol, x+tol, y+tol):
+      b = self._boxes[key]
+      d = math.hypot(max(b[0]-x, 0, x-b[2]), max(b[1]-y, 0, y-b[3]))
+      if d > tol:
+        continue
+      r = (d, (b[2]-b[0]) * (b[3]-b[1]))
+      if rank is None or r < rank:
+        best, rank = key, r
+    return best
@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+"""
+Opt-in timing of the refresh pipeline. Enabled by setting the environment
+variable SCC_INSTRUMENT=1 (or by setting Instrument.enabled). When disabled
+stage() returns a shared no-op object, so instrumented code runs at full
+speed.
+
+A refresh starts when the scheduler rebuilds a view (begin_refresh) and ends
+when the canvas has painted it (end_refresh). Stages timed in between, e.g.
+build, bounds, serialize, renderer and paint, are stored with the refresh in
+a ring buffer of recent refreshes. All stages also add to totals per stage.
+
+The next refresh can be profiled with cProfile by profile_next(filename).
+Does not import PyQt4.
+"""
+
+import collections
+import cProfile
+import os
+import time
+
+enabled = os.environ.get("SCC_INSTRUMENT", "") not in ("", "0")
+
+HISTORY = 64  # Number of recent refreshes kept
+
+_totals   = {}    # Stage name -> [calls, total time, max time]
+_recent   = collections.deque(maxlen=HISTORY)
+_refresh  = None  # Refresh in progress: {"view", "start", "queued", stages...}
+_pending  = None  # Time of the first request not yet refreshed
+_listeners      = []    # Functions called with each finished refresh
+_profile_file   = None  # Profile next refresh to this file
+_profiler       = None
+
+
+class _Stage:
+  """ Context manager timing one stage. """
+  __slots__ = ("name", "t0")
+
+  def __init__(self, name):
+    self.name = name
+
+  def __enter__(self):
+    self.t0 = time.perf_counter()
+    return self
+
+  def __exit__(self, *exc):
+    record(self.name, time.perf_counter()-self.t0)
+    return False
+
+
+class _NoStage:
+  """ Context manager doing nothing, used when disabled. """
+  __slots__ = ()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc):
+    return False
+
+_no_stage = _NoStage()
+
+
+def stage(name):
+  """ Return a context manager timing the stage name. """
+  return _Stage(name) if enabled else _no_stage
+
+
+def record(name, t):
+  """ Add time t (s) of the stage name. """
+  if not enabled:
+    return
+  s = _totals.get(name)
+  if s is None:
+    s = _totals[name] = [0, 0.0, 0.0]
+  s[0] += 1
+  s[1] += t
+  s[2]  = max(s[2], t)
+  if _refresh is not None:
+    _refresh[name] = _refresh.get(name, 0.0) + t
+
+
+def count(name):
+  """ Count a call of name without timing it. """
+  if not enabled:
+    return
+  s = _totals.get(name)
+  if s is None:
+    s = _totals[name] = [0, 0.0, 0.0]
+  s[0] += 1
+
+
+def request():
+  """ Note a refresh request. The time until the refresh is queue time. """
+  global _pending
+  if not enabled:
+    return
+  count("request")
+  if _pending is None:
+    _pending = time.perf_counter()
+
+
+def begin_refresh(view):
+  """ Start recording a refresh of view. """
+  global _refresh, _pending, _profiler
+  if not enabled:
+    return
+  now       = time.perf_counter()
+  _refresh  = {"view"   : view,
+               "start"  : now,
+               "queued" : now-_pending if _pending is not None else 0.0}
+  _pending  = None
+  if _profile_file is not None and _profiler is None:
+    _profiler = cProfile.Profile()
+    _profiler.enable()
+
+
+def end_refresh():
+  """ End the refresh in progress, if any, and add it to recent refreshes. """
+  global _refresh, _profiler, _profile_file
+  if not enabled or _refresh is None:
+    return
+  r         = _refresh
+  _refresh  = None
+  r["total"] = time.perf_counter() - r.pop("start")
+  _recent.append(r)
+  record("refresh", r["total"])
+  if _profiler is not None:
+    _profiler.disable()
+    _profiler.dump_stats(_profile_file)
+    print("Profile written to ", _profile_file)
+    _profiler     = None
+    _profile_file = None
+  for f in _listeners:
+    f(r)
+
+
+def profile_next(filename):
+  """ Profile the next refresh and write the cProfile stats to filename. """
+  global _profile_file
+  _profile_file = filename
+
+
+def add_listener(f):
+  """ Call f(refresh) when a refresh has ended. """
+  _listeners.append(f)
+
+
+def stats():
+  """ Return a dict stage name: (calls, total time, max time). """
+  return {k: tuple(v) for k, v in _totals.items()}
+
+
+def recent():
+  """ Return a list of recent refreshes, oldest first. """
+  return list(_recent)
+
+
+def reset():
+  """ Clear totals and recent refreshes. """
+  global _refresh, _pending
+  _totals.clear()
+  _recent.clear()
+  _refresh  = None
+  _pending  = None
+
+
+def report():
+  """ Return a text report of stage totals and recent refreshes. """
+  lines = ["{:16s} {:>7s} {:>10s} {:>10s} {:>10s}".format(
+           "stage", "calls", "total ms", "mean ms", "max ms")]
+  for k, (n, t, m) in sorted(_totals.items(), key=lambda i: -i[1][1]):
+    lines.append("{:16s} {:7d} {:10.2f} {:10.3f} {:10.3f}".format(
+                 k, n, t*1000, t*1000/max(n, 1), m*1000))
+  if _recent:
+    lines.append("")
+    lines.append("Recent refreshes (ms):")
+    for r in reversed(_recent):
+      parts = ["{:s} {:0.2f}".format(k, v*1000) for k, v in sorted(r.items())
+               if k not in ("view", "total")]
+      lines.append("{:10s} {:8.2f}  {:s}".format(r["view"], r["total"]*1000,
+                                                  ", ".join(parts)))
+  return "\n".join(lines)
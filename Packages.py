@@ -0,0 +1,476 @@
+# -*- coding: utf-8 -*-
+"""
+Parametric packages. A package creates all its connectors from a few
+parameters (pin count, pitch, rows and columns, pad size and depopulation)
+instead of placing pads one by one:
+
+  DIP     - Dual in-line, through hole.
+  SOIC    - Small outline, surface mount. Same pattern as DIP.
+  QFP     - Quad flat package, pads on four sides.
+  QFN     - Quad flat no-lead, optionally with an exposed pad.
+  Header  - Pin header with 1 or more rows.
+  BGA     - Ball grid array with a depopulation mask.
+
+Pad positions are computed for all pads at once, with numpy for large
+packages (see ComponentRect.NUMPY_MIN_CONNECTORS). Schematic pins are
+assigned in the same pass: pin numbers (or ball names) as labels and sides
+following the pads. Each pad keeps its layout position as its fixed
+position (p_place), so pads keep their places when other connectors are
+removed or added. The pad offset (p_pos) is left to the user. The pad
+spacing of the rectangular pattern (p_spacing_h, p_spacing_v) does not apply
+to packages, the package parameters set the spacing.
+
+Pin numbers start at 1 in the top left corner and run anticlockwise.
+Depopulated pins keep their numbers, so labels may skip numbers.
+
+The parameters are saved with the state under the key "package". Use
+from_state() or create() to recreate a package.
+"""
+
+import abc
+
+from ComponentBase import ComponentBase as Cmp
+from ComponentRect import ComponentRect, np, NUMPY_MIN_CONNECTORS
+from ConnectorBase import ConnectorBase as Con
+
+# JEDEC ball row letters. I, O, Q, S, X and Z are not used.
+BGA_ROW_LETTERS = "ABCDEFGHJKLMNPRTUVWY"
+
+
+def _line(n, x0, y0, dx, dy):
+  """ Return lists of x and y of n points from (x0, y0) in steps (dx, dy). """
+  if np is not None and n >= NUMPY_MIN_CONNECTORS:
+    k = np.arange(n)
+    return (x0 + k*dx).tolist(), (y0 + k*dy).tolist()
+  return [x0 + k*dx for k in range(n)], [y0 + k*dy for k in range(n)]
+
+
+def _grid(rows, cols, pitch, mask=None):
+  """
+  Return lists of x, y, row and column of the grid points where mask (rows
+  lists of cols booleans) is true, row by row from the top left. The grid is
+  centred on origo.
+  """
+  if np is not None and rows*cols >= NUMPY_MIN_CONNECTORS:
+    r, c = np.indices((rows, cols))
+    r, c = r.ravel(), c.ravel()
+    if mask is not None:
+      keep = np.asarray(mask, dtype=bool).ravel()
+      r, c = r[keep], c[keep]
+    xs = (c - (cols-1)/2.0) * pitch
+    ys = ((rows-1)/2.0 - r) * pitch
+    return xs.tolist(), ys.tolist(), r.tolist(), c.tolist()
+
+  cells = [(r, c) for r in range(rows) for c in range(cols)
+           if mask is None or mask[r][c]]
+  xs = [(c - (cols-1)/2.0) * pitch for r, c in cells]
+  ys = [((rows-1)/2.0 - r) * pitch for r, c in cells]
+  return xs, ys, [r for r, c in cells], [c for r, c in cells]
+
+
+def _quad(counts, pitch, span_h, span_v):
+  """
+  Return lists of x, y and direction of pads on four sides. Counts is the
+  number of pads on the west, south, east and north side. Pads are numbered
+  anticlockwise from the top of the west side. Span_h and span_v are the
+  distances between the pad centres of opposite sides.
+  """
+  nw, ns, ne, nn = counts
+  xs, ys, dirs = [], [], []
+  for n, x0, y0, dx, dy, d in (
+      (nw, -span_h/2, (nw-1)*pitch/2, 0, -pitch, Con.DIR_W),
+      (ns, -(ns-1)*pitch/2, -span_v/2, pitch, 0, Con.DIR_S),
+      (ne,  span_h/2, -(ne-1)*pitch/2, 0, pitch, Con.DIR_E),
+      (nn, (nn-1)*pitch/2,  span_v/2, -pitch, 0, Con.DIR_N)):
+    x, y = _line(n, x0, y0, dx, dy)
+    xs   += x
+    ys   += y
+    dirs += [d] * n
+  return xs, ys, dirs
+
+
+def bga_row_name(row):
+  """ Return the JEDEC name of ball row (0 is A, 20 is AA). """
+  n = len(BGA_ROW_LETTERS)
+  if row < n:
+    return BGA_ROW_LETTERS[row]
+  return BGA_ROW_LETTERS[row//n - 1] + BGA_ROW_LETTERS[row % n]
+
+
+def bga_mask(rows, cols, center=0, corners=0):
+  """
+  Return a depopulation mask for a rows x cols BGA. Center is the size of a
+  depopulated square in the centre and corners the number of balls removed
+  from each corner along both edges (e.g. 1 removes the corner balls).
+  """
+  mask = [[True]*cols for r in range(rows)]
+  r0 = max((rows-center) // 2, 0)
+  c0 = max((cols-center) // 2, 0)
+  for r in range(r0, min(r0+center, rows)):
+    for c in range(c0, min(c0+center, cols)):
+      mask[r][c] = False
+  for r in range(min(corners, rows)):
+    for c in range(min(corners-r, cols)):
+      for rr, cc in ((r, c), (r, cols-1-c), (rows-1-r, c), (rows-1-r, cols-1-c)):
+        mask[rr][cc] = False
+  return mask
+
+
+
+class Package(ComponentRect):
+  """
+  Base class of parametric packages. Subclasses set PARAMS (parameter name:
+  default value), MOUNT and SHAPE and implement _layout().
+  """
+  PARAMS  = {}
+  MOUNT   = Cmp.MOUNT_SMD
+  SHAPE   = Con.SHAPE_PAD
+
+  def __init__(self, **params):
+    super().__init__()
+    self._params    = dict(self.PARAMS)
+    self.mount      = self.MOUNT
+    self.set_params(**params)
+
+
+  @property
+  def params(self):
+    """ Copy of the package parameters. """
+    return dict(self._params)
+
+
+  def set_params(self, **params):
+    """
+    Change package parameters and regenerate all connectors. Connector
+    edits are lost.
+    """
+    unknown = set(params) - set(self.PARAMS)
+    if unknown:
+      raise ValueError("Unknown %s parameters: %s" %
+                       (type(self).__name__, ", ".join(sorted(unknown))))
+    self._params.update(params)
+    self._check_params()
+    self.part_name = self.default_name()
+    self.generate()
+
+
+  def _check_params(self):
+    """ Raise ValueError if parameters are invalid. """
+    pass
+
+
+  def default_name(self):
+    return "%s%d" % (type(self).__name__.upper(), self._params["pins"])
+
+
+  @abc.abstractmethod
+  def _layout(self):
+    """
+    Return a dict of lists with one item per pad: "x", "y", "p_dir",
+    "s_dir" and "s_label". Optional lists "p_shape" and "p_dim" override
+    SHAPE and the pad parameter.
+    """
+
+
+  def _depopulate(self, layout):
+    """ Remove pads with pin numbers in the depopulate parameter. """
+    depop = set(self._params.get("depopulate") or ())
+    if not depop:
+      return layout
+    keep = [i for i in range(len(layout["x"])) if i+1 not in depop]
+    return {k: [v[i] for i in keep] for k, v in layout.items()}
+
+
+  def generate(self):
+    """ Replace all connectors with the connectors of the package. """
+    layout  = self._depopulate(self._layout())
+    n       = len(layout["x"])
+    shapes  = layout.get("p_shape", [self.SHAPE] * n)
+    dims    = layout.get("p_dim", [tuple(self._params["pad"])] * n)
+    states  = [{"s_label" : l,
+                "s_dir"   : sd,
+                "p_dir"   : pd,
+                "p_shape" : sh,
+                "p_dim"   : dm,
+                "p_place" : (float(x), float(y))}
+               for l, sd, pd, sh, dm, x, y in zip(
+                 layout["s_label"], layout["s_dir"], layout["p_dir"], shapes,
+                 dims, layout["x"], layout["y"])]
+    self.remove_connectors(range(len(self.connectors)))
+    self.add_connectors(n, states)
+
+
+  def add_connectors(self, n, states=None, row=None):
+    """
+    Add n connectors, see ComponentBase.add_connectors(). Pads without a
+    p_place in states continue the pattern, one step (the distance between
+    the last two pads) after the previous pad.
+    """
+    first = len(self.connectors)
+    super().add_connectors(n, states, row)
+    if row is None or row > first:
+      row = first
+    if row == 0:
+      return
+    x, y  = self.connectors[row-1].p_place
+    dx    = dy = 0
+    if row > 1:
+      x0, y0  = self.connectors[row-2].p_place
+      dx, dy  = x-x0, y-y0
+    if dx == 0 and dy == 0:
+      dx = self._params.get("pitch", 2.54)
+    for i, c in enumerate(self.connectors[row:row+n]):
+      if states and states[i].get("p_place") is not None:
+        x, y = c.p_place
+        continue
+      x, y      = x+dx, y+dy
+      c.p_place = (round(x, 4), round(y, 4))
+
+
+  def get_state(self):
+    """ Return the state, with the package type and parameters. """
+    state = super().get_state()
+    state["package"] = dict(self._params, type=type(self).__name__)
+    return state
+
+
+  def set_state(self, state):
+    """
+    Set state as returned by get_state(). Complete connector states (with
+    "no" and "p_place", as from get_state()) replace the generated connectors,
+    so removed and added connectors are restored. Partial states, e.g. from a
+    batch spec, are applied to the generated connectors in order. The package
+    parameters are not changed, see from_state().
+    """
+    state = dict(state)
+    state.pop("package", None)
+    conns = state.pop("connectors", None)
+    super().set_state(state)
+    if conns and all("no" in s and s.get("p_place") is not None
+                     for s in conns):
+      self.remove_connectors(range(len(self.connectors)))
+      self.add_connectors(len(conns), conns)
+    elif conns:
+      for c, s in zip(self.connectors, conns):
+        s = dict(s)
+        s.pop("no", None)
+        c.set_state(s)
+      self.body_resize()
+
+
+
+class _DualRow(Package):
+  """ Two rows of pads, pin 1 top left. """
+
+  def _check_params(self):
+    pins = self._params["pins"]
+    if pins < 2 or pins % 2:
+      raise ValueError("%s needs an even number of pins" % type(self).__name__)
+
+
+  def _layout(self):
+    p     = self._params
+    xs, ys, dirs = _quad((p["pins"]//2, 0, p["pins"]//2, 0), p["pitch"],
+                         p["row_spacing"], 0)
+    layout = {"x"       : xs,
+              "y"       : ys,
+              "p_dir"   : dirs,
+              "s_dir"   : dirs,
+              "s_label" : [str(i+1) for i in range(len(xs))]}
+    if self.SHAPE == Con.SHAPE_HOLE:
+      # Square pad marks pin 1
+      layout["p_shape"] = [Con.SHAPE_RHOLE] + [Con.SHAPE_HOLE] * (len(xs)-1)
+    return layout
+
+
+
+class DIP(_DualRow):
+  """ Dual in-line package. Pad is (drill, pad diameter). """
+  PARAMS  = {"pins"         : 8,
+             "pitch"        : 2.54,
+             "row_spacing"  : 7.62,
+             "pad"          : (0.8, 1.6),
+             "depopulate"   : []}
+  MOUNT   = Cmp.MOUNT_THT
+  SHAPE   = Con.SHAPE_HOLE
+
+
+
+class SOIC(_DualRow):
+  """ Small outline package. Pad is (length, width). """
+  PARAMS  = {"pins"         : 8,
+             "pitch"        : 1.27,
+             "row_spacing"  : 5.4,
+             "pad"          : (1.55, 0.6),
+             "depopulate"   : []}
+
+
+
+class QFP(Package):
+  """
+  Quad flat package with pins/4 pads on each side. Span is the distance
+  between pad centres of opposite sides. Pad is (length, width).
+  """
+  PARAMS  = {"pins"       : 44,
+             "pitch"      : 0.8,
+             "span"       : 11.4,
+             "pad"        : (1.5, 0.55),
+             "depopulate" : []}
+
+  def _check_params(self):
+    pins = self._params["pins"]
+    if pins < 4 or pins % 4:
+      raise ValueError("%s needs a multiple of 4 pins" % type(self).__name__)
+
+
+  def _layout(self):
+    p     = self._params
+    side  = p["pins"] // 4
+    xs, ys, dirs = _quad((side,)*4, p["pitch"], p["span"], p["span"])
+    return {"x"       : xs,
+            "y"       : ys,
+            "p_dir"   : dirs,
+            "s_dir"   : dirs,
+            "s_label" : [str(i+1) for i in range(len(xs))]}
+
+
+
+class QFN(QFP):
+  """
+  Quad flat no-lead package. Exposed pad is the (width, height) of a centre
+  pad added after the other pads, or None.
+  """
+  PARAMS  = {"pins"         : 32,
+             "pitch"        : 0.5,
+             "span"         : 4.9,
+             "pad"          : (0.8, 0.3),
+             "exposed_pad"  : (3.45, 3.45),
+             "depopulate"   : []}
+
+  def _layout(self):
+    layout  = QFP._layout(self)
+    ep      = self._params["exposed_pad"]
+    if ep:
+      n = len(layout["x"])
+      layout["p_dim"] = [tuple(self._params["pad"])] * n + [tuple(ep)]
+      for k, v in (("x", 0.0), ("y", 0.0), ("p_dir", Con.DIR_E),
+                   ("s_dir", Con.DIR_S), ("s_label", "EP")):
+        layout[k].append(v)
+    return layout
+
+
+
+class Header(Package):
+  """
+  Pin header with pins/rows columns. Pins are numbered across the rows
+  (1, 2 in the first column of a 2 row header). Pad is (drill, pad
+  diameter). Pin 1 has a square pad.
+  """
+  PARAMS  = {"pins"       : 10,
+             "rows"       : 2,
+             "pitch"      : 2.54,
+             "pad"        : (1.0, 1.7),
+             "depopulate" : []}
+  MOUNT   = Cmp.MOUNT_THT
+  SHAPE   = Con.SHAPE_HOLE
+
+  def _check_params(self):
+    p = self._params
+    if p["rows"] < 1 or p["pins"] < 1 or p["pins"] % p["rows"]:
+      raise ValueError("Header pins must be a multiple of rows")
+
+
+  def default_name(self):
+    p = self._params
+    return "HEADER%dX%d" % (p["rows"], p["pins"]//p["rows"])
+
+
+  def _layout(self):
+    p     = self._params
+    rows  = p["rows"]
+    cols  = p["pins"] // rows
+    # Pin numbers run across the rows, so the grid is laid out transposed
+    xs, ys, _, r = _grid(cols, rows, p["pitch"])
+    sides = [Con.DIR_W, Con.DIR_E] if rows > 1 else [Con.DIR_W]
+    n     = len(xs)
+    return {"x"       : xs,
+            "y"       : ys,
+            "p_dir"   : [Con.DIR_E] * n,
+            "s_dir"   : [sides[min(i, len(sides)-1)] for i in r],
+            "s_label" : [str(i+1) for i in range(n)],
+            "p_shape" : [Con.SHAPE_RHOLE] + [Con.SHAPE_HOLE] * (n-1)}
+
+
+
+class BGA(Package):
+  """
+  Ball grid array. Mask is rows lists of cols booleans, false where balls
+  are depopulated, or None for a full grid (see bga_mask()). Balls are
+  named by row letter and column number, e.g. A1. Pad is the (width,
+  height) of the square pad of a ball. Schematic pins are spread on all
+  four sides in ball order.
+  """
+  PARAMS  = {"rows"   : 8,
+             "cols"   : 8,
+             "pitch"  : 0.8,
+             "pad"    : (0.4, 0.4),
+             "mask"   : None}
+
+  def _check_params(self):
+    p = self._params
+    if p["rows"] < 1 or p["cols"] < 1:
+      raise ValueError("BGA needs at least one row and column")
+    if p["mask"] is not None:
+      mask = [[bool(b) for b in r] for r in p["mask"]]
+      if len(mask) != p["rows"] or any(len(r) != p["cols"] for r in mask):
+        raise ValueError("BGA mask must be %d x %d" % (p["rows"], p["cols"]))
+      p["mask"] = mask
+
+
+  def default_name(self):
+    p = self._params
+    return "BGA%d_%dX%d" % (self._ball_count(), p["rows"], p["cols"])
+
+
+  def _ball_count(self):
+    p = self._params
+    if p["mask"] is None:
+      return p["rows"] * p["cols"]
+    return sum(sum(r) for r in p["mask"])
+
+
+  def _layout(self):
+    p     = self._params
+    xs, ys, r, c = _grid(p["rows"], p["cols"], p["pitch"], p["mask"])
+    n     = len(xs)
+    names = [bga_row_name(i) for i in range(p["rows"])]
+    # Quarters of the balls on the west, south, east and north side
+    sides = []
+    for k, d in enumerate((Con.DIR_W, Con.DIR_S, Con.DIR_E, Con.DIR_N)):
+      sides += [d] * ((n*(k+1))//4 - (n*k)//4)
+    return {"x"       : xs,
+            "y"       : ys,
+            "p_dir"   : [Con.DIR_E] * n,
+            "s_dir"   : sides,
+            "s_label" : [names[i] + str(j+1) for i, j in zip(r, c)]}
+
+
+
+PACKAGES = {cls.__name__: cls for cls in (DIP, SOIC, QFP, QFN, Header, BGA)}
+
+
+def create(params):
+  """ Create a package from a dict of parameters with the key "type". """
+  params = dict(params)
+  name   = params.pop("type")
+  if name not in PACKAGES:
+    raise ValueError("Unknown package %s" % name)
+  return PACKAGES[name](**params)
+
+
+def from_state(state):
+  """ Create and return a package from a state with the key "package". """
+  state = dict(state)
+  cmp   = create(state.pop("package"))
+  cmp.set_state(state)
+  return cmp
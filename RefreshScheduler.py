@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""
+Coalescing of svg canvas refreshes.
+"""
+
+from PyQt4 import QtCore
+
+import Instrument
+
+
+class RefreshScheduler(QtCore.QObject):
+  """
+  Coalesces refresh requests of the svg canvas. Requests mark a view as
+  dirty and start a single shot timer. When the timer fires, the visible view
+  is rebuilt once if it is dirty. Dirty views that are not visible are
+  rebuilt when they become visible.
+  """
+  SCHEMATIC = "schematic"
+  PCB       = "pcb"
+  VIEWS     = (SCHEMATIC, PCB)
+
+  def __init__(self, build, interval=16, parent=None):
+    """
+    The function build(view) is called to rebuild a view. Interval is the
+    time in ms to collect requests before a rebuild, about one frame by
+    default.
+    """
+    super().__init__(parent)
+    self._build   = build
+    self._dirty   = set(RefreshScheduler.VIEWS)
+    self._visible = RefreshScheduler.SCHEMATIC
+    self._shown   = None  # View last built on the canvas
+    self.requested  = 0   # Number of refresh requests
+    self.executed   = 0   # Number of rebuilds
+
+    self._timer = QtCore.QTimer(self)
+    self._timer.setSingleShot(True)
+    self._timer.timeout.connect(self.flush)
+    self.interval = interval
+
+
+  @property
+  def interval(self):
+    return self._timer.interval()
+
+  @interval.setter
+  def interval(self, value):
+    self._timer.setInterval(int(value))
+
+
+  @property
+  def visible_view(self):
+    return self._visible
+
+  @visible_view.setter
+  def visible_view(self, view):
+    assert view in RefreshScheduler.VIEWS
+    self._visible = view
+    if self._shown != view:
+      self._dirty.add(view)  # Canvas shows the other view
+    self._schedule()
+
+
+  def request(self, view=None):
+    """ Request a refresh of view. Refresh all views if view is None. """
+    self.requested += 1
+    Instrument.request()
+    if view is None:
+      self._dirty.update(RefreshScheduler.VIEWS)
+    else:
+      assert view in RefreshScheduler.VIEWS
+      self._dirty.add(view)
+    self._schedule()
+
+
+  def _schedule(self):
+    if self._visible in self._dirty and not self._timer.isActive():
+      self._timer.start()
+
+
+  def flush(self):
+    """ Rebuild the visible view now if it is dirty. """
+    self._timer.stop()
+    if self._visible not in self._dirty:
+      return
+    self._dirty.discard(self._visible)
+    self.executed += 1
+    self._shown    = self._visible
+    Instrument.begin_refresh(self._visible)
+    self._build(self._visible)
+
+
+  def reset_stats(self):
+    """ Reset the requested and executed counters. """
+    self.requested  = 0
+    self.executed   = 0
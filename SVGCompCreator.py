@@ -153,7 +153,7 @@ class Ui_MainWindow(object):
         self.txt_silkscreen = SvgPathEdit(self.tab)
         self.txt_silkscreen.setObjectName(_fromUtf8("txt_silkscreen"))
         self.formLayout_3.setWidget(0, QtGui.QFormLayout.FieldRole, self.txt_silkscreen)
-        self.list_path_cmds = QtGui.QListWidget(self.tab)
+        self.list_path_cmds = QtGui.QListView(self.tab)
         sizePolicy = QtGui.QSizePolicy(QtGui.QSizePolicy.Expanding, QtGui.QSizePolicy.Expanding)
         sizePolicy.setHorizontalStretch(0)
         sizePolicy.setVerticalStretch(1)
@@ -172,6 +172,8 @@ class Ui_MainWindow(object):
         self.menubar.setObjectName(_fromUtf8("menubar"))
         self.menuFile = QtGui.QMenu(self.menubar)
         self.menuFile.setObjectName(_fromUtf8("menuFile"))
+        self.menuEdit = QtGui.QMenu(self.menubar)
+        self.menuEdit.setObjectName(_fromUtf8("menuEdit"))
         self.menuHelp = QtGui.QMenu(self.menubar)
         self.menuHelp.setObjectName(_fromUtf8("menuHelp"))
         MainWindow.setMenuBar(self.menubar)
@@ -186,11 +188,24 @@ class Ui_MainWindow(object):
         self.actionSave.setObjectName(_fromUtf8("actionSave"))
         self.actionLoad = QtGui.QAction(MainWindow)
         self.actionLoad.setObjectName(_fromUtf8("actionLoad"))
+        self.actionImportSilkscreen = QtGui.QAction(MainWindow)
+        self.actionImportSilkscreen.setObjectName(_fromUtf8("actionImportSilkscreen"))
+        self.actionExportFzpz = QtGui.QAction(MainWindow)
+        self.actionExportFzpz.setObjectName(_fromUtf8("actionExportFzpz"))
+        self.actionUndo = QtGui.QAction(MainWindow)
+        self.actionUndo.setObjectName(_fromUtf8("actionUndo"))
+        self.actionRedo = QtGui.QAction(MainWindow)
+        self.actionRedo.setObjectName(_fromUtf8("actionRedo"))
         self.menuFile.addAction(self.actionSave)
         self.menuFile.addAction(self.actionLoad)
+        self.menuFile.addAction(self.actionImportSilkscreen)
         self.menuFile.addAction(self.actionExport)
+        self.menuFile.addAction(self.actionExportFzpz)
+        self.menuEdit.addAction(self.actionUndo)
+        self.menuEdit.addAction(self.actionRedo)
         self.menuHelp.addAction(self.actionHelp)
         self.menubar.addAction(self.menuFile.menuAction())
+        self.menubar.addAction(self.menuEdit.menuAction())
         self.menubar.addAction(self.menuHelp.menuAction())
 
         self.retranslateUi(MainWindow)
@@ -213,11 +228,18 @@ class Ui_MainWindow(object):
         self.label_4.setText(_translate("MainWindow", "Silkscreen path", None))
         self.tabWidget.setTabText(self.tabWidget.indexOf(self.tab), _translate("MainWindow", "Silkscreen", None))
         self.menuFile.setTitle(_translate("MainWindow", "File", None))
+        self.menuEdit.setTitle(_translate("MainWindow", "Edit", None))
         self.menuHelp.setTitle(_translate("MainWindow", "Help", None))
         self.actionExport.setText(_translate("MainWindow", "Export...", None))
         self.actionHelp.setText(_translate("MainWindow", "Help", None))
         self.actionSave.setText(_translate("MainWindow", "Save...", None))
         self.actionLoad.setText(_translate("MainWindow", "Load...", None))
+        self.actionImportSilkscreen.setText(_translate("MainWindow", "Import silkscreen...", None))
+        self.actionExportFzpz.setText(_translate("MainWindow", "Export Fritzing part...", None))
+        self.actionUndo.setText(_translate("MainWindow", "Undo", None))
+        self.actionUndo.setShortcut(_translate("MainWindow", "Ctrl+Z", None))
+        self.actionRedo.setText(_translate("MainWindow", "Redo", None))
+        self.actionRedo.setShortcut(_translate("MainWindow", "Ctrl+Y", None))
 
 from SvgView import SvgView
 from SvgPathEdit import SvgPathEdit
@@ -0,0 +1,284 @@
+# -*- coding: utf-8 -*-
+"""
+Import of silkscreen outlines from files. Supported files are svg files
+(path, line, polyline, polygon, rect, circle and ellipse elements, with the
+transforms of the elements and their groups applied) and dxf files (LINE,
+LWPOLYLINE and POLYLINE entities of the ENTITIES section). Files are read as
+streams and the resulting path commands are added to the component in one
+operation.
+"""
+
+import math
+import os
+import re
+import xml.etree.ElementTree as ET
+
+import SvgBounds
+import SvgPath
+
+# Svg y axis points down, the silkscreen uses conventional coordinates
+MIRROR_Y    = (1, 0, 0, -1, 0, 0)
+
+# Elements whose content is not drawn
+_HIDDEN     = {"defs", "clipPath", "mask", "marker", "pattern", "symbol"}
+# Drawn elements that can not be imported
+_REJECTED   = {"use", "image"}
+
+_re_number  = re.compile(r"[-+]?(?:[0-9]*\.[0-9]+|[0-9]+\.?)(?:[eE][-+]?[0-9]+)?")
+
+
+def read_svg(filename):
+  """
+  Return path commands for the outlines in the svg file. Transforms of
+  elements and their ancestors are applied and y coordinates are mirrored.
+  Raise ValueError for elements that can not be imported (use, image).
+  Text is skipped.
+  """
+  commands  = []
+  matrices  = [MIRROR_Y]  # Transform of each open element
+  hidden    = 0           # Depth in elements not drawn
+  texts     = 0
+  for event, elem in ET.iterparse(filename, events=("start", "end")):
+    tag = elem.tag.rsplit("}", 1)[-1]
+    if event == "end":
+      matrices.pop()
+      if tag in _HIDDEN:
+        hidden -= 1
+      elem.clear()
+      continue
+    m = SvgBounds.multiply(matrices[-1],
+                           SvgBounds.parse_transform(elem.get("transform", "")))
+    matrices.append(m)
+    if tag in _HIDDEN:
+      hidden += 1
+    if hidden:
+      continue
+    if tag in _REJECTED:
+      raise ValueError("Can't import <%s> elements in %s" % (tag, filename))
+    if tag == "text":
+      texts += 1
+      continue
+    segments = _shape_segments(tag, elem)
+    if segments:
+      commands.extend(SvgPath.format_segment(*seg)
+                      for seg in _transform_segments(segments, m))
+  if texts:
+    print("Skipped %d text elements in %s" % (texts, filename))
+  return commands
+
+
+def _attr(elem, name):
+  """ Return the number in attribute name of elem, 0 if missing. """
+  m = _re_number.match(elem.get(name, "0").strip())
+  if m is None:
+    raise ValueError("Invalid %s attribute in <%s>" % (name, elem.tag))
+  return float(m.group(0))
+
+
+def _shape_segments(tag, elem):
+  """ Return the path segments (cmd, args) of a svg element, or None. """
+  if tag == "path":
+    d = elem.get("d")
+    return SvgPath.parse_path(d) if d else None
+  if tag == "line":
+    return [("M", (_attr(elem, "x1"), _attr(elem, "y1"))),
+            ("L", (_attr(elem, "x2"), _attr(elem, "y2")))]
+  if tag in ("polyline", "polygon"):
+    v = [float(n) for n in _re_number.findall(elem.get("points", ""))]
+    if len(v) < 4:
+      return None
+    segs = [("M", tuple(v[0:2]))] + [("L", tuple(v[i:i+2]))
+                                    for i in range(2, len(v)-1, 2)]
+    if tag == "polygon":
+      segs.append(("Z", ()))
+    return segs
+  if tag == "rect":
+    return _rect_segments(elem)
+  if tag in ("circle", "ellipse"):
+    cx, cy  = _attr(elem, "cx"), _attr(elem, "cy")
+    if tag == "circle":
+      rx = ry = _attr(elem, "r")
+    else:
+      rx, ry  = _attr(elem, "rx"), _attr(elem, "ry")
+    if rx <= 0 or ry <= 0:
+      return None
+    return [("M", (cx+rx, cy)),
+            ("A", (rx, ry, 0, 0, 1, cx-rx, cy)),
+            ("A", (rx, ry, 0, 0, 1, cx+rx, cy)),
+            ("Z", ())]
+  return None
+
+
+def _rect_segments(elem):
+  """ Return the path segments of a rect element, with rounded corners. """
+  x, y    = _attr(elem, "x"), _attr(elem, "y")
+  w, h    = _attr(elem, "width"), _attr(elem, "height")
+  if w <= 0 or h <= 0:
+    return None
+  rx, ry  = elem.get("rx"), elem.get("ry")
+  rx      = _attr(elem, "rx") if rx is not None else None
+  ry      = _attr(elem, "ry") if ry is not None else rx
+  rx      = ry if rx is None else rx
+  if not rx or not ry:
+    return [("M", (x, y)), ("H", (x+w,)), ("V", (y+h,)), ("H", (x,)), 
+            ("Z", ())]
+  rx, ry  = min(rx, w/2), min(ry, h/2)
+  arc     = lambda px, py: ("A", (rx, ry, 0, 0, 1, px, py))
+  return [("M", (x+rx, y)), ("H", (x+w-rx,)), arc(x+w, y+ry),
+          ("V", (y+h-ry,)), arc(x+w-rx, y+h),
+          ("H", (x+rx,)), arc(x, y+h-ry),
+          ("V", (y+ry,)), arc(x+rx, y), ("Z", ())]
+
+
+def _transform_arc(m, rx, ry, rot):
+  """
+  Return radii and rotation (degrees) of the ellipse (rx, ry, rot)
+  transformed by the linear part of matrix m.
+  """
+  if m[1] == 0 and m[2] == 0 and abs(m[0]) == abs(m[3]):
+    # Uniform scale, possibly mirrored, e.g. the y axis flip
+    k = abs(m[0])
+    return rx*k, ry*k, (rot if m[0]*m[3] > 0 else -rot)
+  r       = math.radians(rot)
+  cs, sn  = math.cos(r), math.sin(r)
+  # Ellipse matrix m * rotate(rot) * scale(rx, ry), decomposed as
+  # rotate(phi) * scale(sx, sy) * rotate(theta)
+  a, b    = (m[0]*cs + m[2]*sn)*rx, (m[1]*cs + m[3]*sn)*rx
+  c, d    = (m[2]*cs - m[0]*sn)*ry, (m[3]*cs - m[1]*sn)*ry
+  e, f    = (a+d)/2, (a-d)/2
+  g, h    = (b+c)/2, (b-c)/2
+  q, s    = math.hypot(e, h), math.hypot(f, g)
+  phi     = (math.atan2(g, f) + math.atan2(h, e)) / 2
+  return q+s, abs(q-s), math.degrees(phi)
+
+
+def _round(v):
+  return round(v, 6) + 0.0  # Adding 0.0 turns -0.0 into 0.0
+
+
+def _transform_segments(segments, m):
+  """
+  Yield path segments (cmd, args) transformed by matrix m. Command types
+  are kept, except H and V which become L when m rotates or skews.
+  """
+  straight  = m[1] == 0 and m[2] == 0
+  flip      = m[0]*m[3] - m[1]*m[2] < 0
+  pt        = lambda x, y: tuple(_round(v) for v in SvgBounds.apply(m, x, y))
+  vec       = lambda x, y: (_round(m[0]*x + m[2]*y), _round(m[1]*x + m[3]*y))
+  cur       = start = (0.0, 0.0)  # Current point, untransformed
+  for cmd, a in segments:
+    c   = cmd.upper()
+    rel = cmd.islower()
+    ox, oy  = cur if rel else (0.0, 0.0)
+    f   = vec if rel else pt
+    if c == "Z":
+      cur = start
+      yield cmd, a
+      continue
+    if c == "H":
+      cur = (a[0]+ox, cur[1])
+      if straight:
+        yield cmd, (_round(m[0]*a[0] + (0 if rel else m[4])),)
+      else:
+        yield ("l", vec(a[0], 0)) if rel else ("L", pt(*cur))
+      continue
+    if c == "V":
+      cur = (cur[0], a[0]+oy)
+      if straight:
+        yield cmd, (_round(m[3]*a[0] + (0 if rel else m[5])),)
+      else:
+        yield ("l", vec(0, a[0])) if rel else ("L", pt(*cur))
+      continue
+    if c == "A":
+      rx, ry, rot = _transform_arc(m, a[0], a[1], a[2])
+      cur = (a[5]+ox, a[6]+oy)
+      yield cmd, ((_round(rx), _round(ry), _round(rot), a[3], 
+                   1-a[4] if flip else a[4]) + f(a[5], a[6]))
+      continue
+    args = ()
+    for i in range(0, len(a), 2):
+      args += f(a[i], a[i+1])
+    cur = (a[-2]+ox, a[-1]+oy)
+    if c == "M":
+      start = cur
+    yield cmd, args
+
+
+def _dxf_pairs(f):
+  """ Yield (group code, value) pairs of a dxf file object. """
+  while True:
+    code = f.readline()
+    if not code:
+      return
+    value = f.readline()
+    yield int(code), value.strip()
+
+
+def read_dxf(filename):
+  """
+  Return path commands for lines and polylines in the ENTITIES section of
+  the dxf file. Block definitions and references to them are ignored.
+  """
+  commands  = []
+  section   = None  # Current section, "" until its name is read
+  entity    = None  # Current entity type
+  points    = []    # Vertices of current entity
+  closed    = False
+  vertex    = False # In a VERTEX of a POLYLINE
+  x         = None
+
+  def flush():
+    if len(points) > 1:
+      commands.append("M %s %s" % points[0])
+      commands.extend("L %s %s" % p for p in points[1:])
+      if closed:
+        commands.append("Z")
+
+  with open(filename, encoding="utf-8", errors="replace") as f:
+    for code, value in _dxf_pairs(f):
+      if code == 0:
+        if value == "VERTEX" and entity == "POLYLINE":
+          vertex = True  # Vertices belong to the current polyline
+          continue
+        flush()
+        if value == "SECTION":
+          section = ""
+        elif value == "ENDSEC":
+          section = None
+        if section != "ENTITIES":
+          value = None
+        entity, points, closed, vertex, x = value, [], False, False, None
+      elif code == 2 and section == "":
+        section = value
+      elif code == 70 and not vertex and entity in ("LWPOLYLINE", "POLYLINE"):
+        closed = bool(int(value) & 1)
+      elif entity in ("LINE", "LWPOLYLINE") or vertex:
+        if code in (10, 11):
+          x = value
+        elif code in (20, 21) and x is not None:
+          points.append((SvgPath.format_number(float(x)), 
+                         SvgPath.format_number(float(value))))
+          x = None
+    flush()
+  return commands
+
+
+def read_file(filename):
+  """ Return path commands for the svg or dxf file. """
+  ext = os.path.splitext(filename)[1].lower()
+  if ext == ".dxf":
+    return read_dxf(filename)
+  elif ext == ".svg":
+    return read_svg(filename)
+  else:
+    raise ValueError("Unsupported silkscreen file " + filename)
+
+
+def import_silkscreen(cmp, filename):
+  """
+  Append the outlines in the svg or dxf file to the silkscreen of the
+  component cmp. Return the number of added segments.
+  """
+  commands = read_file(filename)
+  cmp.silkscreen_commands.extend(commands)
+  return len(commands)
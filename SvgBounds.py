@@ -0,0 +1,355 @@
+# -*- coding: utf-8 -*-
+"""
+Pure python bounding box calculation for svgwrite drawings. Used to set the
+viewBox of a drawing without serializing it and parsing it again with
+QSvgRenderer.
+"""
+
+import functools
+import math
+import re
+
+import FontMetrics
+import SvgPath
+
+FONT_SIZE     = 12    # Default font size if not given by any element
+IDENTITY      = (1, 0, 0, 1, 0, 0)
+
+_re_transform = re.compile(r"(matrix|translate|scale|rotate|skewX|skewY)\s*\(([^)]*)\)")
+_re_number    = re.compile(r"[-+]?(?:[0-9]*\.[0-9]+|[0-9]+\.?)(?:[eE][-+]?[0-9]+)?")
+
+
+def multiply(m1, m2):
+  """ Return the matrix product m1*m2 of two svg matrices (a,b,c,d,e,f). """
+  a1, b1, c1, d1, e1, f1 = m1
+  a2, b2, c2, d2, e2, f2 = m2
+  return (a1*a2 + c1*b2,
+          b1*a2 + d1*b2,
+          a1*c2 + c1*d2,
+          b1*c2 + d1*d2,
+          a1*e2 + c1*f2 + e1,
+          b1*e2 + d1*f2 + f1)
+
+
+def apply(m, x, y):
+  """ Apply matrix m to point (x, y). """
+  return (m[0]*x + m[2]*y + m[4], m[1]*x + m[3]*y + m[5])
+
+
+@functools.lru_cache(maxsize=4096)
+def parse_transform(txt):
+  """
+  Return the svg transform attribute txt as a matrix (a,b,c,d,e,f). Results
+  are cached since connectors on a side share most transform strings.
+  """
+  m = IDENTITY
+  for name, args in _re_transform.findall(str(txt)):
+    v = [float(a) for a in _re_number.findall(args)]
+    if name == "matrix":
+      t = tuple(v)
+    elif name == "translate":
+      t = (1, 0, 0, 1, v[0], v[1] if len(v)>1 else 0)
+    elif name == "scale":
+      t = (v[0], 0, 0, v[1] if len(v)>1 else v[0], 0, 0)
+    elif name == "rotate":
+      r = math.radians(v[0])
+      t = (math.cos(r), math.sin(r), -math.sin(r), math.cos(r), 0, 0)
+      if len(v) == 3:
+        t = multiply(multiply((1, 0, 0, 1, v[1], v[2]), t),
+                     (1, 0, 0, 1, -v[1], -v[2]))
+    elif name == "skewX":
+      t = (1, 0, math.tan(math.radians(v[0])), 1, 0, 0)
+    else:
+      t = (1, math.tan(math.radians(v[0])), 0, 1, 0, 0)
+    m = multiply(m, t)
+  return m
+
+
+def _num(value, default=0.0):
+  """
+  Return attribute value as a float. Relative values (percent) can not be
+  resolved and returns None.
+  """
+  if value is None:
+    return default
+  if isinstance(value, (int, float)):
+    return float(value)
+  value = str(value).strip()
+  if value.endswith("%"):
+    return None
+  m = _re_number.match(value)
+  return float(m.group(0)) if m else default
+
+
+class Bounds:
+  """ Accumulates an axis aligned bounding box. """
+  def __init__(self):
+    self.x0 = math.inf
+    self.y0 = math.inf
+    self.x1 = -math.inf
+    self.y1 = -math.inf
+
+  def __bool__(self):
+    return self.x0 <= self.x1
+
+  def add_point(self, x, y):
+    self.x0 = min(self.x0, x)
+    self.y0 = min(self.y0, y)
+    self.x1 = max(self.x1, x)
+    self.y1 = max(self.y1, y)
+
+  def add_rect(self, m, x0, y0, x1, y1):
+    """ Add rectangle (x0,y0)-(x1,y1) transformed by matrix m. """
+    for x, y in ((x0, y0), (x1, y0), (x1, y1), (x0, y1)):
+      self.add_point(*apply(m, x, y))
+
+  def add_bounds(self, other):
+    if other:
+      self.add_point(other.x0, other.y0)
+      self.add_point(other.x1, other.y1)
+
+  def rect(self):
+    """ Return bounds as (x, y, width, height). """
+    if not self:
+      return (0.0, 0.0, 0.0, 0.0)
+    return (self.x0, self.y0, self.x1-self.x0, self.y1-self.y0)
+
+
+
+def _cubic_extrema(p0, p1, p2, p3):
+  """ Parameters t in (0,1) where a cubic bezier coordinate has an extremum. """
+  a = -p0 + 3*p1 - 3*p2 + p3
+  b = 2*(p0 - 2*p1 + p2)
+  c = p1 - p0
+  if abs(a) < 1e-12:
+    roots = [-c/b] if abs(b) > 1e-12 else []
+  else:
+    disc = b*b - 4*a*c
+    if disc < 0:
+      return []
+    sq    = math.sqrt(disc)
+    roots = [(-b+sq)/(2*a), (-b-sq)/(2*a)]
+  return [t for t in roots if 0 < t < 1]
+
+
+def _cubic_points(p0, p1, p2, p3):
+  """ Endpoints and extremum points of a cubic bezier. """
+  pts = [p0, p3]
+  for i in (0, 1):
+    for t in _cubic_extrema(p0[i], p1[i], p2[i], p3[i]):
+      s = 1-t
+      pts.append(tuple(s*s*s*p0[k] + 3*s*s*t*p1[k] + 3*s*t*t*p2[k] + t*t*t*p3[k]
+                       for k in (0, 1)))
+  return pts
+
+
+def _arc_points(p0, rx, ry, phi, large, sweep, p1, segments=16):
+  """ Sample points on an elliptical arc (svg implementation notes F.6.5). """
+  rx, ry = abs(rx), abs(ry)
+  if rx == 0 or ry == 0 or p0 == p1:
+    return [p0, p1]
+  cp, sp  = math.cos(math.radians(phi)), math.sin(math.radians(phi))
+  dx, dy  = (p0[0]-p1[0])/2, (p0[1]-p1[1])/2
+  x1      =  cp*dx + sp*dy
+  y1      = -sp*dx + cp*dy
+  lam     = (x1*x1)/(rx*rx) + (y1*y1)/(ry*ry)
+  if lam > 1:
+    rx, ry = rx*math.sqrt(lam), ry*math.sqrt(lam)
+  num   = rx*rx*ry*ry - rx*rx*y1*y1 - ry*ry*x1*x1
+  den   = rx*rx*y1*y1 + ry*ry*x1*x1
+  coef  = math.sqrt(max(0, num/den)) * (-1 if large == sweep else 1)
+  cx1   =  coef*rx*y1/ry
+  cy1   = -coef*ry*x1/rx
+  cx    = cp*cx1 - sp*cy1 + (p0[0]+p1[0])/2
+  cy    = sp*cx1 + cp*cy1 + (p0[1]+p1[1])/2
+  t0    = math.atan2((y1-cy1)/ry, (x1-cx1)/rx)
+  t1    = math.atan2((-y1-cy1)/ry, (-x1-cx1)/rx)
+  dt    = t1 - t0
+  if sweep and dt < 0:
+    dt += 2*math.pi
+  elif not sweep and dt > 0:
+    dt -= 2*math.pi
+  pts = [p0, p1]
+  for i in range(1, segments):
+    t = t0 + dt*i/segments
+    x, y = rx*math.cos(t), ry*math.sin(t)
+    pts.append((cp*x - sp*y + cx, sp*x + cp*y + cy))
+  return pts
+
+
+def path_points(commands):
+  """
+  Return the points needed to bound the path given by commands. Commands is a
+  list of path d attribute strings (or a single string). An invalid path has
+  no points.
+  """
+  if not isinstance(commands, str):
+    commands = " ".join(str(c) for c in commands)
+  try:
+    segments = SvgPath.parse_path(commands)
+  except ValueError:
+    return []
+  pts     = []
+  cur     = start = (0.0, 0.0)
+  ctrl    = None  # Last control point for S and T commands
+
+  for cmd, a in segments:
+    c       = cmd.upper()
+    ox, oy  = cur if cmd.islower() else (0.0, 0.0)
+    if c == "Z":
+      cur, ctrl = start, None
+    elif c in ("M", "L"):
+      cur, ctrl = (a[0]+ox, a[1]+oy), None
+      pts.append(cur)
+      if c == "M":
+        start = cur
+    elif c == "H":
+      cur, ctrl = (a[0]+ox, cur[1]), None
+      pts.append(cur)
+    elif c == "V":
+      cur, ctrl = (cur[0], a[0]+oy), None
+      pts.append(cur)
+    elif c in ("C", "S"):
+      if c == "C":
+        p1, a = (a[0]+ox, a[1]+oy), a[2:]
+      else:
+        p1 = (2*cur[0]-ctrl[0], 2*cur[1]-ctrl[1]) if ctrl else cur
+      p2, p = (a[0]+ox, a[1]+oy), (a[2]+ox, a[3]+oy)
+      pts.extend(_cubic_points(cur, p1, p2, p))
+      cur, ctrl = p, p2
+    elif c in ("Q", "T"):
+      if c == "Q":
+        q, a = (a[0]+ox, a[1]+oy), a[2:]
+      else:
+        q = (2*cur[0]-ctrl[0], 2*cur[1]-ctrl[1]) if ctrl else cur
+      p = (a[0]+ox, a[1]+oy)
+      pts.extend(_cubic_points(cur, *_quad_to_cubic(cur, q, p)))
+      cur, ctrl = p, q
+    elif c == "A":
+      p = (a[5]+ox, a[6]+oy)
+      pts.extend(_arc_points(cur, a[0], a[1], a[2], bool(a[3]), bool(a[4]), p))
+      cur, ctrl = p, None
+  return pts
+
+
+def _quad_to_cubic(p0, q, p):
+  """ Control points and endpoint of the cubic equal to a quadratic bezier. """
+  c1 = (p0[0] + 2/3*(q[0]-p0[0]), p0[1] + 2/3*(q[1]-p0[1]))
+  c2 = (p[0] + 2/3*(q[0]-p[0]), p[1] + 2/3*(q[1]-p[1]))
+  return c1, c2, p
+
+
+
+def _style(elm, parent):
+  """ Return inherited presentation attributes affecting the bounds. """
+  style = parent
+  for k in ("stroke", "stroke-width", "font-size", "text-anchor"):
+    if k in elm.attribs:
+      if style is parent:
+        style = dict(parent)
+      style[k] = elm.attribs[k]
+  return style
+
+
+def element_bounds(elm, matrix=IDENTITY, style=None):
+  """
+  Return Bounds of the svgwrite element elm and all its children. The matrix
+  is the transformation from the element's parent to the result coordinates
+  and style is the presentation attributes inherited from parents.
+  """
+  style = _style(elm, style or {})
+  if "transform" in elm.attribs:
+    matrix = multiply(matrix, parse_transform(str(elm.attribs["transform"])))
+
+  b     = Bounds()
+  if hasattr(elm, "extents"):
+    # Connector pads know their own extents (see ConnSvgBase.extents)
+    b.add_rect(matrix, *elm.extents())
+    return b
+
+  name  = getattr(elm, "elementname", "")
+  a     = elm.attribs
+
+  sw = 0.0
+  if style.get("stroke", "none") != "none":
+    sw = (_num(style.get("stroke-width"), 1.0) or 0.0) / 2
+
+  if name == "circle":
+    cx, cy, r = _num(a.get("cx")), _num(a.get("cy")), _num(a.get("r"))
+    if None not in (cx, cy, r):
+      r += sw
+      b.add_rect(matrix, cx-r, cy-r, cx+r, cy+r)
+  elif name == "rect":
+    x, y  = _num(a.get("x")), _num(a.get("y"))
+    w, h  = _num(a.get("width")), _num(a.get("height"))
+    if None not in (x, y, w, h):
+      b.add_rect(matrix, x-sw, y-sw, x+w+sw, y+h+sw)
+  elif name == "line":
+    x1, y1 = _num(a.get("x1")), _num(a.get("y1"))
+    x2, y2 = _num(a.get("x2")), _num(a.get("y2"))
+    if None not in (x1, y1, x2, y2):
+      b.add_rect(matrix, min(x1, x2)-sw, min(y1, y2)-sw,
+                         max(x1, x2)+sw, max(y1, y2)+sw)
+  elif name == "path":
+    d = elm.commands if hasattr(elm, "commands") else a.get("d", "")
+    for x, y in path_points(d):
+      b.add_rect(matrix, x-sw, y-sw, x+sw, y+sw)
+  elif name == "text":
+    txt = elm.text if elm.text is not None else ""
+    if len(txt) > 0:
+      fs      = _num(style.get("font-size"), FONT_SIZE)
+      x, y    = _num(a.get("x")), _num(a.get("y"))
+      w       = FontMetrics.text_width(txt, fs)
+      anchor  = style.get("text-anchor", "start")
+      if anchor == "middle":
+        x -= w/2
+      elif anchor == "end":
+        x -= w
+      b.add_rect(matrix, x, y-fs*FontMetrics.ASCENT, x+w, 
+                         y+fs*FontMetrics.DESCENT)
+
+  for child in getattr(elm, "elements", ()):
+    b.add_bounds(element_bounds(child, matrix, style))
+  return b
+
+
+def find_element(elm, elem_id, matrix=IDENTITY, style=None):
+  """
+  Find element with id elem_id below elm. Return the tuple (element, matrix,
+  style) where matrix and style are inherited from the parents of the found
+  element. Return None if not found.
+  """
+  style = _style(elm, style or {})
+  if elm.attribs.get("id") == elem_id:
+    return elm, matrix, style
+  if "transform" in elm.attribs:
+    matrix = multiply(matrix, parse_transform(str(elm.attribs["transform"])))
+  for child in getattr(elm, "elements", ()):
+    found = find_element(child, elem_id, matrix, style)
+    if found:
+      return found
+  return None
+
+
+def drawing_bounds(dwg, elem_id=None):
+  """
+  Return bounds (x, y, width, height) of the element with id elem_id in the
+  drawing dwg. The whole drawing is bounded if elem_id is None or not found.
+  """
+  found = find_element(dwg, elem_id) if elem_id else None
+  if found:
+    elm, matrix, style = found
+    return element_bounds(elm, matrix, style).rect()
+  return element_bounds(dwg).rect()
+
+
+def set_viewbox(dwg, elem_id=None):
+  """
+  Set width, height and viewBox of drawing dwg to fit the element elem_id.
+  Return the bounds (x, y, width, height).
+  """
+  x, y, w, h = [round(v, 4) for v in drawing_bounds(dwg, elem_id)]
+  dwg.attribs["height"] = "%0.4fmm" % h
+  dwg.attribs["width"]  = "%0.4fmm" % w
+  dwg.viewbox(x, y, w, h)
+  return (x, y, w, h)
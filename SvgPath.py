@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+Parser for the d attribute of svg path elements. A d string is tokenized by
+one precompiled regular expression and split into segments with one command
+each. Implicit repeated commands, comma separators and scientific notation
+are supported.
+"""
+
+import math
+import re
+
+# Number of arguments for each command
+ARGS = {"M":2, "L":2, "T":2, "H":1, "V":1, "C":6, "S":4, "Q":4, "A":7, "Z":0}
+
+_re_token = re.compile(r"([MmZzLlHhVvCcSsQqTtAa])"
+                       r"|([-+]?(?:[0-9]*\.[0-9]+|[0-9]+\.?)(?:[eE][-+]?[0-9]+)?)"
+                       r"|([^\s,])")
+
+
+def parse_path(d):
+  """
+  Parse the path d string. Return a list of segments (command, args) where
+  args is a tuple of floats. Raise ValueError if d is not valid.
+  """
+  segments  = []
+  cmd       = None
+  args      = []
+  for c, num, bad in _re_token.findall(d):
+    if bad:
+      raise ValueError("Invalid character '%s' in path" % bad)
+    if c:
+      if cmd is not None:
+        _add_segments(segments, cmd, args)
+      cmd, args = c, []
+    elif cmd is None:
+      raise ValueError("Path must start with a command")
+    else:
+      args.append(num)
+  if cmd is not None:
+    _add_segments(segments, cmd, args)
+  return segments
+
+
+def _add_segments(segments, cmd, args):
+  """ Split the arguments args of command cmd into segments. """
+  n = ARGS[cmd.upper()]
+  if n == 0:
+    if args:
+      raise ValueError("Command %s takes no arguments" % cmd)
+    segments.append((cmd, ()))
+    return
+
+  if cmd in "Aa":
+    args = _split_arc_flags(args)
+  if len(args) == 0 or len(args) % n != 0:
+    raise ValueError("Wrong number of arguments for command %s" % cmd)
+
+  for i in range(0, len(args), n):
+    a = tuple(float(v) for v in args[i:i+n])
+    if not all(map(math.isfinite, a)):
+      raise ValueError("Number out of range in command %s" % cmd)
+    if cmd in "Aa" and (a[3] not in (0, 1) or a[4] not in (0, 1)):
+      raise ValueError("Arc flags must be 0 or 1")
+    segments.append((cmd, a))
+    # Implicit commands after a move are line commands
+    if cmd == "M":
+      cmd = "L"
+    elif cmd == "m":
+      cmd = "l"
+
+
+def _split_arc_flags(args):
+  """
+  Arc flags need no separator (e.g. "a1 1 0 01 5 5"). Split such number
+  tokens into flags and the following number.
+  """
+  out = []
+  for tok in args:
+    while len(out) % 7 in (3, 4) and len(tok) > 1 and tok[0] in "01":
+      out.append(tok[0])
+      tok = tok[1:]
+    out.append(tok)
+  return out
+
+
+def format_number(v):
+  """ Format number v for a path command. Integers have no decimals. """
+  return str(int(v)) if v == int(v) else repr(v)
+
+
+def format_segment(cmd, args):
+  """ Return the segment (cmd, args) as a command string, e.g. "L 1 2.5". """
+  return " ".join([cmd] + [format_number(v) for v in args])
+
+
+def parse_path_cmds(d):
+  """
+  Parse the path d string. Return a list of command strings, one for each
+  segment. Raise ValueError if d is not valid.
+  """
+  return [format_segment(c, a) for c, a in parse_path(d)]
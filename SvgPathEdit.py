@@ -5,103 +5,203 @@ Created on Wed Oct  9 23:44:13 2013
 @author: snoozerworks
 """
 
-from PyQt4.QtCore import Qt, pyqtSignal
-from PyQt4.QtGui import QLineEdit, QListWidget, QListWidgetItem
+from PyQt4 import QtCore
+from PyQt4.QtCore import Qt, pyqtSignal, QAbstractListModel
+from PyQt4.QtGui import QLineEdit, QListView
 import ComponentBase as Cmp
+from UndoStack import SliceEdit
+
+
+class SegmentListModel(QAbstractListModel):
+  """
+  List model of the silkscreen path segments of a component. The first
+  segment (the initial move to origin) is not listed. Rows are read from the
+  component on demand, so large paths need no item objects.
+  """
+  def __init__(self):
+    super().__init__()
+    self.cmp        = None
+    self.undo_stack = None  # UndoStack recording edits, if any
+
+
+  def set_component(self, cmp):
+    """ Assign the component holding the silkscreen. """
+    self.beginResetModel()
+    self.cmp = cmp
+    self.endResetModel()
+
+
+  def reset(self):
+    """ Notify views that the segments have changed. """
+    self.beginResetModel()
+    self.endResetModel()
+
+
+  def rowCount(self, parent=QtCore.QModelIndex()):
+    if self.cmp is None or parent.isValid():
+      return 0
+    return len(self.cmp.silkscreen_commands) - 1
+
+
+  def data(self, index, role=Qt.DisplayRole):
+    if role not in (Qt.DisplayRole, Qt.EditRole) or not index.isValid():
+      return None
+    return str(self.cmp.silkscreen_commands[index.row()+1])
+
+
+  def _record(self, start, old, n):
+    """ Record replacement of old at command start with n commands. """
+    if self.undo_stack is not None:
+      cmds = self.cmp.silkscreen_commands
+      self.undo_stack.push(SliceEdit(self, start, old, cmds[start:start+n]))
+
+
+  def add_segments(self, txt):
+    """ Append segments in txt. Return False if txt is invalid. """
+    commands = Cmp.ComponentBase.validate_path(txt)
+    if not commands:
+      return False
+    n = self.rowCount()
+    self.beginInsertRows(QtCore.QModelIndex(), n, n+len(commands)-1)
+    self.cmp.set_silkscreen_segment(txt)
+    self.endInsertRows()
+    self._record(n+1, [], len(commands))
+    return True
+
+
+  def appended(self, start):
+    """ Show and record commands appended from command start by others. """
+    self.reset()
+    self._record(start, [], len(self.cmp.silkscreen_commands)-start)
+
+
+  def update_segment(self, txt, row):
+    """ Replace segment at row with segments in txt. """
+    cmds  = self.cmp.silkscreen_commands
+    n     = len(cmds)
+    old   = cmds[row+1:row+2]
+    if not self.cmp.set_silkscreen_segment(txt, row+1):
+      return False
+    self.reset()
+    self._record(row+1, old, len(cmds)-n+1)
+    return True
+
+
+  def remove_segment(self, row):
+    """ Remove segment at row. """
+    if row<0 or row>=self.rowCount():
+      return False
+    old = self.cmp.silkscreen_commands[row+1:row+2]
+    self.beginRemoveRows(QtCore.QModelIndex(), row, row)
+    self.cmp.set_silkscreen_segment("", row+1)
+    self.endRemoveRows()
+    self._record(row+1, old, 0)
+    return True
+
+
+  def replace(self, start, stop, commands):
+    """ Replace commands start to stop with commands. Used by undo. """
+    self.cmp.silkscreen_commands[start:stop] = commands
+    self.reset()
+
+
 
 class SvgPathEdit(QLineEdit):
   """
-  This is an extionsion to a QLineEdit. It checks for inputs that can be used 
-  as values for the d attribute of a svg path element. 
-  By Calling setup() a QListWidget is supplied to list the path segments. 
+  This is an extionsion to a QLineEdit. It checks for inputs that can be used
+  as values for the d attribute of a svg path element.
+  By Calling set_list() a QListView is supplied to list the path segments.
   """
   segmentsChanged = pyqtSignal() # When a path segment is added, updated or removed
-  
+
   def __init__(self, *args, **kwargs):
     super().__init__(*args, **kwargs)
-    self._cmp  = None 
-    self._list = None
-    
-  
+    self._cmp   = None
+    self._list  = None
+    self._model = SegmentListModel()
+
+
   def set_component(self, component):
     """ Assign a ComponentBase object at which to set the silkscreen. """
     assert isinstance(component, Cmp.ComponentBase)
-    self._cmp  = component 
-    self.sync_list()
-    
-
-  def set_list(self, qlistwidget):
-    """ Provide the qlistwidget (QListWidget) to list the path segments. """
-    assert isinstance(qlistwidget, QListWidget)
-    self._list = qlistwidget
-    self._list.itemDoubleClicked.connect(self.on_remove)
-    self._list.itemSelectionChanged.connect(self.on_select)
-    
-    
+    self._cmp  = component
+    self._model.set_component(component)
+
+
+  def set_list(self, qlistview):
+    """ Provide the qlistview (QListView) to list the path segments. """
+    assert isinstance(qlistview, QListView)
+    self._list = qlistview
+    self._list.setUniformItemSizes(True)
+    self._list.setModel(self._model)
+    self._list.doubleClicked.connect(self.on_remove)
+    self._list.selectionModel().selectionChanged.connect(self.on_select)
+
+
   def sync_list(self):
-    """ Re-populate the QListWidget with path segments from component. """
-    if self._list==None or self._cmp==None:
-      return
-    self._list.clear()
-    cmds = self._cmp.silkscreen_commands
-    for i in range(1,len(cmds)):
-      QListWidgetItem(cmds[i], self._list)
-  
-    
+    """ Update the QListView with path segments from component. """
+    self._model.reset()
+
+
+  def set_undo_stack(self, stack):
+    """ Record segment edits on the UndoStack stack. """
+    self._model.undo_stack = stack
+
+
+  def segments_appended(self, start):
+    """ Update the QListView and record segments added from command start. """
+    self._model.appended(start)
+
+
   def keyPressEvent(self, event):
-    """ 
-    Validate path shape text when pressing Enter or Ctrl+Enter. If valid, add 
-    shape to QListWidget and emit the addedSegment() signal. The segments may 
-    be added, updated (Ctrl+Enter) or removed (Ctrl+Enter with empty input) 
+    """
+    Validate path shape text when pressing Enter or Ctrl+Enter. If valid, add
+    shape to QListView and emit the segmentsChanged() signal. The segments may
+    be added, updated (Ctrl+Enter) or removed (Ctrl+Enter with empty input)
     from the path.
-    Up and Down key presses are passed on to the supplied QListWidget in order
+    Up and Down key presses are passed on to the supplied QListView in order
     to select path segments.
     """
-    row = self._list.currentRow()
+    row = self._list.currentIndex().row()
     txt = self.text()
-    if event.key()==Qt.Key_Enter:  
+    if event.key()==Qt.Key_Enter:
       event.accept()
       if (event.modifiers()==(Qt.ControlModifier|Qt.KeypadModifier) and
-            row>=0): 
-        
+            row>=0):
+
         if txt=="":
           # Remove selected segment
-          self.on_remove(self._list.currentItem())
-        elif self._cmp.set_silkscreen_segment(txt, row+1):
-          # Update selected segment
-          self._list.item(row).setText(txt)
+          self.on_remove(self._list.currentIndex())
+        elif self._model.update_segment(txt, row):
+          # Update selected segment. Text may hold several segments.
+          self._list.setCurrentIndex(self._model.index(row))
           self.segmentsChanged.emit()
-        
-      elif self._cmp.set_silkscreen_segment(txt):
-        # Add new segment
-        QListWidgetItem(txt, self._list)
+
+      elif self._model.add_segments(txt):
+        # Add new segments
         self.segmentsChanged.emit()
-      
-    elif event.key() in (Qt.Key_Up, Qt.Key_Down):  
+
+    elif event.key() in (Qt.Key_Up, Qt.Key_Down):
       self._list.keyPressEvent(event)
-    
+
     return super().keyPressEvent(event)
 
-    
+
   def on_select(self):
     """ Copy selected text to the line edit field. """
     try:
-      item = self._list.selectedItems()[0]
+      index = self._list.selectionModel().selectedIndexes()[0]
     except IndexError:
       return
     else:
-      self.setText(item.text())
+      self.setText(index.data())
       self.selectAll()
-    
 
-  def on_remove(self, item):
+
+  def on_remove(self, index):
     """
-    Remove the path segment which was double clicked and emit the 
-    removedSegment() signal.
+    Remove the path segment which was double clicked and emit the
+    segmentsChanged() signal.
     """
-    row = self._list.row(item)
-    if self._cmp.set_silkscreen_segment("", row+1):
-      x = self._list.takeItem(row)
-      del x
+    if self._model.remove_segment(index.row()):
       self.segmentsChanged.emit()
-
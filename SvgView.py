@@ -9,76 +9,109 @@ from PyQt4.QtGui import QGraphicsView
 from PyQt4 import QtCore, QtGui, QtSvg 
 
 from ComponentBase import ComponentBase
-import svgwrite
+import Fzpz
+import Instrument
+import SvgBounds
+import SvgWriter
+import io
+import os
 
 
 #from pympler import tracker
 #tr = tracker.SummaryTracker()
 
 class SvgView(QGraphicsView):
-  schematic_width   = 200
-  schematic_height  = 200
   pcb_width         = 50
   pcb_height        = 50
   schematic_fname   = "schematic.svg"
   pcb_fname         = "pcb.svg"
+  grid_pitch        = 7.5       # Schematic grid pitch (mm)
+  grid_color        = "#BBBBBB"
+  grid_tile_size    = 64        # Size of the raster grid tile in pixels
+  hit_tolerance     = 3         # Max distance (pixels) of a hit connector
+  hover_color       = "#3080FF"
+
+  # Emitted with the row of a connector clicked on the canvas
+  connectorClicked  = QtCore.pyqtSignal(int)
   
   def __init__(self, parent):
     super(SvgView, self).__init__(parent)
     self._cmp       = None # The component to draw
-    self._renderer  = None
+    self._renderers = {"schematic"  : QtSvg.QSvgRenderer(self), # One per view
+                       "pcb"        : QtSvg.QSvgRenderer(self)}
+    self._renderer  = None # Renderer of the view shown
+    self._view      = None # View shown, "schematic" or "pcb"
     self._bounds    = None
-    
-    # Create background grid
-    self.s_bg = self._init_schema_bg()
-    self.p_bg = self._init_pcb_bg()
-
-
-  def _init_schema_bg(self):
-    """ Create schematics background. """
-    h = SvgView.schematic_height
-    w = SvgView.schematic_width
-
-    g = svgwrite.container.Group(stroke="#BBBBBB", stroke_width="0.2mm") 
-    s = round(w / 2.0 / 7.5)
-    for i in range(-s,s):
-      x = i * 7.5 + 7.5/2
-      g.add(svgwrite.shapes.Line((x,"-100%"), (x, "100%"))) 
-      
-    s = round(h / 2.0 / 7.5)
-    for i in range(-s,s):
-      x = i * 7.5 + 7.5/2
-      g.add(svgwrite.shapes.Line(("-100%", x), ("100%", x))) 
-    return g
-    
+    self._dwg       = None # Drawing to render. Renderer is stale if not None.
+    self._pixmap    = None # Last render. Stale if None or of other size.
+    self._grid_tile = None # Created on first paint
+    self._rect      = None # Svg bounds in device coordinates of last render
+    self._hover     = None # Connector under the mouse
+    self.viewport().setMouseTracking(True)
 
-  def _init_pcb_bg(self):
-    """ Create pcb background. """
-    g = svgwrite.container.Group(stroke="#BBBBBB", stroke_width="0.1mm") 
-    g.add(svgwrite.shapes.Line((0,"-100%"), (0,"100%"))) 
-    g.add(svgwrite.shapes.Line(("-100%",0), ("100%",0))) 
-    return g
+
+  def _init_grid_tile(self):
+    """
+    Create the schematic grid tile. The tile is one grid pitch with the grid
+    lines through its centre, as the lines are at half pitch from the origin.
+    """
+    n     = SvgView.grid_tile_size
+    tile  = QtGui.QPixmap(n, n)
+    tile.fill(QtCore.Qt.transparent)
+    pen   = QtGui.QPen(QtGui.QColor(SvgView.grid_color))
+    pen.setWidthF(0.2 * n / SvgView.grid_pitch)  # 0.2 mm
+    painter = QtGui.QPainter()
+    painter.begin(tile)
+    painter.setPen(pen)
+    painter.drawLine(QtCore.QPointF(n/2.0, 0), QtCore.QPointF(n/2.0, n))
+    painter.drawLine(QtCore.QPointF(0, n/2.0), QtCore.QPointF(n, n/2.0))
+    painter.end()
+    return tile
+
+
+  def _paint_grid(self, painter, rect):
+    """
+    Paint the background grid on painter, where rect is the svg bounds in
+    device coordinates. The schematic grid is a tiled pixmap, the pcb grid a
+    crosshair through the origin.
+    """
+    if self._bounds.width() <= 0:
+      return
+    scale   = rect.width() / self._bounds.width()  # Pixels per mm
+    ox      = rect.x() - self._bounds.x() * scale  # Origin
+    oy      = rect.y() - self._bounds.y() * scale
+    if self._view == "schematic":
+      if self._grid_tile is None:
+        self._grid_tile = self._init_grid_tile()
+      k       = SvgView.grid_pitch * scale / SvgView.grid_tile_size
+      brush   = QtGui.QBrush(self._grid_tile)
+      brush.setTransform(QtGui.QTransform(k, 0, 0, k, ox, oy))
+      painter.fillRect(painter.window(), brush)
+    else:
+      pen = QtGui.QPen(QtGui.QColor(SvgView.grid_color))
+      pen.setWidthF(0.1 * scale)  # 0.1 mm
+      painter.setPen(pen)
+      w = painter.window()
+      painter.drawLine(QtCore.QPointF(ox, w.top()), QtCore.QPointF(ox, w.bottom()))
+      painter.drawLine(QtCore.QPointF(w.left(), oy), QtCore.QPointF(w.right(), oy))
     
 
   def set_component(self, cmp):
     """ Set a component to render on the viewport. """
     assert isinstance(cmp, ComponentBase)
-    self._cmp = cmp
+    self._cmp   = cmp
+    self._hover = None
     
 
-  def build_schematic(self, background=True):
-    if background:
-      self._cmp.build_schematic(self.s_bg)
-    else:
+  def build_schematic(self):
+    with Instrument.stage("build"):
       self._cmp.build_schematic()
     self._set_bounds("schematic")
 #    tr.print_diff()
     
 
-  def build_pcb(self, background=True):
-    if background:
-      self._cmp.build_pcb(self.p_bg)
-    else:
+  def build_pcb(self):
+    with Instrument.stage("build"):
       self._cmp.build_pcb()
     self._set_bounds("pcb")
 
@@ -87,8 +120,45 @@ class SvgView(QGraphicsView):
     """ Overloads the QGraphicsView method. Makes the svg appear. """
     # Draw component on the SvgView  
     
-    painter   = QtGui.QPainter()   
-    painter.begin(self.viewport())
+    # The first paint after a rebuild ends the refresh, other paints (expose,
+    # hover, resize) are not part of a refresh.
+    rebuilt = self._dwg is not None
+    if rebuilt:
+      with Instrument.stage("serialize"):
+        buf             = io.BytesIO()
+        SvgWriter.write(self._dwg, buf, header=False)
+        xml             = QtCore.QByteArray(buf.getvalue())
+      with Instrument.stage("renderer"):
+        self._renderer.load(xml)
+      self._dwg       = None
+      self._pixmap    = None
+      assert self._renderer.isValid()
+
+    if self._renderer is None:
+      return  # Nothing built yet
+    
+    # Only rasterise the svg if the drawing or the viewport size has changed
+    size = self.viewport().size()
+    if self._pixmap is None or self._pixmap.size() != size:
+      with Instrument.stage("rasterise"):
+        self._pixmap = self._rasterise(size)
+
+    with Instrument.stage("paint"):
+      painter = QtGui.QPainter()
+      painter.begin(self.viewport())
+      painter.drawPixmap(0, 0, self._pixmap)
+      self._paint_hover(painter)
+      painter.end()
+    if rebuilt:
+      Instrument.end_refresh()
+
+
+  def _rasterise(self, size):
+    """ Return a pixmap of size with the grid and the svg scaled to fit. """
+    pixmap  = QtGui.QPixmap(size)
+    pixmap.fill(QtCore.Qt.transparent)
+    painter = QtGui.QPainter()   
+    painter.begin(pixmap)
 
     # Scale viewport to fit contents of the svg 
     bs  = self._bounds.size()
@@ -98,40 +168,102 @@ class SvgView(QGraphicsView):
     x   = (vps.width()-bs.width()) / 2
     y   = (vps.height()-bs.height()) / 2
     
-    painter.setViewport(QtCore.QRect(QtCore.QPoint(x,y), bs.toSize()))
+    rect = QtCore.QRect(QtCore.QPoint(x,y), bs.toSize())
+    self._rect = QtCore.QRectF(rect)
+    self._paint_grid(painter, QtCore.QRectF(rect))
+    painter.setViewport(rect)
     
     self._renderer.render(painter)
     painter.end()
+    return pixmap
 
     
+  def _index(self):
+    """ Return the hit test index of the view shown. """
+    if self._view == "schematic":
+      return self._cmp.sch_index
+    return self._cmp.pcb_index
+
+
+  def _scale(self):
+    """ Return pixels per mm of the last render. """
+    return self._rect.width() / self._bounds.width()
+
+
+  def connector_at(self, pos):
+    """ Return the connector at pos (viewport coordinates) or None. """
+    if self._cmp is None or self._rect is None or self._bounds.width() <= 0:
+      return None
+    scale = self._scale()
+    x     = self._bounds.x() + (pos.x()-self._rect.x()) / scale
+    y     = self._bounds.y() + (pos.y()-self._rect.y()) / scale
+    with Instrument.stage("hit_test"):
+      return self._index().at(x, y, SvgView.hit_tolerance / scale)
+
+
+  def _paint_hover(self, painter):
+    """ Outline the connector under the mouse. """
+    if self._hover is None:
+      return
+    box = self._index().bounds(self._hover)
+    if box is None:
+      return
+    scale = self._scale()
+    ox    = self._rect.x() - self._bounds.x() * scale
+    oy    = self._rect.y() - self._bounds.y() * scale
+    painter.setPen(QtGui.QPen(QtGui.QColor(SvgView.hover_color)))
+    painter.drawRect(QtCore.QRectF(ox + box[0]*scale, oy + box[1]*scale,
+                                   (box[2]-box[0])*scale, 
+                                   (box[3]-box[1])*scale).adjusted(-1, -1, 1, 1))
+
+
+  def mouseMoveEvent(self, e):
+    """ Highlight the connector under the mouse. """
+    con = self.connector_at(e.pos())
+    if con is not self._hover:
+      self._hover = con
+      self.setToolTip(con.s_label if con is not None else "")
+      self.viewport().update()
+    super(SvgView, self).mouseMoveEvent(e)
+
+
+  def leaveEvent(self, e):
+    if self._hover is not None:
+      self._hover = None
+      self.viewport().update()
+    super(SvgView, self).leaveEvent(e)
+
+
+  def mousePressEvent(self, e):
+    """ Emit connectorClicked with the row of a clicked connector. """
+    if e.button() == QtCore.Qt.LeftButton:
+      con = self.connector_at(e.pos())
+      if con is not None:
+        self.connectorClicked.emit(con.row)
+    super(SvgView, self).mousePressEvent(e)
+
+
   def _set_bounds(self, bound_elem=""):
     """
-    An ugly way to set the svg bounds by using QSvgRenderer.boundsOnElement().
+    Set the svg bounds from the element geometry (see SvgBounds). The 
+    renderer of the view is reloaded on the next paint event.
     """
     if bound_elem == "schematic":
-      dwg = self._cmp.drw_sch
+      dwg     = self._cmp.drw_sch
+      elem_id = "schematic"
     elif bound_elem == "pcb":
-      dwg = self._cmp.drw_pcb
+      dwg     = self._cmp.drw_pcb
+      elem_id = None  # Pcb layers are root elements, bound the whole drawing
     else:
       raise Exception("Unknown drawing bound")
     
-    xml       = bytearray(dwg.tostring().encode('utf-8'))  # The svg as a xml string
-    renderer  = QtSvg.QSvgRenderer(xml)                         # Create svg renderer
-    assert renderer.isValid()
-    
-    bounds  = renderer.boundsOnElement(bound_elem)
-    renderer.setViewBox(bounds)
-    x       = round(bounds.x(), 4)
-    y       = round(bounds.y(), 4)
-    h       = round(bounds.height(), 4)
-    w       = round(bounds.width(), 4)
-    
-    dwg.attribs["height"] = "%0.4fmm" % h
-    dwg.attribs["width"]  = "%0.4fmm" % w
-    dwg.viewbox(x,y,w,h)
-    
-    self._renderer  = renderer
-    self._bounds    = bounds
+    with Instrument.stage("bounds"):
+      x, y, w, h  = SvgBounds.set_viewbox(dwg, elem_id)
+    self._bounds    = QtCore.QRectF(x, y, w, h)
+    self._rect      = None  # Set when rasterised
+    self._dwg       = dwg
+    self._renderer  = self._renderers[bound_elem]
+    self._view      = bound_elem
     
 
   def export_svg(self):
@@ -142,11 +274,26 @@ class SvgView(QGraphicsView):
     if directory == "":
       return
     
-    print("Export schematic to " + directory + "\\" + SvgView.schematic_fname)
-    print("Export pcb to " + directory + "\\" + SvgView.pcb_fname)
+    schematic = os.path.join(directory, SvgView.schematic_fname)
+    pcb       = os.path.join(directory, SvgView.pcb_fname)
+    print("Export schematic to " + schematic)
+    print("Export pcb to " + pcb)
 
-    self.build_schematic(False)
-    self._cmp.drw_sch.saveas(directory + "\\" + SvgView.schematic_fname)
+    self.build_schematic()
+    SvgWriter.save(self._cmp.drw_sch, schematic)
     
-    self.build_pcb(False)
-    self._cmp.drw_pcb.saveas(directory + "\\" + SvgView.pcb_fname)
+    self.build_pcb()
+    SvgWriter.save(self._cmp.drw_pcb, pcb)
+
+
+  def export_fzpz(self):
+    """ 
+    Export the component as a Fritzing part (fzp and svgs in a fzpz file).
+    """    
+    filename = QtGui.QFileDialog.getSaveFileName(self, "Export Fritzing part", 
+                                                 Fzpz.file_name(self._cmp) + ".fzpz",
+                                                 "*.fzpz")
+    if filename == "":
+      return
+    print("Export Fritzing part to " + filename)
+    Fzpz.save(self._cmp, filename)
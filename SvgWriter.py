@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""
+Streaming serializer for svgwrite drawings. Elements are written directly
+to a binary file object (a file or a socket file) in small chunks, without
+building an ElementTree or a string of the whole drawing. The output is the
+same as svgwrite's Drawing.write().
+
+Attributes repeat a lot between connectors (fill, stroke, radius etc.), so
+encoded name="value" fragments are cached.
+"""
+
+from svgwrite.drawing import Drawing
+from svgwrite.text import TSpan
+from svgwrite.utils import strlist
+
+XML_HEADER  = b'<?xml version="1.0" encoding="utf-8" ?>\n'
+CHUNK_SIZE  = 65536   # Bytes to collect before writing to the file object
+CACHE_SIZE  = 16384   # Max number of cached attribute fragments
+
+_fragments  = {}      # (name, value) -> encoded ' name="value"'
+
+
+def _escape_attrib(txt):
+  if any(c in txt for c in '&<>"\n\r\t'):
+    txt = (txt.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+              .replace('"', "&quot;").replace("\r", "&#13;")
+              .replace("\n", "&#10;").replace("\t", "&#09;"))
+  return txt
+
+
+def _escape_text(txt):
+  if any(c in txt for c in "&<>"):
+    txt = txt.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+  return txt
+
+
+def _fragment(name, value):
+  """ Return encoded attribute fragment ' name="value"'. """
+  key = (name, value)
+  try:
+    return _fragments[key]
+  except KeyError:
+    pass
+  except TypeError:
+    key = None  # Value not hashable
+  frag = (' %s="%s"' % (name, _escape_attrib(value))).encode("utf-8")
+  if key is not None:
+    if len(_fragments) >= CACHE_SIZE:
+      _fragments.clear()
+    _fragments[key] = frag
+  return frag
+
+
+def _attribs(elm):
+  """ Return the attributes of elm as svgwrite would write them. """
+  attribs = elm.attribs
+  if hasattr(elm, "commands"):
+    attribs["d"] = str(strlist(elm.commands, " "))  # Path, as Path.get_xml()
+  if isinstance(elm, Drawing):
+    # As Drawing.get_xml()
+    attribs["xmlns"]        = "http://www.w3.org/2000/svg"
+    attribs["xmlns:xlink"]  = "http://www.w3.org/1999/xlink"
+    attribs["xmlns:ev"]     = "http://www.w3.org/2001/xml-events"
+    attribs["baseProfile"]  = elm.profile
+    attribs["version"]      = elm.version
+  return attribs
+
+
+def _write_element(elm, out):
+  """ Append encoded chunks of elm and its children to the list out. """
+  name  = elm.elementname
+  parts = [b"<", name.encode("utf-8")]
+  for k, v in sorted(_attribs(elm).items()):
+    if v is not None:
+      v = elm.value_to_string(v)
+      if v:
+        parts.append(_fragment(k, v))
+
+  text = str(elm.text) if isinstance(elm, TSpan) else ""
+  if text or len(elm.elements) > 0:
+    parts.append(b">")
+    parts.append(_escape_text(text).encode("utf-8"))
+    out.append(b"".join(parts))
+    for child in elm.elements:
+      _write_element(child, out)
+    out.append(b"</" + name.encode("utf-8") + b">")
+  else:
+    parts.append(b" />")
+    out.append(b"".join(parts))
+
+
+class _ChunkWriter(list):
+  """ List of chunks that is written to fileobj when it grows large. """
+  def __init__(self, fileobj):
+    super().__init__()
+    self._fileobj = fileobj
+    self._size    = 0
+
+  def append(self, chunk):
+    super().append(chunk)
+    self._size += len(chunk)
+    if self._size >= CHUNK_SIZE:
+      self.flush()
+
+  def flush(self):
+    self._fileobj.write(b"".join(self))
+    del self[:]
+    self._size = 0
+
+
+def write(dwg, fileobj, header=True):
+  """ Write drawing dwg (or any svgwrite element) to binary fileobj. """
+  out = _ChunkWriter(fileobj)
+  if header:
+    out.append(XML_HEADER)
+  _write_element(dwg, out)
+  out.flush()
+
+
+def save(dwg, filename):
+  """ Write drawing dwg to the file filename. """
+  with open(filename, mode="wb") as f:
+    write(dwg, f)
@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+"""
+Undo and redo of edits. Edits are recorded as small deltas, e.g. the row,
+attribute and old and new value of a changed cell, instead of snapshots of
+the component state. Recording an edit is O(1) in the size of the part.
+
+The stack has a budget of stored values. When it is exceeded the oldest
+edits are dropped.
+
+Edits are applied through the target (a model) that recorded them, so views
+are updated. Edits pushed by the target while the stack applies an edit are
+ignored. Does not import PyQt4.
+"""
+
+import collections
+
+
+class UndoStack:
+  """ Stack of undoable edits with a memory budget. """
+
+  def __init__(self, max_cost=100000):
+    """ Max_cost is the max number of values stored by all edits. """
+    self.max_cost = max_cost
+    self._undo    = collections.deque()
+    self._redo    = []
+    self._cost    = 0     # Cost of edits in the undo stack
+    self._group   = None  # Edits of a group being recorded
+    self._depth   = 0     # Nesting of begin_group()
+    self._busy    = False # True while undoing or redoing
+
+
+  def push(self, edit):
+    """ Add an edit that has been done. Clears the redo stack. """
+    if self._busy:
+      return
+    if self._group is not None:
+      self._group.append(edit)
+      return
+    self._undo.append(edit)
+    self._cost += edit.cost
+    self._redo  = []
+    while self._cost > self.max_cost and len(self._undo) > 1:
+      self._cost -= self._undo.popleft().cost
+
+
+  def begin_group(self):
+    """ Record following edits as one edit until end_group(). """
+    if self._depth == 0:
+      self._group = []
+    self._depth += 1
+
+
+  def end_group(self):
+    self._depth -= 1
+    if self._depth > 0:
+      return
+    edits, self._group = self._group, None
+    if len(edits) == 1:
+      self.push(edits[0])
+    elif len(edits) > 1:
+      self.push(GroupEdit(edits))
+
+
+  def can_undo(self):
+    return len(self._undo) > 0
+
+
+  def can_redo(self):
+    return len(self._redo) > 0
+
+
+  def undo(self):
+    """ Undo the last edit. Return False if there is nothing to undo. """
+    if not self._undo:
+      return False
+    edit        = self._undo.pop()
+    self._cost -= edit.cost
+    self._apply(edit.undo)
+    self._redo.append(edit)
+    return True
+
+
+  def redo(self):
+    """ Redo the last undone edit. Return False if there is nothing to redo. """
+    if not self._redo:
+      return False
+    edit        = self._redo.pop()
+    self._apply(edit.redo)
+    self._undo.append(edit)
+    self._cost += edit.cost
+    return True
+
+
+  def _apply(self, f):
+    self._busy = True
+    try:
+      f()
+    finally:
+      self._busy = False
+
+
+  def clear(self):
+    """ Remove all edits, e.g. when another component is loaded. """
+    self._undo.clear()
+    self._redo  = []
+    self._cost  = 0
+
+
+  @property
+  def cost(self):
+    """ Number of values stored by edits that can be undone. """
+    return self._cost
+
+
+
+class AttrEdit:
+  """
+  Change of connector attributes. Changes is a list of (row, attribute, old
+  value, new value), applied in order by target.set_attrs().
+  """
+  __slots__ = ("target", "changes")
+
+  def __init__(self, target, changes):
+    self.target   = target
+    self.changes  = changes
+
+  @property
+  def cost(self):
+    return len(self.changes)
+
+  def undo(self):
+    self.target.set_attrs([(r, a, old) for r, a, old, _ in self.changes])
+
+  def redo(self):
+    self.target.set_attrs([(r, a, new) for r, a, _, new in self.changes])
+
+
+
+class RowsEdit:
+  """
+  Connectors added or removed at row. States holds the states of removed
+  connectors and is None when connectors were added.
+  """
+  __slots__ = ("target", "row", "count", "states")
+
+  def __init__(self, target, row, count, states=None):
+    self.target = target
+    self.row    = row
+    self.count  = count
+    self.states = states
+
+  @property
+  def cost(self):
+    return 1 if self.states is None else len(self.states)
+
+  def undo(self):
+    if self.states is None:
+      self.target.removeRows(self.row, self.count)
+    else:
+      self.target.insert_connectors(self.row, self.states)
+
+  def redo(self):
+    if self.states is None:
+      self.target.insertRows(self.row, self.count)
+    else:
+      self.target.removeRows(self.row, self.count)
+
+
+
+class SliceEdit:
+  """
+  Replacement of the list slice [start:start+len(old)] with new, e.g. of
+  silkscreen path commands. Applied by target.replace(start, stop, items).
+  """
+  __slots__ = ("target", "start", "old", "new")
+
+  def __init__(self, target, start, old, new):
+    self.target = target
+    self.start  = start
+    self.old    = old
+    self.new    = new
+
+  @property
+  def cost(self):
+    return len(self.old) + len(self.new)
+
+  def undo(self):
+    self.target.replace(self.start, self.start+len(self.new), self.old)
+
+  def redo(self):
+    self.target.replace(self.start, self.start+len(self.old), self.new)
+
+
+
+class GroupEdit:
+  """ Edits done and undone together. """
+  __slots__ = ("edits",)
+
+  def __init__(self, edits):
+    self.edits = edits
+
+  @property
+  def cost(self):
+    return sum(e.cost for e in self.edits)
+
+  def undo(self):
+    for e in reversed(self.edits):
+      e.undo()
+
+  def redo(self):
+    for e in self.edits:
+      e.redo()
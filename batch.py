@@ -0,0 +1,126 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+Headless batch generation of component svgs. Does not import PyQt4.
+
+The batch spec is a json file with a list of components, or a dict with the
+keys "components" and optionally "defaults". Each component is a dict with
+the same keys as returned by ComponentRect.get_state(). Connector states may
+be partial. Additional keys:
+  pin_count  - Add connectors until the component has this many.
+  package    - Parameters of a package (see Packages) with the key "type",
+               e.g. {"type": "QFP", "pins": 64}. The connectors of the
+               package are created first and connector states in the spec
+               change them.
+  directory  - Output directory relative to the output root. Defaults to the
+               part name.
+
+With --fzpz a Fritzing part bundle <part name>.fzpz is also written to the
+output directory of each component.
+
+Example:
+  {"defaults"   : {"mount": 1, "p_spacing_v": 1.27},
+   "components" : [{"part_name": "SO8", "pin_count": 8},
+                   {"part_name": "LED", "mount": 2,
+                    "connectors": [{"s_label": "A"},
+                                   {"s_label": "K", "s_dir": "W"}]},
+                   {"part_name": "MCU", "package": {"type": "QFP", "pins": 64,
+                                                    "pitch": 0.5}}]}
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+from ComponentRect import ComponentRect
+import Fzpz
+import Packages
+import SvgBounds
+import SvgWriter
+
+SCHEMATIC_FNAME = "schematic.svg"
+PCB_FNAME       = "pcb.svg"
+
+
+def load_spec(filename):
+  """ Return list of component specs in batch file, with defaults applied. """
+  with open(filename, encoding="utf-8") as f:
+    spec = json.load(f)
+  if isinstance(spec, list):
+    spec = {"components": spec}
+  defaults = spec.get("defaults", {})
+  return [dict(defaults, **c) for c in spec["components"]]
+
+
+def build_component(spec):
+  """ Create a ComponentRect from a component spec. """
+  spec      = dict(spec)
+  pin_count = spec.pop("pin_count", None)
+  package   = spec.pop("package", None)
+  spec.pop("directory", None)
+
+  # Mount must be set before connectors are added to get the right shapes.
+  state = {}
+  if "mount" in spec:
+    state["mount"] = spec.pop("mount")
+  state.update(spec)
+
+  cmp = Packages.create(package) if package else ComponentRect()
+  cmp.set_state(state)
+  if pin_count is not None and pin_count > len(cmp.connectors):
+    cmp.add_connectors(pin_count - len(cmp.connectors))
+  return cmp
+
+
+def export_component(cmp, directory, fzpz=False):
+  """ 
+  Build schematic and pcb drawings of cmp and save them to directory. If
+  fzpz is True a Fritzing part bundle is also saved.
+  """
+  os.makedirs(directory, exist_ok=True)
+
+  cmp.build_schematic()
+  SvgBounds.set_viewbox(cmp.drw_sch, "schematic")
+  SvgWriter.save(cmp.drw_sch, os.path.join(directory, SCHEMATIC_FNAME))
+
+  cmp.build_pcb()
+  SvgBounds.set_viewbox(cmp.drw_pcb)
+  SvgWriter.save(cmp.drw_pcb, os.path.join(directory, PCB_FNAME))
+
+  if fzpz:
+    Fzpz.save(cmp, os.path.join(directory, Fzpz.file_name(cmp) + ".fzpz"))
+
+
+def run(spec_file, output, verbose=False, fzpz=False):
+  """ Export all components in spec_file below directory output. """
+  t_start = time.perf_counter()
+  specs   = load_spec(spec_file)
+  for spec in specs:
+    t0        = time.perf_counter()
+    cmp       = build_component(spec)
+    directory = os.path.join(output, spec.get("directory", cmp.part_name))
+    export_component(cmp, directory, fzpz)
+    if verbose:
+      print("Export {:s} to {:s} ({:0.1f} ms)".format(
+            cmp.part_name, directory, (time.perf_counter()-t0)*1000))
+  print("Exported {:d} components in {:0.2f} s".format(
+        len(specs), time.perf_counter()-t_start))
+
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description="Generate component svgs "
+                                               "from a batch spec file.")
+  parser.add_argument("spec", help="Batch spec file (json)")
+  parser.add_argument("-o", "--output", default=".",
+                      help="Output root directory")
+  parser.add_argument("-f", "--fzpz", action="store_true",
+                      help="Also write Fritzing part bundles (.fzpz)")
+  parser.add_argument("-v", "--verbose", action="store_true")
+  args = parser.parse_args(argv)
+  run(args.spec, args.output, args.verbose, args.fzpz)
+
+
+if __name__ == "__main__":
+  sys.exit(main())
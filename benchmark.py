@@ -0,0 +1,269 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+Benchmarks of layout, serialization and bounds hot paths. Synthetic parts
+with 2 to 2048 pins are generated for THT and SMD mounts with all pins in
+one of the four directions. For each part and operation the best time of a
+few repeats and the peak memory allocated (tracemalloc) is reported. Results
+are saved as json so runs on different commits can be compared:
+
+  python benchmark.py -o base.json
+  (checkout other commit)
+  python benchmark.py -o new.json --compare base.json
+
+Bounds is the computation SvgView._set_bounds does for both views, without
+the Qt parts. PyQt4 is only needed for the model_scroll benchmark, which
+is skipped if PyQt4 is not installed.
+"""
+
+from array import array
+import argparse
+import io
+import json
+import math
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from ComponentBase import ComponentBase as Cmp
+from ComponentRect import ComponentRect, np
+from ConnectorBase import ConnectorBase as Con
+import SvgBounds
+import SvgWriter
+
+try:
+  from ConnectorListModel import ConnectorListModel
+except ImportError:
+  ConnectorListModel = None  # No PyQt4, model_scroll is skipped
+
+SIZES   = (2, 8, 32, 128, 512, 2048)
+SCROLL_ROWS   = 40  # Rows visible in a table view
+SCROLL_STEPS  = 20  # Pages scrolled by model_scroll
+MOUNTS  = {"THT": Cmp.MOUNT_THT, "SMD": Cmp.MOUNT_SMD}
+DIRS    = (Con.DIR_E, Con.DIR_N, Con.DIR_W, Con.DIR_S)
+
+
+def make_part(pins, mount, direction):
+  """ Return a ComponentRect with pins connectors all facing direction. """
+  cmp = ComponentRect()
+  cmp.part_name = "BENCH%d" % pins
+  cmp.mount     = MOUNTS[mount]
+  states = [{"s_label"  : "P%d" % i,
+             "s_dir"    : direction,
+             "p_dir"    : direction} for i in range(pins)]
+  cmp.add_connectors(pins, states)
+  cmp.build_schematic()
+  cmp.build_pcb()
+  return cmp
+
+
+def _segments(pins):
+  """ Return a list of silkscreen path segments, one per pin. """
+  return ["L %d %d" % (i, i % 7) for i in range(pins)]
+
+
+def _path(pins):
+  """ Return a silkscreen path string with one segment per pin. """
+  return " ".join(_segments(pins))
+
+
+# Operations as name: (setup, run). Setup(cmp) is not timed and returns the
+# argument for run.
+def _setup_sch(cmp):
+  cmp._sch_dirty = True  # Force a full rebuild
+  return cmp
+
+def _setup_pcb(cmp):
+  cmp._pcb_dirty = True
+  # Forget pad placements so the transforms are rewritten
+  cmp.table.p_x = array("d", [math.nan] * len(cmp.table))
+  return cmp
+
+def _setup_resize(cmp):
+  cmp._body_dim = (0, 0)
+  return cmp
+
+def _set_schematic_pos(cmp):
+  for i, c in enumerate(cmp.connectors):
+    c.set_schematic_pos(i*7.5, -i*7.5)
+
+def _set_state(state):
+  cmp = ComponentRect()
+  cmp.mount = state["mount"]
+  cmp.set_state(state)
+
+def _bounds(cmp):
+  SvgBounds.set_viewbox(cmp.drw_sch, "schematic")
+  SvgBounds.set_viewbox(cmp.drw_pcb)
+
+def _write(cmp):
+  SvgWriter.write(cmp.drw_sch, io.BytesIO())
+  SvgWriter.write(cmp.drw_pcb, io.BytesIO())
+
+def _setup_hits(cmp):
+  """ Return the pcb index and the centres of all pads, indexed. """
+  points = [((b[0]+b[2])/2, (b[1]+b[3])/2) 
+            for b in (c.pcb_bounds() for c in cmp.connectors)]
+  cmp.pcb_index.bounds(None)  # Index marked pads
+  return cmp.pcb_index, points
+
+def _hit_test(arg):
+  index, points = arg
+  for x, y in points:
+    index.at(x, y, 0.1)
+
+def _setup_model(cmp):
+  mdl = ConnectorListModel()
+  mdl.set_col_mapping(ConnectorListModel.pcb_col_map)
+  mdl.set_component(cmp)
+  return mdl
+
+def _model_scroll(mdl):
+  """
+  Fetch the cells a table view shows when scrolled SCROLL_STEPS pages, for
+  the roles a view asks for. Should not depend on the number of pins.
+  """
+  from PyQt4.QtCore import Qt
+  roles = (Qt.DisplayRole, Qt.EditRole, Qt.DecorationRole, Qt.FontRole,
+           Qt.TextAlignmentRole, Qt.BackgroundRole, Qt.ForegroundRole)
+  rows  = mdl.rowCount()
+  cols  = mdl.columnCount()
+  for step in range(SCROLL_STEPS):
+    top = (step * SCROLL_ROWS) % max(rows, 1)
+    for r in range(top, min(top+SCROLL_ROWS, rows)):
+      for c in range(cols):
+        index = mdl.index(r, c)
+        for role in roles:
+          mdl.data(index, role)
+
+
+OPERATIONS = {
+  "build_schematic"     : (_setup_sch, lambda cmp: cmp.build_schematic()),
+  "build_schematic_nop" : (lambda cmp: cmp, lambda cmp: cmp.build_schematic()),
+  "build_pcb"           : (_setup_pcb, lambda cmp: cmp.build_pcb()),
+  "body_resize"         : (_setup_resize, lambda cmp: cmp.body_resize()),
+  "set_schematic_pos"   : (lambda cmp: cmp, _set_schematic_pos),
+  "validate_path_cmd"   : (lambda cmp: _segments(len(cmp.connectors)),
+                           lambda cmds: [Cmp.validate_path_cmd(c) for c in cmds]),
+  "validate_path"       : (lambda cmp: _path(len(cmp.connectors)),
+                           Cmp.validate_path),
+  "get_state"           : (lambda cmp: cmp, lambda cmp: cmp.get_state()),
+  "set_state"           : (lambda cmp: cmp.get_state(), _set_state),
+  "bounds"              : (lambda cmp: cmp, _bounds),
+  "write_svg"           : (lambda cmp: cmp, _write),
+  "hit_test"            : (_setup_hits, _hit_test),
+}
+if ConnectorListModel is not None:
+  OPERATIONS["model_scroll"] = (_setup_model, _model_scroll)
+
+
+def measure(cmp, setup, run, repeat):
+  """ Return best time (s) of repeat runs and peak memory (bytes) of one. """
+  best = float("inf")
+  for _ in range(repeat):
+    arg = setup(cmp)
+    t0  = time.perf_counter()
+    run(arg)
+    best = min(best, time.perf_counter()-t0)
+
+  arg = setup(cmp)
+  tracemalloc.start()
+  try:
+    run(arg)
+    peak = tracemalloc.get_traced_memory()[1]
+  finally:
+    tracemalloc.stop()
+  return best, peak
+
+
+def run_benchmarks(sizes=SIZES, mounts=tuple(MOUNTS), dirs=DIRS,
+                   operations=tuple(OPERATIONS), repeat=5, verbose=True):
+  """ Run benchmarks and return a list of result dicts. """
+  results = []
+  for pins in sizes:
+    for mount in mounts:
+      for d in dirs:
+        cmp = make_part(pins, mount, d)
+        for name in operations:
+          setup, run = OPERATIONS[name]
+          t, peak = measure(cmp, setup, run, max(1, repeat if pins < 512
+                                                        else repeat // 2))
+          results.append({"op"    : name,
+                          "pins"  : pins,
+                          "mount" : mount,
+                          "dir"   : d,
+                          "time"  : t,
+                          "peak"  : peak})
+          if verbose:
+            print("{:20s} {:5d} {:s} {:s} {:10.3f} ms {:10.1f} kB".format(
+                  name, pins, mount, d, t*1000, peak/1024))
+  return results
+
+
+def _commit():
+  try:
+    return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"],
+                                   stderr=subprocess.DEVNULL).decode().strip()
+  except (OSError, subprocess.CalledProcessError):
+    return None
+
+
+def environment():
+  """ Return a dict describing where the benchmarks were run. """
+  return {"commit"  : _commit(),
+          "date"    : time.strftime("%Y-%m-%d %H:%M:%S"),
+          "python"  : platform.python_version(),
+          "machine" : platform.machine(),
+          "numpy"   : np.__version__ if np is not None else None}
+
+
+def compare(base, results):
+  """ Print time and memory ratios of results to base results per case. """
+  key   = lambda r: (r["op"], r["pins"], r["mount"], r["dir"])
+  index = {key(r): r for r in base}
+  print("{:20s} {:>5s} {:5s} {:>8s} {:>8s}".format(
+        "operation", "pins", "", "time", "memory"))
+  for r in results:
+    b = index.get(key(r))
+    if b is None:
+      continue
+    print("{:20s} {:5d} {:s} {:s} {:7.2f}x {:7.2f}x".format(
+          r["op"], r["pins"], r["mount"], r["dir"],
+          r["time"]/max(b["time"], 1e-9), r["peak"]/max(b["peak"], 1)))
+
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description="Benchmark component layout "
+                                               "and serialization.")
+  parser.add_argument("-o", "--output", help="Write results as json to file")
+  parser.add_argument("-c", "--compare", help="Compare to results json file")
+  parser.add_argument("-s", "--sizes", type=int, nargs="+", default=SIZES,
+                      help="Pin counts (default: %s)" % " ".join(map(str, SIZES)))
+  parser.add_argument("-m", "--mounts", nargs="+", choices=tuple(MOUNTS),
+                      default=tuple(MOUNTS))
+  parser.add_argument("-d", "--dirs", nargs="+", choices=DIRS, default=DIRS)
+  parser.add_argument("--ops", nargs="+", choices=tuple(OPERATIONS),
+                      default=tuple(OPERATIONS), help="Operations to run")
+  parser.add_argument("-r", "--repeat", type=int, default=5,
+                      help="Repeats per operation, best time is reported")
+  parser.add_argument("-q", "--quiet", action="store_true")
+  args = parser.parse_args(argv)
+
+  results = run_benchmarks(args.sizes, args.mounts, args.dirs, args.ops,
+                           args.repeat, not args.quiet)
+  if args.output:
+    with open(args.output, mode="w", encoding="utf-8") as f:
+      json.dump({"environment": environment(), "results": results}, f,
+                indent=1)
+  if args.compare:
+    with open(args.compare, encoding="utf-8") as f:
+      base = json.load(f)
+    print("Compared to {:s}".format(str(base["environment"].get("commit"))))
+    compare(base["results"], results)
+  return 0
+
+
+if __name__ == "__main__":
+  sys.exit(main())
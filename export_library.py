@@ -0,0 +1,186 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+Export a library of component files (.scc) to schematic and pcb svgs. Parts
+are exported in parallel by a pool of worker processes. A part that fails
+does not stop the export; failures are listed in the summary.
+
+Each part is written to a directory named as the component file, e.g.
+lib/so8.scc is exported to <output>/so8/schematic.svg and pcb.svg.
+
+With a cache directory (see ExportCache) parts that have not changed since
+they were last exported are skipped. Workers report cache hits and misses in
+their results, and the cache is trimmed to its size limit once all parts are
+exported.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+import traceback
+
+import ComponentFile
+import ExportCache
+import batch
+
+
+def find_files(paths):
+  """ Return component files in paths. Directories are searched recursively. """
+  files = []
+  for path in paths:
+    if os.path.isdir(path):
+      for root, _, names in os.walk(path):
+        files.extend(os.path.join(root, n) for n in sorted(names)
+                     if n.lower().endswith(".scc"))
+    else:
+      files.append(path)
+  return files
+
+
+def export_file(job):
+  """
+  Export one component file. Job is the tuple (filename, output root, cache
+  directory, cache size). Cache directory may be None. Return a result dict
+  with file name, status, time, cache hits and misses and any error.
+  """
+  filename, output, cache_dir, cache_size = job
+  t0    = time.perf_counter()
+  cache = None
+  try:
+    state     = ComponentFile.read_state(filename)
+    name      = os.path.splitext(os.path.basename(filename))[0]
+    directory = os.path.join(output, name)
+    if cache_dir:
+      cache = ExportCache.ExportCache(cache_dir, cache_size)
+      key   = ExportCache.state_hash(state)
+      if cache.fetch(key, directory):
+        return {"file"    : filename,
+                "ok"      : True,
+                "cached"  : True,
+                "time"    : time.perf_counter()-t0,
+                "pins"    : len(state["connectors"]),
+                "hits"    : cache.hits,
+                "misses"  : cache.misses}
+    cmp = ComponentFile.from_state(state)
+    batch.export_component(cmp, directory)
+    if cache_dir:
+      cache.store(key, directory)
+  except Exception as e:
+    return {"file"    : filename,
+            "ok"      : False,
+            "time"    : time.perf_counter()-t0,
+            "error"   : "%s: %s" % (type(e).__name__, e),
+            "trace"   : traceback.format_exc(),
+            "hits"    : cache.hits if cache else 0,
+            "misses"  : cache.misses if cache else 0}
+  return {"file"    : filename,
+          "ok"      : True,
+          "cached"  : False,
+          "time"    : time.perf_counter()-t0,
+          "pins"    : len(cmp.connectors),
+          "hits"    : cache.hits if cache else 0,
+          "misses"  : cache.misses if cache else 0}
+
+
+def export_library(files, output, workers=None, verbose=False, 
+                   cache_dir=None, cache_size=512*1024*1024):
+  """
+  Export component files to output using workers processes (all cores if
+  None). Unchanged parts are taken from cache_dir if given. Return a list of
+  result dicts, see export_file().
+  """
+  jobs    = [(f, output, cache_dir, cache_size) for f in files]
+  results = []
+  if workers == 1 or len(jobs) <= 1:
+    it = map(export_file, jobs)
+    results = _collect(it, verbose)
+  else:
+    chunksize = max(1, len(jobs) // ((workers or os.cpu_count() or 1) * 8))
+    with multiprocessing.Pool(workers) as pool:
+      results = _collect(pool.imap_unordered(export_file, jobs, chunksize),
+                         verbose)
+  if cache_dir:
+    evicted = ExportCache.ExportCache(cache_dir, cache_size).evict()
+    if verbose and evicted:
+      print("Evicted {:d} cache entries".format(evicted))
+  return results
+
+
+def _collect(results, verbose):
+  out = []
+  for r in results:
+    if verbose or not r["ok"]:
+      if r["ok"]:
+        print("Export {:s} ({:0.1f} ms)".format(r["file"], r["time"]*1000))
+      else:
+        print("FAILED {:s}: {:s}".format(r["file"], r["error"]))
+    out.append(r)
+  return out
+
+
+def summary(results, wall_time):
+  """ Return a summary dict of export results. """
+  ok      = [r for r in results if r["ok"]]
+  failed  = [r for r in results if not r["ok"]]
+  times   = sorted(results, key=lambda r: r["time"], reverse=True)
+  return {"parts"     : len(results),
+          "exported"  : len(ok),
+          "cached"    : sum(1 for r in ok if r["cached"]),
+          "hits"      : sum(r["hits"] for r in results),
+          "misses"    : sum(r["misses"] for r in results),
+          "failed"    : len(failed),
+          "wall_time" : wall_time,
+          "cpu_time"  : sum(r["time"] for r in results),
+          "slowest"   : [(r["file"], r["time"]) for r in times[:5]],
+          "failures"  : [(r["file"], r["error"]) for r in failed]}
+
+
+def print_summary(s):
+  print("Exported {:d} of {:d} parts in {:0.2f} s ({:0.2f} s part time)".format(
+        s["exported"], s["parts"], s["wall_time"], s["cpu_time"]))
+  print("{:d} parts unchanged (cached)".format(s["cached"]))
+  if s["hits"] or s["misses"]:
+    print("Cache: {:d} hits, {:d} misses".format(s["hits"], s["misses"]))
+  for f, t in s["slowest"]:
+    print("  {:8.1f} ms  {:s}".format(t*1000, f))
+  if s["failed"]:
+    print("{:d} parts failed:".format(s["failed"]))
+    for f, e in s["failures"]:
+      print("  {:s}: {:s}".format(f, e))
+
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description="Export component files (.scc) "
+                                               "to svgs in parallel.")
+  parser.add_argument("paths", nargs="+",
+                      help="Component files or directories with .scc files")
+  parser.add_argument("-o", "--output", default=".",
+                      help="Output root directory")
+  parser.add_argument("-j", "--workers", type=int, default=None,
+                      help="Number of worker processes (default: all cores)")
+  parser.add_argument("-c", "--cache",
+                      help="Cache directory for exported svgs")
+  parser.add_argument("--cache-size", type=float, default=512,
+                      help="Cache size limit in MB (default 512)")
+  parser.add_argument("-r", "--report",
+                      help="Write results and summary as json to this file")
+  parser.add_argument("-v", "--verbose", action="store_true")
+  args = parser.parse_args(argv)
+
+  files   = find_files(args.paths)
+  t0      = time.perf_counter()
+  results = export_library(files, args.output, args.workers, args.verbose,
+                           args.cache, int(args.cache_size*2**20))
+  s       = summary(results, time.perf_counter()-t0)
+  print_summary(s)
+  if args.report:
+    with open(args.report, mode="w", encoding="utf-8") as f:
+      json.dump({"summary": s, "results": results}, f, indent=1)
+  return 1 if s["failed"] else 0
+
+
+if __name__ == "__main__":
+  sys.exit(main())
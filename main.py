@@ -12,11 +12,16 @@ from ConnectorBase import ConnectorBase
 from ComponentBase import ComponentBase
 from ComponentRect import ComponentRect
 from PyQt4 import QtGui 
+from PyQt4 import QtCore
 from PyQt4.QtCore import QUrl
 from SVGCompCreator import Ui_MainWindow
 from HelpDialog import Ui_Dialog
 from ConnectorListModel import ConnectorListModel 
-import pickle
+from RefreshScheduler import RefreshScheduler
+from UndoStack import UndoStack
+import SilkscreenImport
+import ComponentFile
+import Instrument
 
 
 class StartQT4(QtGui.QMainWindow):
@@ -26,6 +31,9 @@ class StartQT4(QtGui.QMainWindow):
     self.ui = Ui_MainWindow()
     self.ui.setupUi(self)
     
+    # Coalesce canvas refreshes
+    self.scheduler = RefreshScheduler(self.build_svg_canvas, parent=self)
+    
     # Create datamodel for the QT table views
     self.mdl = ConnectorListModel()
     self.mdl.set_col_mapping(ConnectorListModel.schematic_col_map)
@@ -34,6 +42,12 @@ class StartQT4(QtGui.QMainWindow):
     # Connect model signals
     self.mdl.dataChanged.connect(self.refresh_svg_canvas)
     self.mdl.modelReset.connect(self.on_model_reset)
+    self.mdl.rowsInserted.connect(self.on_rows_changed)
+    self.mdl.rowsRemoved.connect(self.on_rows_changed)
+    
+    # Undo history of table, pin count and silkscreen edits
+    self.undo = UndoStack()
+    self.mdl.undo_stack = self.undo
 
     # Set a component to draw
     self.ui.svg_canvas.set_component(self.mdl.cmp)
@@ -48,9 +62,14 @@ class StartQT4(QtGui.QMainWindow):
     self.ui.tbl_pcb.horizontalHeader().setResizeMode(QtGui.QHeaderView.ResizeToContents)
     self.ui.tbl_pcb.show()
     
+    # Bulk edit actions on selected cells of the tables
+    for tbl in (self.ui.tbl_schematic, self.ui.tbl_pcb):
+      self._add_bulk_actions(tbl)
+    
     # Setup the silkscreen line editor    
     self.ui.txt_silkscreen.set_component(self.mdl.cmp)
     self.ui.txt_silkscreen.set_list(self.ui.list_path_cmds)
+    self.ui.txt_silkscreen.set_undo_stack(self.undo)
     
     # Set text validators
     self.ui.txt_label.setText(self.mdl.cmp.part_name)
@@ -72,31 +91,117 @@ class StartQT4(QtGui.QMainWindow):
     self.ui.radio_tht.clicked.connect(self.on_mount_changed)
     
     # Connect ui signals (silkscreen tab)
-    self.ui.txt_silkscreen.segmentsChanged.connect(self.refresh_svg_canvas)
+    self.ui.txt_silkscreen.segmentsChanged.connect(self.refresh_pcb)
     
     # Connect other signals
     self.ui.actionSave.triggered.connect(self.on_save)
     self.ui.actionLoad.triggered.connect(self.on_load)
+    self.ui.actionImportSilkscreen.triggered.connect(self.on_import_silkscreen)
     self.ui.actionExport.triggered.connect(self.ui.svg_canvas.export_svg)
+    self.ui.actionExportFzpz.triggered.connect(self.ui.svg_canvas.export_fzpz)
     self.ui.actionHelp.triggered.connect(self.on_help)
+    self.ui.actionUndo.triggered.connect(self.on_undo)
+    self.ui.actionRedo.triggered.connect(self.on_redo)
     self.ui.tabWidget.currentChanged.connect(self.on_change_tab)
+    self.ui.svg_canvas.connectorClicked.connect(self.on_connector_clicked)
 
+    # Show refresh timings if instrumentation is enabled (SCC_INSTRUMENT=1)
+    if Instrument.enabled:
+      self.addDockWidget(QtCore.Qt.RightDockWidgetArea, InstrumentDock(self))
     
     self.refresh_svg_canvas()
+    self.scheduler.flush()
 
   
-  def refresh_svg_canvas(self):
-    """ Build and display svg view for current tab. """
-    if self.ui.tabWidget.currentIndex() == 0:
+  def refresh_svg_canvas(self, *args):
+    """ Schedule a refresh of schematic and pcb views. """
+    self.scheduler.request()
+
+
+  def refresh_schematic(self, *args):
+    """ Schedule a refresh of the schematic view. """
+    self.scheduler.request(RefreshScheduler.SCHEMATIC)
+
+
+  def refresh_pcb(self, *args):
+    """ Schedule a refresh of the pcb view. """
+    self.scheduler.request(RefreshScheduler.PCB)
+
+
+  def build_svg_canvas(self, view):
+    """ Build and display svg view. Called by the refresh scheduler. """
+    if view == RefreshScheduler.SCHEMATIC:
       self.ui.svg_canvas.build_schematic()
       self.ui.svg_canvas.viewport().update()
-    elif self.ui.tabWidget.currentIndex() in (1,2):
+    elif view == RefreshScheduler.PCB:
       self.ui.svg_canvas.build_pcb()
       self.ui.svg_canvas.viewport().update()
     else:
       raise Exception("Unknown view to draw")
 
 
+  def _add_bulk_actions(self, tbl):
+    """ Add context menu actions editing all selected cells of table tbl. """
+    tbl.setContextMenuPolicy(QtCore.Qt.ActionsContextMenu)
+    for text, slot, key in (("Set value...",      self.on_bulk_value,   None),
+                            ("Apply formula...",  self.on_bulk_formula, None),
+                            ("Paste",             self.on_bulk_paste,   
+                                                  QtGui.QKeySequence.Paste)):
+      action = QtGui.QAction(text, tbl)
+      if key is not None:
+        action.setShortcut(key)
+        action.setShortcutContext(QtCore.Qt.WidgetShortcut)
+      action.triggered.connect(lambda checked=False, tbl=tbl, slot=slot: 
+                               slot(tbl))
+      tbl.addAction(action)
+
+
+  def _selected_cells(self, tbl):
+    """ Return selected cells of table tbl as sorted (row, column) tuples. """
+    return sorted((i.row(), i.column()) 
+                  for i in tbl.selectionModel().selectedIndexes())
+
+
+  def _bulk_edit(self, edit, *args):
+    """ Call the model bulk edit function edit. Errors are printed. """
+    try:
+      edit(*args)
+    except ValueError as e:
+      print("Edit failed: ", str(e))
+
+
+  def on_bulk_value(self, tbl):
+    """ Set all selected cells to a value. """
+    cells = self._selected_cells(tbl)
+    if len(cells) == 0:
+      return
+    txt, ok = QtGui.QInputDialog.getText(self, "Set value", 
+                                         "Value of %d cells:" % len(cells))
+    if ok:
+      self._bulk_edit(self.mdl.set_value, cells, txt)
+
+
+  def on_bulk_formula(self, tbl):
+    """ Set all selected cells from a formula, see apply_formula(). """
+    cells = self._selected_cells(tbl)
+    if len(cells) == 0:
+      return
+    txt, ok = QtGui.QInputDialog.getText(self, "Apply formula", 
+      "Formula with v (value), i (selected no.), row, n (connector no.)\n"
+      "e.g. v*2, 1.27*i or P{n} for labels:")
+    if ok and txt != "":
+      self._bulk_edit(self.mdl.apply_formula, cells, txt)
+
+
+  def on_bulk_paste(self, tbl):
+    """ Paste clipboard text from the current cell. """
+    index = tbl.currentIndex()
+    if not index.isValid():
+      return
+    txt = QtGui.QApplication.clipboard().text()
+    self._bulk_edit(self.mdl.paste, index.row(), index.column(), txt)
+
+
   def on_model_reset(self):
     """ Reload all valus from model to show in UI elements. """
     cmp = self.mdl.cmp
@@ -118,6 +223,9 @@ class StartQT4(QtGui.QMainWindow):
     # Set values on silkscreen tab
     self.ui.txt_silkscreen.set_component(cmp)
     
+    # Edits of the previous component can't be undone
+    self.undo.clear()
+    
     # Refresh canvas
     self.ui.svg_canvas.set_component(cmp)
     self.refresh_svg_canvas()
@@ -127,6 +235,26 @@ class StartQT4(QtGui.QMainWindow):
 
 
 
+  def on_rows_changed(self, *args):
+    """ Show the pin count when connectors are added or removed by undo. """
+    self.ui.spnbox_pincount.blockSignals(True)
+    self.ui.spnbox_pincount.setValue(self.mdl.rowCount())
+    self.ui.spnbox_pincount.blockSignals(False)
+    self.refresh_svg_canvas()
+
+
+  def on_undo(self):
+    if self.undo.undo():
+      self.ui.txt_silkscreen.sync_list()
+      self.refresh_svg_canvas()
+
+
+  def on_redo(self):
+    if self.undo.redo():
+      self.ui.txt_silkscreen.sync_list()
+      self.refresh_svg_canvas()
+
+
   def on_mount_changed(self, btn):
     """ Change mount. Only smd and tht supported by Friting. """
     sender = self.sender()
@@ -134,7 +262,7 @@ class StartQT4(QtGui.QMainWindow):
       self.mdl.cmp.mount = ComponentBase.MOUNT_SMD
     elif sender == self.ui.radio_tht:
       self.mdl.cmp.mount = ComponentBase.MOUNT_THT
-    self.refresh_svg_canvas()  
+    self.refresh_pcb()  
     
     
   def on_pincount_change(self, val):
@@ -144,34 +272,45 @@ class StartQT4(QtGui.QMainWindow):
       
     rows = self.mdl.rowCount()
     if rows<val:  # Add rows
-      for i in range(rows, val):
-        self.mdl.insertRow(i)  
+      self.mdl.insertRows(rows, val-rows)
     elif rows>val:  # Remove rows
-      for i in range(rows, val, -1):
-        self.mdl.removeRow(i-1)
+      self.mdl.removeRows(val, rows-val)
     self.refresh_svg_canvas()
       
 
   def on_change_tab(self, tab_no):
     """ Change tab. """
-    self.refresh_svg_canvas()
+    if tab_no == 0:
+      self.scheduler.visible_view = RefreshScheduler.SCHEMATIC
+    else:
+      self.scheduler.visible_view = RefreshScheduler.PCB
     if tab_no == 0:
       self.mdl.set_col_mapping(ConnectorListModel.schematic_col_map)
     elif tab_no == 1:
       self.mdl.set_col_mapping(ConnectorListModel.pcb_col_map)
 
     
+  def on_connector_clicked(self, row):
+    """ Select the row of a connector clicked on the canvas. """
+    if self.ui.tabWidget.currentIndex() == 0:
+      tbl = self.ui.tbl_schematic
+    else:
+      tbl = self.ui.tbl_pcb
+    tbl.selectRow(row)
+    tbl.scrollTo(self.mdl.index(row, 0))
+
+
   def on_name_change(self, txt):
     """ Change name on component. """
     self.mdl.cmp.part_name = txt    
-    self.refresh_svg_canvas()
+    self.refresh_schematic()
     
    
   def on_pcb_v_spacing_changed(self, txt):
     """ Adds extra vertical spacing between schematic pins. """
     if self.ui.txt_spacing_v.hasAcceptableInput():
       self.mdl.cmp.p_spacing_v = float(txt.replace(",", "."))
-      self.refresh_svg_canvas()
+      self.refresh_pcb()
     else:
       self.ui.txt_spacing_v.setText("%0.3f" % self.mdl.cmp.p_spacing_v)
       
@@ -180,7 +319,7 @@ class StartQT4(QtGui.QMainWindow):
     """ Adds extra horisontal spacing between schematic pins. """
     if self.ui.txt_spacing_h.hasAcceptableInput():
       self.mdl.cmp.p_spacing_h = float(txt.replace(",", "."))
-      self.refresh_svg_canvas()
+      self.refresh_pcb()
     else:
       self.ui.txt_spacing_h.setText("%0.3f" % self.mdl.cmp.p_spacing_h)
 
@@ -189,14 +328,14 @@ class StartQT4(QtGui.QMainWindow):
     """ Adds extra height to schematic body """
     val = max(0, int(val))
     self.mdl.cmp.s_add_height = val
-    self.refresh_svg_canvas()
+    self.refresh_schematic()
 
 
   def on_body_width_add(self, val):
     """ Adds extra width to schematic body """
     val = max(0, int(val))
     self.mdl.cmp.s_add_width = val
-    self.refresh_svg_canvas()
+    self.refresh_schematic()
     
     
   def on_help(self):
@@ -214,10 +353,7 @@ class StartQT4(QtGui.QMainWindow):
     if filename == "":
       return
     print("Save file ", filename)
-    f = open(filename, mode="wb")
-    state = self.mdl.cmp.get_state()
-    pickle.dump(state, f, pickle.HIGHEST_PROTOCOL)
-    f.close()    
+    ComponentFile.save(self.mdl.cmp, filename)
 
 
   def on_load(self):
@@ -226,14 +362,68 @@ class StartQT4(QtGui.QMainWindow):
     print("Load file ", filename)
     if filename == "":
       return
-    f   = open(filename, mode="rb")
-    state = pickle.load(f)
-    f.close()    
-    cmp = ComponentRect()
-    cmp.set_state(state)
+    cmp = ComponentFile.load(filename)
     self.mdl.set_component(cmp)
 
 
+  def on_import_silkscreen(self):
+    """ Show a file dialoge and add silkscreen outlines from a svg or dxf file. """
+    filename = QtGui.QFileDialog.getOpenFileName(self, "Import silkscreen", "", 
+                                                 "*.svg *.dxf")
+    if filename == "":
+      return
+    print("Import silkscreen ", filename)
+    start = len(self.mdl.cmp.silkscreen_commands)
+    try:
+      n = SilkscreenImport.import_silkscreen(self.mdl.cmp, filename)
+    except Exception as e:
+      print("Import failed: ", str(e))
+      return
+    print("Added %d segments" % n)
+    self.ui.txt_silkscreen.segments_appended(start)
+    self.refresh_pcb()
+
+
+class InstrumentDock(QtGui.QDockWidget):
+  """ Debug dock showing refresh timings recorded by Instrument. """
+  def __init__(self, parent):
+    QtGui.QDockWidget.__init__(self, "Instrumentation", parent)
+    widget  = QtGui.QWidget(self)
+    layout  = QtGui.QVBoxLayout(widget)
+    self.txt_report = QtGui.QPlainTextEdit(widget)
+    self.txt_report.setReadOnly(True)
+    self.txt_report.setFont(QtGui.QFont("Monospace", 8))
+    btn_profile = QtGui.QPushButton("Profile next refresh...", widget)
+    btn_reset   = QtGui.QPushButton("Reset", widget)
+    layout.addWidget(self.txt_report)
+    layout.addWidget(btn_profile)
+    layout.addWidget(btn_reset)
+    self.setWidget(widget)
+
+    btn_profile.clicked.connect(self.on_profile)
+    btn_reset.clicked.connect(self.on_reset)
+    Instrument.add_listener(self.on_refresh)
+
+
+  def on_refresh(self, refresh):
+    self.txt_report.setPlainText(Instrument.report())
+
+
+  def on_profile(self):
+    """ Ask for a file name and profile the next refresh to it. """
+    filename = QtGui.QFileDialog.getSaveFileName(self, "Save profile", "", 
+                                                 "*.prof")
+    if filename == "":
+      return
+    Instrument.profile_next(filename)
+
+
+  def on_reset(self):
+    Instrument.reset()
+    self.txt_report.setPlainText(Instrument.report())
+
+
+
 class ComboDelegate(QtGui.QItemDelegate):
   """
   A delegate that places a QComboBox in every cell of the column to which 
@@ -278,4 +468,7 @@ if __name__ == "__main__":
   app = QtGui.QApplication(sys.argv)
   myapp = StartQT4()
   myapp.show()
-  sys.exit(app.exec_())
\ No newline at end of file
+  ret = app.exec_()
+  if Instrument.enabled:
+    print(Instrument.report())
+  sys.exit(ret)
\ No newline at end of file
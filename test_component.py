@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of adding and removing connectors of a ComponentRect. Run with pytest.
+"""
+
+import pytest
+
+from ComponentRect import ComponentRect
+
+
+def _component(n):
+  cmp = ComponentRect()
+  cmp.add_connectors(n)
+  return cmp
+
+
+def test_remove_negative_index():
+  cmp = _component(4)
+  cmp.remove_connector(-1)
+  assert [c.no for c in cmp.connectors] == [0, 1, 2]
+  assert len(cmp.table) == 3
+  cmp.remove_connectors([-3, 1])
+  assert [c.no for c in cmp.connectors] == [2]
+  assert len(cmp.table) == 1
+  cmp.build_schematic()
+  cmp.build_pcb()
+
+
+def test_remove_out_of_range():
+  cmp = _component(4)
+  with pytest.raises(IndexError):
+    cmp.remove_connector(4)
+  with pytest.raises(IndexError):
+    cmp.remove_connectors([0, -5])
+  assert len(cmp.connectors) == len(cmp.table) == 4
+
+
+def test_views_follow_rows():
+  cmp = _component(5)
+  for c in cmp.connectors:
+    c.s_label = "L%d" % c.no
+  cmp.remove_connectors([1, 3])
+  assert [c.s_label for c in cmp.connectors] == ["L0", "L2", "L4"]
+
+
+def test_insert_at_row():
+  cmp     = _component(4)
+  states  = [c.get_state() for c in cmp.connectors[1:3]]
+  cmp.remove_connectors([1, 2])
+  cmp.add_connectors(2, states, 1)
+  assert [c.no for c in cmp.connectors] == [0, 1, 2, 3]
+  assert [c.s_label for c in cmp.connectors] == ["C0", "C1", "C2", "C3"]
+  assert [c.row for c in cmp.connectors] == [0, 1, 2, 3]
+
+
+def test_new_numbers_are_unique():
+  cmp = _component(4)
+  cmp.remove_connector(0)
+  cmp.add_connectors(2)
+  assert [c.no for c in cmp.connectors] == [1, 2, 3, 4, 5]
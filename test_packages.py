@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of pad placement in parametric packages when connectors are removed,
+added and restored. Run with pytest.
+"""
+
+import Packages
+
+
+def _pads(cmp):
+  """ Return pad centres on the pcb by label. """
+  cmp.build_pcb()
+  out = {}
+  for c in cmp.connectors:
+    b = cmp.pcb_index.bounds(c)
+    out[c.s_label] = (round((b[0]+b[2])/2, 4), round((b[1]+b[3])/2, 4))
+  return out
+
+
+def test_remove_keeps_positions():
+  cmp     = Packages.DIP(pins=8)
+  before  = _pads(cmp)
+  cmp.remove_connectors([0])
+  after   = _pads(cmp)
+  assert "1" not in after
+  assert after == {k: v for k, v in before.items() if k != "1"}
+
+
+def test_restore_removed_pad():
+  cmp     = Packages.DIP(pins=8)
+  before  = _pads(cmp)
+  order   = [c.s_label for c in cmp.connectors]
+  states  = [c.get_state() for c in cmp.connectors[2:4]]
+  cmp.remove_connectors(range(2, 4))
+  cmp.add_connectors(2, states, 2)  # As undo of the removal
+  assert [c.s_label for c in cmp.connectors] == order
+  assert [c.no for c in cmp.connectors] == list(range(8))
+  assert _pads(cmp) == before
+
+
+def test_added_pads_continue_pattern():
+  cmp     = Packages.Header(pins=4, rows=1)
+  before  = _pads(cmp)
+  cmp.add_connectors(2)
+  pads    = [c.p_place for c in cmp.connectors]
+  assert len(set(pads)) == len(pads)
+  dx, dy  = pads[3][0]-pads[2][0], pads[3][1]-pads[2][1]
+  assert pads[4] == (round(pads[3][0]+dx, 4), round(pads[3][1]+dy, 4))
+  assert {k: v for k, v in _pads(cmp).items() if k in before} == before
+
+
+def test_offset_moves_pad_from_layout():
+  cmp     = Packages.SOIC(pins=8)
+  before  = _pads(cmp)
+  cmp.connectors[0].p_pos = (0.5, -0.25)
+  after   = _pads(cmp)
+  x, y    = before["1"]
+  assert after["1"] == (round(x+0.5, 4), round(y+0.25, 4))  # Svg y is down
+  assert {k: v for k, v in after.items() if k != "1"} == \
+         {k: v for k, v in before.items() if k != "1"}
+
+
+def test_state_round_trip():
+  cmp = Packages.QFN(pins=16)
+  cmp.remove_connectors([0, 5])
+  new = Packages.from_state(cmp.get_state())
+  assert _pads(new) == _pads(cmp)
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of silkscreen import from svg and dxf files. Run with pytest.
+"""
+
+import pytest
+
+import SilkscreenImport
+
+SVG = """<svg xmlns="http://www.w3.org/2000/svg">%s</svg>"""
+
+
+def _read_svg(tmp_path, body):
+  f = tmp_path / "s.svg"
+  f.write_text(SVG % body)
+  return SilkscreenImport.read_svg(str(f))
+
+
+def test_path_mirrored(tmp_path):
+  assert _read_svg(tmp_path, '<path d="M 1 2 h 2 V 5 a 2 1 30 0 1 3 3"/>') == \
+         ["M 1 -2", "h 2", "V -5", "a 2 1 -30 0 0 3 -3"]
+
+
+def test_group_transforms(tmp_path):
+  body = ('<g transform="translate(10,20)"><g transform="scale(2)">'
+          '<path d="M 0 0 L 1 0 h 1" transform="rotate(90)"/></g></g>')
+  assert _read_svg(tmp_path, body) == ["M 10 -20", "L 10 -22", "l 0 -2"]
+
+
+def test_shapes(tmp_path):
+  body = ('<rect x="1" y="1" width="2" height="3"/>'
+          '<circle cx="0" cy="0" r="1"/>'
+          '<line x1="0" y1="0" x2="3" y2="4"/>'
+          '<polygon points="0,0 1,1 2,0"/>')
+  assert _read_svg(tmp_path, body) == [
+    "M 1 -1", "H 3", "V -4", "H 1", "Z",
+    "M 1 0", "A 1 1 0 0 0 -1 0", "A 1 1 0 0 0 1 0", "Z",
+    "M 0 0", "L 3 -4",
+    "M 0 0", "L 1 -1", "L 2 0", "Z"]
+
+
+def test_hidden_and_rejected(tmp_path):
+  assert _read_svg(tmp_path, '<defs><path d="M 0 0 L 1 1"/></defs>') == []
+  with pytest.raises(ValueError):
+    _read_svg(tmp_path, '<use href="#a"/>')
+
+
+def test_dxf_entities_only(tmp_path):
+  pairs = [(0, "SECTION"), (2, "BLOCKS"), (0, "BLOCK"), (2, "B1"),
+           (0, "LINE"), (10, 5), (20, 5), (11, 6), (21, 6), (0, "ENDBLK"),
+           (0, "ENDSEC"), (0, "SECTION"), (2, "ENTITIES"),
+           (0, "LINE"), (10, 0), (20, 0), (11, 1), (21, 2),
+           (0, "ENDSEC"), (0, "EOF")]
+  f = tmp_path / "s.dxf"
+  f.write_text("".join("%d\n%s\n" % p for p in pairs))
+  assert SilkscreenImport.read_dxf(str(f)) == ["M 0 0", "L 1 2"]
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of undo and redo of connector rows in ConnectorListModel. Skipped
+without PyQt4. Run with pytest.
+"""
+
+import pytest
+
+pytest.importorskip("PyQt4")
+
+import Packages
+from ComponentRect import ComponentRect
+from ConnectorListModel import ConnectorListModel
+from UndoStack import UndoStack
+
+
+def _model(cmp):
+  mdl = ConnectorListModel()
+  mdl.set_component(cmp)
+  mdl.undo_stack = UndoStack()
+  return mdl
+
+
+def _rows(cmp):
+  return [(c.no, c.s_label) for c in cmp.connectors]
+
+
+def test_undo_remove_from_middle():
+  cmp     = ComponentRect()
+  cmp.add_connectors(6)
+  mdl     = _model(cmp)
+  before  = _rows(cmp)
+  mdl.removeRows(1, 2)
+  assert _rows(cmp) == before[:1] + before[3:]
+  mdl.undo_stack.undo()
+  assert _rows(cmp) == before
+  mdl.undo_stack.redo()
+  assert _rows(cmp) == before[:1] + before[3:]
+  mdl.undo_stack.undo()
+  assert _rows(cmp) == before
+
+
+def test_undo_insert():
+  cmp     = ComponentRect()
+  cmp.add_connectors(3)
+  mdl     = _model(cmp)
+  before  = _rows(cmp)
+  mdl.insertRows(3, 2)
+  assert len(cmp.connectors) == 5
+  mdl.undo_stack.undo()
+  assert _rows(cmp) == before
+  mdl.undo_stack.redo()
+  assert len(cmp.connectors) == 5
+
+
+def test_undo_remove_package_pad():
+  cmp     = Packages.DIP(pins=8)
+  mdl     = _model(cmp)
+  before  = [c.p_place for c in cmp.connectors]
+  mdl.removeRows(2, 1)
+  mdl.undo_stack.undo()
+  assert [c.p_place for c in cmp.connectors] == before
+  assert [c.s_label for c in cmp.connectors] == [str(i) for i in range(1, 9)]